@@ -0,0 +1,158 @@
+"""
+Versioned read-only JSON API over the analytics snapshots (v1).
+
+Responses carry a strong ETag derived from the snapshot watermark (latest
+`computed_at` / live-counter `updated_at` in the requested window), so pollers
+that send `If-None-Match` get a 304 without the payload being rebuilt.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+
+from accounts.decorators import role_required
+from analyticsapp.models import (
+    AnalyticsLiveCounter,
+    AnalyticsProductDaily,
+    AnalyticsSnapshotDaily,
+)
+
+from .services.downsample import downsample_rows
+from .services.products_rollup import top_products_rollup
+from .services.snapshots import snapshot_kpis
+
+API_VERSION = "v1"
+MAX_DAYS = 365
+MIN_POINTS = 30
+
+
+def _days(request) -> int:
+    try:
+        days = int(request.GET.get("days", 30))
+    except (TypeError, ValueError):
+        days = 30
+    return min(max(days, 1), MAX_DAYS)
+
+
+def _max_points(request) -> int:
+    """
+    ?max_points= caps the daily series (ANALYTICS_CHART_MAX_POINTS by default);
+    pass max_points=365 for full resolution.
+    """
+    default = settings.ANALYTICS_CHART_MAX_POINTS
+    try:
+        points = int(request.GET.get("max_points", default))
+    except (TypeError, ValueError):
+        points = default
+    return min(max(points, MIN_POINTS), MAX_DAYS)
+
+
+def _limit(request) -> int:
+    try:
+        limit = int(request.GET.get("limit", 10))
+    except (TypeError, ValueError):
+        limit = 10
+    return min(max(limit, 1), 50)
+
+
+def _watermark(days: int) -> str:
+    """
+    Cheap fingerprint of everything the payloads are built from.
+
+    Row counts are included so deleting a snapshot row also changes the tag;
+    the end day is included so the window rolls over at midnight.
+    """
+    end_day = timezone.localdate()
+    start_day = end_day - timedelta(days=days - 1)
+    window = {"day__range": (start_day, end_day)}
+
+    snap = AnalyticsSnapshotDaily.objects.filter(**window).aggregate(
+        n=Count("id"), ts=Max("computed_at")
+    )
+    prod = AnalyticsProductDaily.objects.filter(**window).aggregate(
+        n=Count("id"), ts=Max("computed_at")
+    )
+    live = (
+        AnalyticsLiveCounter.objects.filter(day=end_day)
+        .values_list("updated_at", flat=True)
+        .first()
+    )
+    return f"{end_day}|{snap['n']}|{snap['ts']}|{prod['n']}|{prod['ts']}|{live}"
+
+
+def _etag(kind: str, *parts) -> str:
+    raw = "|".join([API_VERSION, kind, *map(str, parts)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _kpis_etag(request) -> str:
+    days = _days(request)
+    return _etag("kpis", days, _watermark(days))
+
+
+def _series_etag(request) -> str:
+    days = _days(request)
+    return _etag(
+        "series", days, _limit(request), _max_points(request), _watermark(days)
+    )
+
+
+@role_required("analyst", "ops", staff_only=True)
+@require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_kpis_etag)
+def kpis(request):
+    """Window KPIs (`snapshot_kpis`) without the daily series."""
+    days = _days(request)
+    snap = snapshot_kpis(days)
+
+    return JsonResponse(
+        {
+            "version": API_VERSION,
+            "days": days,
+            "meta": snap["meta"],
+            "rev": snap["rev"],
+            "cust": snap["cust"],
+            "funnel": snap["funnel"],
+        }
+    )
+
+
+@role_required("analyst", "ops", staff_only=True)
+@require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_series_etag)
+def series(request):
+    """
+    Daily revenue/orders/refunds series plus best sellers for the window.
+    Windows longer than ?max_points= days are downsampled to whole days that
+    keep each series' shape (refund spikes included).
+    """
+    days = _days(request)
+    snap = snapshot_kpis(days)
+    max_points = _max_points(request)
+    daily = downsample_rows(
+        snap["daily"],
+        {"revenue": "lttb", "orders": "lttb", "refunded_amount": "minmax"},
+        max_points=max_points,
+    )
+
+    return JsonResponse(
+        {
+            "version": API_VERSION,
+            "days": days,
+            "meta": snap["meta"],
+            "max_points": max_points,
+            "downsampled": len(daily) < len(snap["daily"]),
+            "daily": daily,
+            "top_products": top_products_rollup(days, limit=_limit(request)),
+        }
+    )
@@ -1,17 +1,39 @@
 from __future__ import annotations
 
-from datetime import datetime, time, timedelta
+import csv
+import time
+from datetime import timedelta
 
-from django.core.management.base import BaseCommand
-from django.db import transaction
-from django.db.models import Sum
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 
-from analyticsapp.models import AnalyticsProductDaily, AnalyticsSnapshotDaily
-from analyticsapp.services.customers import customer_kpis
-from analyticsapp.services.funnel import wishlist_funnel
-from analyticsapp.services.revenue import revenue_kpis
-from orders.models import OrderItem
+from analyticsapp.services.cohorts import rebuild_cohorts
+from analyticsapp.services.country_rollup import (
+    compute_country_days,
+    write_country_days,
+)
+from analyticsapp.services.customer_index import rebuild_customer_index
+from analyticsapp.services.funnel_events import rebuild_funnel_states
+from analyticsapp.services.hourly import compact_hourly, rebuild_hourly
+from analyticsapp.services.leases import (
+    SNAPSHOT_LEASE,
+    acquire_lease,
+    release_lease,
+    renew_lease,
+    wait_for_release,
+)
+from analyticsapp.services.live_counters import prune_live_counters
+from analyticsapp.services.refund_rollups import (
+    compute_refund_rollups,
+    write_refund_rollups,
+)
+from analyticsapp.services.rfm import build_rfm_segments
+from analyticsapp.services.snapshot_runner import (
+    build_snapshot_day,
+    compute_snapshot_days,
+    diff_snapshot_days,
+)
 
 
 class Command(BaseCommand):
@@ -24,6 +46,67 @@ class Command(BaseCommand):
             default=180,
             help="How many days back to backfill (default 180).",
         )
+        parser.add_argument(
+            "--rebuild-funnel",
+            action="store_true",
+            help=(
+                "Backfill per-user funnel timestamps from wishlist/order tables "
+                "before snapshotting (normally maintained on write)."
+            ),
+        )
+        parser.add_argument(
+            "--rebuild-index",
+            action="store_true",
+            help=(
+                "Rebuild the per-customer first-order index from all completed "
+                "orders (normally maintained on write; use after bulk imports)."
+            ),
+        )
+        parser.add_argument(
+            "--skip-rollups",
+            action="store_true",
+            help=(
+                "Only refresh the per-day tiers; leave the whole-history rollups "
+                "(cohort matrix, RFM segments) to the nightly full build."
+            ),
+        )
+        parser.add_argument(
+            "--lock-wait",
+            type=int,
+            default=0,
+            help=(
+                "If another build holds the snapshot lease, wait up to N seconds "
+                "and reuse its result when it covered this window (default 0: "
+                "exit immediately)."
+            ),
+        )
+        parser.add_argument(
+            "--lease-ttl",
+            type=int,
+            default=None,
+            help=(
+                "Seconds before an un-renewed lease may be stolen "
+                "(default ANALYTICS_SNAPSHOT_LEASE_TTL)."
+            ),
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help=(
+                "Compute the window in memory and report which days would change; "
+                "no writes, no row locks, no index/cohort/RFM rebuilds."
+            ),
+        )
+        parser.add_argument(
+            "--diff",
+            action="store_true",
+            help="With --dry-run: print every changed day/metric (stored -> computed).",
+        )
+        parser.add_argument(
+            "--diff-csv",
+            default="",
+            help="With --dry-run: also write the changed days/metrics to this CSV path.",
+        )
 
     def handle(self, *args, **options):
         days = int(options["days"])
@@ -34,81 +117,190 @@ class Command(BaseCommand):
         today = timezone.localdate()
         start_day = today - timedelta(days=days - 1)
 
+        if options["dry_run"] or options["diff"] or options["diff_csv"]:
+            return self._dry_run(start_day, today, options)
+
+        # Single flight: overlapping cron / run_checks invocations must not
+        # rebuild the same window concurrently.
+        ttl = timedelta(
+            seconds=options["lease_ttl"] or settings.ANALYTICS_SNAPSHOT_LEASE_TTL
+        )
+        requested_at = timezone.now()
+        deadline = time.monotonic() + max(int(options["lock_wait"]), 0)
+
+        token = acquire_lease(SNAPSHOT_LEASE, ttl=ttl)
+        while token is None:
+            result = wait_for_release(
+                SNAPSHOT_LEASE,
+                since=requested_at,
+                timeout=deadline - time.monotonic(),
+            )
+            if result is None:
+                self.stdout.write(
+                    self.style.WARNING(
+                        "Another snapshot build holds the lease; skipped."
+                    )
+                )
+                return
+            if (
+                result.get("end_day") == today.isoformat()
+                and int(result.get("days", 0)) >= days
+            ):
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Reused concurrent snapshot build ({result['days']} day(s) "
+                        f"to {result['end_day']}); nothing rebuilt."
+                    )
+                )
+                return
+            token = acquire_lease(SNAPSHOT_LEASE, ttl=ttl)
+
+        try:
+            summary = self._build(start_day, today, options, token=token, ttl=ttl)
+        except BaseException as exc:
+            release_lease(SNAPSHOT_LEASE, token, result={"error": str(exc)[:200]})
+            raise
+        if not release_lease(
+            SNAPSHOT_LEASE,
+            token,
+            result={"days": days, "end_day": today.isoformat(), **summary},
+        ):
+            raise CommandError(
+                "Snapshot lease was taken by another build before this one "
+                "finished; its writes may have interleaved with this build."
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Snapshots built for {days} day(s). "
+                f"created={summary['created']}, updated={summary['updated']}, "
+                f"product_rows_upserted={summary['product_rows_upserted']}, "
+                f"customers_indexed={summary['customers_indexed']}, "
+                f"cohort_cells={summary['cohort_cells']}, "
+                f"rfm_customers={summary['rfm_customers']}, "
+                f"country_rows={summary['country_rows']}, "
+                f"refund_rows={summary['refund_rows']}, "
+                f"hourly_rows={summary['hourly_rows']}, "
+                f"hourly_compacted={summary['hourly_compacted']}"
+            )
+        )
+
+    def _build(self, start_day, today, options, *, token, ttl) -> dict:
+        renewed = time.monotonic()
+
+        def keep_lease(*, force: bool = True) -> None:
+            # Renewed between phases, and every ~ttl/3 inside the per-day loop.
+            nonlocal renewed
+            if not force and time.monotonic() - renewed < ttl.total_seconds() / 3:
+                return
+            if not renew_lease(SNAPSHOT_LEASE, token, ttl=ttl):
+                raise CommandError(
+                    "Snapshot lease expired and was taken by another build."
+                )
+            renewed = time.monotonic()
+
         created = 0
         updated = 0
         product_rows_upserted = 0
 
-        for i in range(days):
-            day = start_day + timedelta(days=i)
-
-            start_dt = timezone.make_aware(datetime.combine(day, time.min))
-            end_dt = timezone.make_aware(datetime.combine(day, time.max))
+        # The customer index is maintained on write; a full rebuild (one
+        # GROUP BY over every completed order) is opt-in.
+        customers_indexed = (
+            rebuild_customer_index() if options.get("rebuild_index") else 0
+        )
+        keep_lease()
+        # Whole-history rollups: the write-time increments keep them current
+        # between builds, and this rebuild is the source of truth that
+        # corrects any drift. Frequent refreshes skip it (--skip-rollups).
+        rollups = not options.get("skip_rollups")
+        cohort_cells = rebuild_cohorts() if rollups else {}
+        keep_lease()
+        segments = build_rfm_segments() if rollups else {}
+        keep_lease()
 
-            rev = revenue_kpis(start_dt, end_dt)
-            cust = customer_kpis(start_dt, end_dt)
-            funnel = wishlist_funnel(start_dt, end_dt)
+        if options.get("rebuild_funnel"):
+            rebuild_funnel_states()
+            keep_lease()
 
-            with transaction.atomic():
-                # --- Daily KPI snapshot ---
-                obj, was_created = (
-                    AnalyticsSnapshotDaily.objects.select_for_update().get_or_create(
-                        day=day
-                    )
-                )
+        # Every metric for every day from one set-based pass, then per-day writes.
+        computed = compute_snapshot_days(start_day, today)
+        keep_lease()
 
-                obj.revenue = rev["revenue"]
-                obj.orders = rev["orders"]
-                obj.aov = rev["aov"]
+        for day, values in computed.items():
+            was_created, product_rows = build_snapshot_day(day, values)
+            product_rows_upserted += product_rows
+            if was_created:
+                created += 1
+            else:
+                updated += 1
+            keep_lease(force=False)
 
-                obj.refunded_amount = rev.get("refund_amount", 0)
-                obj.refunded_orders = rev.get("refunded_orders", 0)
+        keep_lease()
+        country_rows = write_country_days(
+            computed.keys(), compute_country_days(start_day, today)
+        )
+        keep_lease()
+        refund_rows = write_refund_rollups(
+            computed.keys(), *compute_refund_rollups(start_day, today)
+        )
+        keep_lease()
 
-                obj.unique_customers = cust.get("unique", 0)
-                obj.repeat_customers = cust.get("repeat", 0)
+        prune_live_counters(before_day=today)
 
-                obj.wish_users = funnel.get("wish_users", 0)
-                obj.purchased_users = funnel.get("purchased_users", 0)
+        # Intraday tier: recompute the recent days it still covers, then fold
+        # anything past retention into the daily rows.
+        retention = max(1, settings.ANALYTICS_HOURLY_RETENTION_DAYS)
+        hourly_rows = rebuild_hourly(
+            max(start_day, today - timedelta(days=retention - 1)),
+            today,
+            lease_token=token,
+        )
+        keep_lease()
+        hourly_compacted = compact_hourly(retention_days=retention, lease_token=token)
 
-                obj.save()
+        return {
+            "created": created,
+            "updated": updated,
+            "product_rows_upserted": product_rows_upserted,
+            "customers_indexed": customers_indexed,
+            "cohort_cells": sum(cohort_cells.values()),
+            "rfm_customers": sum(segments.values()),
+            "country_rows": country_rows,
+            "refund_rows": refund_rows,
+            "hourly_rows": hourly_rows,
+            "hourly_compacted": hourly_compacted,
+        }
 
-                if was_created:
-                    created += 1
-                else:
-                    updated += 1
+    def _dry_run(self, start_day, end_day, options):
+        changes = diff_snapshot_days(compute_snapshot_days(start_day, end_day))
+        changed_days = sorted({c["day"] for c in changes})
 
-                # --- Product daily rollups (best sellers) ---
-                # Some OrderItems may not have a Product FK (product is NULL). Exclude them.
-                items = (
-                    OrderItem.objects.filter(
-                        order__status__in=("paid", "fulfilled"),
-                        order__created_at__range=(start_dt, end_dt),
-                        product__isnull=False,
-                    )
-                    .values("product_id")
-                    .annotate(
-                        units=Sum("qty"),
-                        revenue=Sum("line_total"),
-                    )
+        if options["diff"]:
+            for c in changes:
+                self.stdout.write(
+                    f"{c['day'].isoformat()} {c['metric']}: "
+                    f"{'-' if c['stored'] is None else c['stored']} -> {c['computed']}"
                 )
 
-                for row in items:
-                    product_id = row.get("product_id")
-                    if not product_id:
-                        continue
-
-                    AnalyticsProductDaily.objects.update_or_create(
-                        day=day,
-                        product_id=product_id,
-                        defaults={
-                            "units": int(row["units"] or 0),
-                            "revenue": row["revenue"] or 0,
-                        },
+        if options["diff_csv"]:
+            with open(options["diff_csv"], "w", newline="", encoding="utf-8") as fh:
+                w = csv.writer(fh)
+                w.writerow(["day", "metric", "stored", "computed"])
+                for c in changes:
+                    w.writerow(
+                        [
+                            c["day"].isoformat(),
+                            c["metric"],
+                            "" if c["stored"] is None else c["stored"],
+                            c["computed"],
+                        ]
                     )
-                    product_rows_upserted += 1
 
+        days = (end_day - start_day).days + 1
+        style = self.style.WARNING if changes else self.style.SUCCESS
         self.stdout.write(
-            self.style.SUCCESS(
-                f"Snapshots built for {days} day(s). "
-                f"created={created}, updated={updated}, product_rows_upserted={product_rows_upserted}"
+            style(
+                f"Dry run for {days} day(s): {len(changed_days)} day(s) would change, "
+                f"{len(changes)} metric value(s). Nothing was written."
             )
         )
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analyticsapp.services.columnar import TABLES, build_columnar_store, columnar_root
+
+
+class Command(BaseCommand):
+    help = (
+        "Append complete days of the daily analytics rollups to the memory-mappable "
+        "columnar store (NumPy fixed-width columns + manifest)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--root",
+            default="",
+            help="Store directory (default ANALYTICS_COLUMNAR_ROOT).",
+        )
+        parser.add_argument(
+            "--tables",
+            default="",
+            help=f"Comma-separated subset of: {', '.join(TABLES)} (default all).",
+        )
+        parser.add_argument(
+            "--until",
+            default="",
+            help="Last day to include, YYYY-MM-DD (default yesterday).",
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Rewrite the selected tables from scratch (after snapshot corrections).",
+        )
+
+    def handle(self, *args, **options):
+        tables = [t.strip() for t in options["tables"].split(",") if t.strip()]
+        unknown = sorted(set(tables) - set(TABLES))
+        if unknown:
+            raise CommandError(f"Unknown table(s): {', '.join(unknown)}")
+
+        try:
+            until = date.fromisoformat(options["until"]) if options["until"] else None
+        except ValueError:
+            raise CommandError("--until must be YYYY-MM-DD")
+
+        root = options["root"] or columnar_root()
+        try:
+            appended = build_columnar_store(
+                root, tables=tables or None, until=until, rebuild=options["rebuild"]
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        summary = ", ".join(f"{t}=+{n}" for t, n in appended.items())
+        self.stdout.write(self.style.SUCCESS(f"Columnar store {root}: {summary}"))
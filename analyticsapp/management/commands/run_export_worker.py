@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from analyticsapp.services.export_jobs import claim_next_job, run_export_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Process queued analytics export jobs (and resume stalled ones) "
+        "outside the web workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the queue once and exit (cron / CI).",
+        )
+        parser.add_argument(
+            "--poll",
+            type=float,
+            default=5.0,
+            help="Seconds to sleep when the queue is empty (default 5).",
+        )
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=300,
+            help=(
+                "Reclaim running jobs with no checkpoint for this many seconds "
+                "(crashed worker). Default 300."
+            ),
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Rows per checkpointed chunk (default 5000).",
+        )
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(seconds=max(int(options["stale_after"]), 1))
+        chunk_size = max(int(options["chunk_size"]), 1)
+
+        processed = 0
+        while True:
+            job = claim_next_job(stale_after=stale_after)
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(max(float(options["poll"]), 0.1))
+                continue
+
+            job = run_export_job(job, chunk_size=chunk_size)
+            processed += 1
+            style = self.style.SUCCESS if job.status == "done" else self.style.ERROR
+            self.stdout.write(
+                style(
+                    f"ExportJob #{job.id} {job.kind}: {job.status} "
+                    f"rows={job.rows_written}"
+                    + (f" error={job.error}" if job.error else "")
+                )
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Export jobs processed: {processed}"))
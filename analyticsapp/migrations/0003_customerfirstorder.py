@@ -0,0 +1,101 @@
+# Generated by Django 5.2.10 on 2026-10-19 18:05
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+
+
+def backfill_customer_index(apps, schema_editor):
+    Order = apps.get_model("orders", "Order")
+    CustomerFirstOrder = apps.get_model("analyticsapp", "CustomerFirstOrder")
+
+    rows = (
+        Order.objects.filter(status__in=("paid", "fulfilled"))
+        .exclude(email="")
+        .values("email")
+        .annotate(
+            first_order_at=Min("created_at"),
+            last_order_at=Max("created_at"),
+            order_count=Count("id"),
+            lifetime_spend=Sum("total"),
+            lifetime_refunded_pennies=Sum("refund_amount_pennies"),
+            user_id=Max("user_id"),
+        )
+        .order_by()
+    )
+    CustomerFirstOrder.objects.bulk_create(
+        [
+            CustomerFirstOrder(
+                email=r["email"],
+                user_id=r["user_id"],
+                first_order_at=r["first_order_at"],
+                last_order_at=r["last_order_at"],
+                order_count=r["order_count"],
+                lifetime_spend=r["lifetime_spend"] or Decimal("0.00"),
+                lifetime_refunded_pennies=r["lifetime_refunded_pennies"] or 0,
+            )
+            for r in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("analyticsapp", "0002_analyticsproductdaily"),
+        ("orders", "0006_order_orders_orde_email_e2637f_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CustomerFirstOrder",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("email", models.EmailField(max_length=254, unique=True)),
+                ("first_order_at", models.DateTimeField()),
+                ("last_order_at", models.DateTimeField()),
+                ("order_count", models.PositiveIntegerField(default=0)),
+                (
+                    "lifetime_spend",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=12
+                    ),
+                ),
+                ("lifetime_refunded_pennies", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-first_order_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["first_order_at"], name="analyticsap_first_o_4289ad_idx"
+                    ),
+                    models.Index(
+                        fields=["last_order_at"], name="analyticsap_last_or_880e68_idx"
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_customer_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.10 on 2026-10-19 18:09
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("analyticsapp", "0003_customerfirstorder"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnalyticsCohortMonthly",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "source",
+                    models.CharField(
+                        choices=[
+                            ("orders", "Orders"),
+                            ("subscriptions", "Subscriptions"),
+                        ],
+                        default="orders",
+                        max_length=20,
+                    ),
+                ),
+                ("cohort_month", models.DateField()),
+                ("months_since", models.PositiveSmallIntegerField()),
+                ("activity_month", models.DateField()),
+                ("customers", models.PositiveIntegerField(default=0)),
+                ("orders", models.PositiveIntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=14
+                    ),
+                ),
+                ("computed_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "ordering": ["source", "cohort_month", "months_since"],
+                "indexes": [
+                    models.Index(
+                        fields=["source", "activity_month"],
+                        name="analyticsap_source_9dabce_idx",
+                    )
+                ],
+                "unique_together": {("source", "cohort_month", "months_since")},
+            },
+        ),
+    ]
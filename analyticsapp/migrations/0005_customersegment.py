@@ -0,0 +1,44 @@
+# Generated by Django 5.2.10 on 2026-10-19 18:10
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("analyticsapp", "0004_analyticscohortmonthly"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CustomerSegment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("email", models.EmailField(max_length=254, unique=True)),
+                ("recency_days", models.PositiveIntegerField(default=0)),
+                ("frequency", models.PositiveIntegerField(default=0)),
+                (
+                    "monetary",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=12
+                    ),
+                ),
+                ("r_score", models.PositiveSmallIntegerField(default=1)),
+                ("f_score", models.PositiveSmallIntegerField(default=1)),
+                ("m_score", models.PositiveSmallIntegerField(default=1)),
+                ("segment", models.CharField(db_index=True, max_length=32)),
+                ("computed_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "ordering": ["segment", "-monetary"],
+            },
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.10 on 2026-10-19 18:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def backfill_funnel_states(apps, schema_editor):
+    UserFunnelState = apps.get_model("analyticsapp", "UserFunnelState")
+    Wishlist = apps.get_model("wishlist", "Wishlist")
+    Order = apps.get_model("orders", "Order")
+
+    sources = {
+        "first_wishlist_at": Wishlist.objects.all(),
+        "first_checkout_at": Order.objects.filter(user__isnull=False),
+        "first_paid_at": Order.objects.filter(
+            user__isnull=False, status__in=("paid", "fulfilled")
+        ),
+    }
+
+    found = {}
+    for column, qs in sources.items():
+        for r in qs.values("user_id").annotate(t=Min("created_at")).order_by():
+            found.setdefault(r["user_id"], {})[column] = r["t"]
+
+    UserFunnelState.objects.bulk_create(
+        [UserFunnelState(user_id=uid, **cols) for uid, cols in found.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("analyticsapp", "0005_customersegment"),
+        ("orders", "0006_order_orders_orde_email_e2637f_idx"),
+        ("wishlist", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserFunnelState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("first_product_view_at", models.DateTimeField(blank=True, null=True)),
+                ("first_wishlist_at", models.DateTimeField(blank=True, null=True)),
+                ("first_cart_add_at", models.DateTimeField(blank=True, null=True)),
+                ("first_checkout_at", models.DateTimeField(blank=True, null=True)),
+                ("first_paid_at", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="funnel_state",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["first_product_view_at"],
+                        name="analyticsap_first_p_8546fa_idx",
+                    ),
+                    models.Index(
+                        fields=["first_wishlist_at"],
+                        name="analyticsap_first_w_a3819b_idx",
+                    ),
+                    models.Index(
+                        fields=["first_cart_add_at"],
+                        name="analyticsap_first_c_1c7fb2_idx",
+                    ),
+                    models.Index(
+                        fields=["first_checkout_at"],
+                        name="analyticsap_first_c_e39414_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_funnel_states, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.10 on 2026-10-19 18:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("analyticsapp", "0008_exportjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="analyticssnapshotdaily",
+            name="source_checksum",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="analyticssnapshotdaily",
+            name="source_count",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.10 on 2026-10-19 18:40
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("analyticsapp", "0011_analyticssnapshothourly"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnalyticsCountryDaily",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("country", models.CharField(blank=True, max_length=2)),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=12
+                    ),
+                ),
+                ("orders", models.PositiveIntegerField(default=0)),
+                (
+                    "refunded_amount",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=12
+                    ),
+                ),
+                ("refunded_orders", models.PositiveIntegerField(default=0)),
+                ("computed_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "ordering": ["-day", "-revenue"],
+                "indexes": [
+                    models.Index(fields=["day"], name="analyticsap_day_604dfb_idx")
+                ],
+                "unique_together": {("day", "country")},
+            },
+        ),
+    ]
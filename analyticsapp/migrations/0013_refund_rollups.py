@@ -0,0 +1,84 @@
+# Generated by Django 5.2.10 on 2026-10-19 18:42
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("analyticsapp", "0012_analyticscountrydaily"),
+        ("products", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnalyticsRefundLatencyDaily",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("bucket", models.CharField(max_length=16)),
+                ("refunded_orders", models.PositiveIntegerField(default=0)),
+                (
+                    "refunded_amount",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=12
+                    ),
+                ),
+                ("computed_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "ordering": ["-day", "bucket"],
+                "indexes": [
+                    models.Index(fields=["day"], name="analyticsap_day_14c4db_idx")
+                ],
+                "unique_together": {("day", "bucket")},
+            },
+        ),
+        migrations.CreateModel(
+            name="AnalyticsProductRefundDaily",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("refunded_orders", models.PositiveIntegerField(default=0)),
+                (
+                    "refunded_amount",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=12
+                    ),
+                ),
+                ("computed_at", models.DateTimeField(auto_now=True)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_refunds",
+                        to="products.product",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-day", "-refunded_amount"],
+                "indexes": [
+                    models.Index(fields=["day"], name="analyticsap_day_d2f6dc_idx")
+                ],
+                "unique_together": {("day", "product")},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.10 on 2026-10-19 18:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("analyticsapp", "0013_refund_rollups"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="analyticssnapshotdaily",
+            name="total_sketch",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
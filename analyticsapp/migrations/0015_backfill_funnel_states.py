@@ -0,0 +1,56 @@
+from django.db import migrations
+from django.db.models import Min
+
+
+def backfill_funnel_states(apps, schema_editor):
+    """
+    Seed UserFunnelState from the raw wishlist/order tables, as
+    rebuild_funnel_states() does, so the first snapshot build after deploy
+    keeps the historical wish/purchase counts instead of zeroing them.
+    """
+    Order = apps.get_model("orders", "Order")
+    Wishlist = apps.get_model("wishlist", "Wishlist")
+    UserFunnelState = apps.get_model("analyticsapp", "UserFunnelState")
+
+    sources = {
+        "first_wishlist_at": Wishlist.objects.values("user_id"),
+        "first_checkout_at": Order.objects.filter(user__isnull=False).values("user_id"),
+        "first_paid_at": Order.objects.filter(
+            user__isnull=False, status__in=("paid", "fulfilled")
+        ).values("user_id"),
+    }
+
+    found = {}
+    for column, qs in sources.items():
+        for r in qs.annotate(t=Min("created_at")).order_by():
+            found.setdefault(r["user_id"], {})[column] = r["t"]
+
+    existing = UserFunnelState.objects.in_bulk(list(found), field_name="user_id")
+    to_create, to_update = [], []
+    for user_id, cols in found.items():
+        obj = existing.get(user_id)
+        if obj is None:
+            to_create.append(UserFunnelState(user_id=user_id, **cols))
+            continue
+        for column, ts in cols.items():
+            current = getattr(obj, column)
+            if current is None or ts < current:
+                setattr(obj, column, ts)
+        to_update.append(obj)
+
+    UserFunnelState.objects.bulk_create(to_create, batch_size=1000)
+    UserFunnelState.objects.bulk_update(
+        to_update, fields=list(sources), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("analyticsapp", "0014_snapshot_total_sketch"),
+        ("orders", "0007_order_updated_at_idx"),
+        ("wishlist", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_funnel_states, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from decimal import Decimal
 
+from django.conf import settings
 from django.db import models
 
 
@@ -27,6 +28,15 @@ class AnalyticsSnapshotDaily(models.Model):
     wish_users = models.PositiveIntegerField(default=0)
     purchased_users = models.PositiveIntegerField(default=0)
 
+    # Fingerprint of the contributing orders (ids, totals, statuses) at build
+    # time; reconciliation compares it with the raw side per day.
+    source_count = models.PositiveIntegerField(null=True, blank=True)
+    source_checksum = models.BigIntegerField(null=True, blank=True)
+
+    # Mergeable quantile sketch (t-digest) of the day's paid/fulfilled
+    # Order.total values; see analyticsapp.services.sketches.
+    total_sketch = models.JSONField(default=dict, blank=True)
+
     computed_at = models.DateTimeField(auto_now=True)
 
     class Meta:
@@ -64,3 +74,385 @@ class AnalyticsProductDaily(models.Model):
 
     def __str__(self) -> str:
         return f"{self.day} product={self.product_id} units={self.units}"
+
+
+class AnalyticsCountryDaily(models.Model):
+    """
+    Daily rollup per shipping country: revenue/orders by order day and
+    refunds by refund day (same keying as AnalyticsSnapshotDaily).
+    `country` is the ISO-3166 alpha-2 code; "" groups orders without one.
+    """
+
+    day = models.DateField()
+    country = models.CharField(max_length=2, blank=True)
+
+    revenue = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+    orders = models.PositiveIntegerField(default=0)
+
+    refunded_amount = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+    refunded_orders = models.PositiveIntegerField(default=0)
+
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = (("day", "country"),)
+        indexes = [
+            models.Index(fields=["day"]),
+        ]
+        ordering = ["-day", "-revenue"]
+
+    def __str__(self) -> str:
+        return f"{self.day} country={self.country or '??'} orders={self.orders}"
+
+
+class AnalyticsProductRefundDaily(models.Model):
+    """
+    Daily refund rollup per product, keyed by refund day.
+
+    An order's refunded amount is allocated to its products pro rata by
+    line total; each refunded order counts once per product on its latest
+    refund day (same rule as AnalyticsSnapshotDaily refunds).
+    """
+
+    day = models.DateField()
+    product = models.ForeignKey(
+        "products.Product", on_delete=models.CASCADE, related_name="daily_refunds"
+    )
+
+    refunded_orders = models.PositiveIntegerField(default=0)
+    refunded_amount = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = (("day", "product"),)
+        indexes = [
+            models.Index(fields=["day"]),
+        ]
+        ordering = ["-day", "-refunded_amount"]
+
+    def __str__(self) -> str:
+        return f"{self.day} product={self.product_id} refunds={self.refunded_orders}"
+
+
+class AnalyticsRefundLatencyDaily(models.Model):
+    """
+    Refunded orders per refund day bucketed by purchase -> refund latency
+    (see refund_rollups.LATENCY_BUCKETS).
+    """
+
+    day = models.DateField()
+    bucket = models.CharField(max_length=16)
+
+    refunded_orders = models.PositiveIntegerField(default=0)
+    refunded_amount = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = (("day", "bucket"),)
+        indexes = [
+            models.Index(fields=["day"]),
+        ]
+        ordering = ["-day", "bucket"]
+
+    def __str__(self) -> str:
+        return f"{self.day} latency={self.bucket} refunds={self.refunded_orders}"
+
+
+class CustomerFirstOrder(models.Model):
+    """
+    Per-customer lifetime index (keyed by order email), maintained on write.
+
+    Holds first/last completed order timestamps, completed order count and
+    lifetime spend so new-vs-returning, repeat rate and LTV are index lookups
+    instead of GROUP BY scans over Order.
+    """
+
+    email = models.EmailField(unique=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+
+    first_order_at = models.DateTimeField()
+    last_order_at = models.DateTimeField()
+    order_count = models.PositiveIntegerField(default=0)
+
+    lifetime_spend = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+    lifetime_refunded_pennies = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["first_order_at"]),
+            models.Index(fields=["last_order_at"]),
+        ]
+        ordering = ["-first_order_at"]
+
+    def __str__(self) -> str:
+        return f"{self.email} first={self.first_order_at:%Y-%m-%d} orders={self.order_count}"
+
+
+class AnalyticsCohortMonthly(models.Model):
+    """
+    Monthly acquisition cohort x months-since-first-activity matrix cell.
+
+    source="orders": cohort = month of a customer's first completed order;
+      customers/orders/revenue are completed orders placed in activity_month.
+    source="subscriptions": cohort = month a subscription started;
+      customers = subscriptions still alive in activity_month, revenue = their MRR.
+    """
+
+    SOURCES = (
+        ("orders", "Orders"),
+        ("subscriptions", "Subscriptions"),
+    )
+
+    source = models.CharField(max_length=20, choices=SOURCES, default="orders")
+    cohort_month = models.DateField()
+    months_since = models.PositiveSmallIntegerField()
+    activity_month = models.DateField()
+
+    customers = models.PositiveIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0.00")
+    )
+
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = (("source", "cohort_month", "months_since"),)
+        indexes = [
+            models.Index(fields=["source", "activity_month"]),
+        ]
+        ordering = ["source", "cohort_month", "months_since"]
+
+    def __str__(self) -> str:
+        return f"{self.source} cohort={self.cohort_month} +{self.months_since}m"
+
+
+class CustomerSegment(models.Model):
+    """
+    Nightly RFM (recency / frequency / monetary) segment assignment per customer.
+
+    Scores are 1..5 quintiles across the whole customer base (5 = best).
+    """
+
+    email = models.EmailField(unique=True)
+
+    recency_days = models.PositiveIntegerField(default=0)
+    frequency = models.PositiveIntegerField(default=0)
+    monetary = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+
+    r_score = models.PositiveSmallIntegerField(default=1)
+    f_score = models.PositiveSmallIntegerField(default=1)
+    m_score = models.PositiveSmallIntegerField(default=1)
+    segment = models.CharField(max_length=32, db_index=True)
+
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["segment", "-monetary"]
+
+    def __str__(self) -> str:
+        return (
+            f"{self.email} {self.segment} R{self.r_score}F{self.f_score}M{self.m_score}"
+        )
+
+
+class UserFunnelState(models.Model):
+    """
+    Compact per-user funnel record: first timestamp of each funnel step.
+
+    Maintained on write (product view, wishlist, cart add, checkout, paid);
+    each column is set once and never moved later. Ordered funnels with
+    conversion windows are evaluated as one grouped query over this table.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="funnel_state",
+    )
+
+    first_product_view_at = models.DateTimeField(null=True, blank=True)
+    first_wishlist_at = models.DateTimeField(null=True, blank=True)
+    first_cart_add_at = models.DateTimeField(null=True, blank=True)
+    first_checkout_at = models.DateTimeField(null=True, blank=True)
+    first_paid_at = models.DateTimeField(null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["first_product_view_at"]),
+            models.Index(fields=["first_wishlist_at"]),
+            models.Index(fields=["first_cart_add_at"]),
+            models.Index(fields=["first_checkout_at"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"Funnel user={self.user_id}"
+
+
+class AnalyticsLiveCounter(models.Model):
+    """
+    Write-time running totals for a day ("today so far").
+
+    Bumped with F() increments from the paid/refund hooks and re-seeded from
+    the computed values whenever the builder snapshots that day, so it stays
+    consistent with AnalyticsSnapshotDaily semantics (revenue by order day,
+    refunds by refund day). `snapshot_kpis` merges today's row over the
+    (possibly stale) snapshot.
+    """
+
+    day = models.DateField(unique=True)
+
+    revenue = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+    orders = models.PositiveIntegerField(default=0)
+
+    refunded_amount = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+    refunded_orders = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-day"]
+
+    def __str__(self) -> str:
+        return f"Live counter {self.day}"
+
+
+class AnalyticsSnapshotHourly(models.Model):
+    """
+    Intraday tier: revenue/orders (by order hour) and refunds (by refund
+    hour) for recent days, keyed by the UTC hour start.
+
+    Bumped by the paid/refund hooks, rebuilt for the retention window by the
+    snapshot builder, and compacted away (after the covering daily rows
+    exist) once older than ANALYTICS_HOURLY_RETENTION_DAYS.
+    """
+
+    hour = models.DateTimeField(unique=True)
+
+    revenue = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+    orders = models.PositiveIntegerField(default=0)
+
+    refunded_amount = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+    refunded_orders = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-hour"]
+
+    def __str__(self) -> str:
+        return f"Hourly snapshot {self.hour:%Y-%m-%d %H:00}"
+
+
+class ExportJob(models.Model):
+    """
+    Background CSV export (run by `run_export_worker`, not the web worker).
+
+    Output is appended in keyset-ordered chunks; after each chunk the file is
+    fsync'ed and `cursor` / `bytes_written` are checkpointed, so a crashed job
+    resumes from the last checkpoint (anything past `bytes_written` is
+    truncated first) instead of starting over.
+    """
+
+    STATUS = (
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    )
+
+    kind = models.CharField(max_length=32)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS, default="queued")
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+
+    file_path = models.CharField(max_length=255, blank=True)
+    cursor = models.CharField(max_length=255, blank=True)
+    rows_written = models.PositiveIntegerField(default=0)
+    bytes_written = models.PositiveBigIntegerField(default=0)
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+        ]
+
+    @property
+    def progress_pct(self) -> float:
+        if self.status == "done":
+            return 100.0
+        if not self.total_rows:
+            return 0.0
+        return round(min(self.rows_written / self.total_rows, 1) * 100, 1)
+
+    def __str__(self) -> str:
+        return f"ExportJob #{self.id} {self.kind} ({self.status})"
+
+
+class AnalyticsLease(models.Model):
+    """
+    Named, time-limited lease used as a single-flight lock for heavy jobs
+    (e.g. snapshot rebuilds) across processes and hosts.
+
+    Acquire / renew / release are conditional UPDATEs, so this works the same
+    on SQLite and Postgres. A holder that stops renewing loses the lease once
+    `expires_at` passes. On release the holder records `last_result`, which
+    waiting invocations can reuse instead of redoing the work.
+    """
+
+    name = models.CharField(max_length=64, unique=True)
+    holder = models.CharField(max_length=64, blank=True)
+
+    acquired_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    released_at = models.DateTimeField(null=True, blank=True)
+    last_result = models.JSONField(default=dict, blank=True)
+
+    def __str__(self) -> str:
+        return f"Lease {self.name} ({self.holder or 'free'})"
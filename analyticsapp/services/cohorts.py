@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsCohortMonthly, CustomerFirstOrder
+from orders.models import Order
+from subscriptions.models import Subscription
+
+
+COMPLETED_STATUSES = ("paid", "fulfilled")
+ENDED_SUBSCRIPTION_STATUSES = ("canceled", "incomplete_expired")
+
+
+def _month_index(d: date) -> int:
+    return d.year * 12 + (d.month - 1)
+
+
+def _month_from_index(i: int) -> date:
+    return date(int(i) // 12, int(i) % 12 + 1, 1)
+
+
+def _local_month_index(dt) -> int:
+    return _month_index(timezone.localtime(dt).date())
+
+
+# ---------------------------------------------------------------------------
+# Incremental path (write-time)
+# ---------------------------------------------------------------------------
+
+
+def record_order_paid(order: Order) -> None:
+    """
+    Apply one newly-paid order to the orders cohort matrix.
+
+    Only the single (cohort, months_since) cell is touched, with F() increments:
+      - orders +1, revenue +total
+      - customers +1 only if this is the customer's first completed order in
+        the activity month (one indexed lookup on Order(email, status))
+
+    Expects CustomerFirstOrder to be refreshed first (same transaction).
+    Refunds/cancellations do not change the matrix: revenue is gross and only
+    pending orders can be canceled.
+
+    The increments are not idempotent: callers must invoke this once per
+    pending -> paid transition (see on_order_paid). The nightly
+    rebuild_cohorts() is the source of truth and replaces the cells, so any
+    drift lasts at most until the next full build.
+    """
+    email = (order.email or "").strip()
+    if not email or order.status not in COMPLETED_STATUSES:
+        return
+
+    first = (
+        CustomerFirstOrder.objects.filter(email=email)
+        .values_list("first_order_at", flat=True)
+        .first()
+    )
+    if first is None:
+        return
+
+    cohort_idx = _local_month_index(first)
+    activity_idx = _local_month_index(order.created_at)
+    months_since = max(activity_idx - cohort_idx, 0)
+    activity_month = _month_from_index(activity_idx)
+
+    orders_in_month = (
+        Order.objects.filter(
+            email=email,
+            status__in=COMPLETED_STATUSES,
+            created_at__year=activity_month.year,
+            created_at__month=activity_month.month,
+        )
+        .exclude(id=order.id)
+        .exists()
+    )
+
+    with transaction.atomic():
+        AnalyticsCohortMonthly.objects.get_or_create(
+            source="orders",
+            cohort_month=_month_from_index(cohort_idx),
+            months_since=months_since,
+            defaults={"activity_month": activity_month},
+        )
+        AnalyticsCohortMonthly.objects.filter(
+            source="orders",
+            cohort_month=_month_from_index(cohort_idx),
+            months_since=months_since,
+        ).update(
+            orders=F("orders") + 1,
+            revenue=F("revenue") + (order.total or Decimal("0.00")),
+            customers=F("customers") + (0 if orders_in_month else 1),
+            computed_at=timezone.now(),
+        )
+
+
+# ---------------------------------------------------------------------------
+# Vectorised recompute path (backfills / nightly rebuild)
+# ---------------------------------------------------------------------------
+
+
+def _cells_to_rows(
+    *,
+    source: str,
+    base: int,
+    n_offsets: int,
+    customers: np.ndarray,
+    orders: np.ndarray,
+    revenue_pennies: np.ndarray,
+) -> list[AnalyticsCohortMonthly]:
+    out = []
+    for cell in np.flatnonzero(customers):
+        cohort_idx = base + int(cell) // n_offsets
+        months_since = int(cell) % n_offsets
+        out.append(
+            AnalyticsCohortMonthly(
+                source=source,
+                cohort_month=_month_from_index(cohort_idx),
+                months_since=months_since,
+                activity_month=_month_from_index(cohort_idx + months_since),
+                customers=int(customers[cell]),
+                orders=int(orders[cell]),
+                revenue=Decimal(int(revenue_pennies[cell])) / Decimal("100"),
+            )
+        )
+    return out
+
+
+def _order_cohort_cells() -> list[AnalyticsCohortMonthly]:
+    rows = list(
+        Order.objects.filter(status__in=COMPLETED_STATUSES)
+        .exclude(email="")
+        .annotate(y=ExtractYear("created_at"), m=ExtractMonth("created_at"))
+        .values_list("email", "y", "m", "total")
+        .order_by()
+    )
+    if not rows:
+        return []
+
+    n = len(rows)
+    emails = np.array([r[0] for r in rows], dtype=object)
+    month = np.fromiter((r[1] * 12 + r[2] - 1 for r in rows), dtype=np.int64, count=n)
+    pennies = np.fromiter(
+        (int((r[3] or 0) * 100) for r in rows), dtype=np.int64, count=n
+    )
+
+    _, cust = np.unique(emails, return_inverse=True)
+    n_cust = int(cust.max()) + 1
+
+    first = np.full(n_cust, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(first, cust, month)
+    cohort = first[cust]
+    offset = month - cohort
+
+    base = int(cohort.min())
+    n_offsets = int(offset.max()) + 1
+    n_cells = (int(cohort.max()) - base + 1) * n_offsets
+    cell = (cohort - base) * n_offsets + offset
+
+    orders = np.bincount(cell, minlength=n_cells)
+    revenue = np.zeros(n_cells, dtype=np.int64)
+    np.add.at(revenue, cell, pennies)
+
+    # Distinct customers per cell: unique (cell, customer) pairs.
+    pairs = np.unique(cell * n_cust + cust)
+    customers = np.bincount(pairs // n_cust, minlength=n_cells)
+
+    return _cells_to_rows(
+        source="orders",
+        base=base,
+        n_offsets=n_offsets,
+        customers=customers,
+        orders=orders,
+        revenue_pennies=revenue,
+    )
+
+
+def _subscription_cohort_cells() -> list[AnalyticsCohortMonthly]:
+    rows = list(
+        Subscription.objects.values_list(
+            "created_at", "ended_at", "canceled_at", "status", "mrr_pennies"
+        ).order_by()
+    )
+    if not rows:
+        return []
+
+    current = _month_index(timezone.localdate())
+    n = len(rows)
+    start = np.fromiter(
+        (_local_month_index(r[0]) for r in rows), dtype=np.int64, count=n
+    )
+
+    # Exclusive end month: live subscriptions run through the current month;
+    # ended ones stop at their end month (but always count in their start month).
+    def _end(r) -> int:
+        ended = r[1] or r[2]
+        if ended is not None:
+            return _local_month_index(ended)
+        if r[3] in ENDED_SUBSCRIPTION_STATUSES:
+            return _local_month_index(r[0])
+        return current + 1
+
+    end = np.fromiter((_end(r) for r in rows), dtype=np.int64, count=n)
+    end = np.minimum(np.maximum(end, start + 1), current + 1)
+    mrr = np.fromiter((int(r[4] or 0) for r in rows), dtype=np.int64, count=n)
+
+    base = int(start.min())
+    n_cohorts = int(start.max()) - base + 1
+    n_offsets = int((end - start).max())
+
+    # Difference arrays along the months_since axis, then cumulative sum.
+    alive = np.zeros((n_cohorts, n_offsets + 1), dtype=np.int64)
+    value = np.zeros((n_cohorts, n_offsets + 1), dtype=np.int64)
+    row = start - base
+    np.add.at(alive, (row, 0), 1)
+    np.add.at(alive, (row, end - start), -1)
+    np.add.at(value, (row, 0), mrr)
+    np.add.at(value, (row, end - start), -mrr)
+
+    alive = np.cumsum(alive, axis=1)[:, :n_offsets].ravel()
+    value = np.cumsum(value, axis=1)[:, :n_offsets].ravel()
+
+    return _cells_to_rows(
+        source="subscriptions",
+        base=base,
+        n_offsets=n_offsets,
+        customers=alive,
+        orders=np.zeros_like(alive),
+        revenue_pennies=value,
+    )
+
+
+def rebuild_cohorts(*, batch_size: int = 1000) -> dict[str, int]:
+    """
+    Recompute the full cohort matrix for both sources in vectorised passes.
+    Reads every completed order, so it belongs in the nightly full build
+    (`build_analytics_snapshots` without --skip-rollups).
+
+    One narrow read per source, NumPy grouping in memory, then a replace of
+    the stored cells. Returns the number of cells written per source.
+    """
+    built = {
+        "orders": _order_cohort_cells(),
+        "subscriptions": _subscription_cohort_cells(),
+    }
+
+    with transaction.atomic():
+        for source, cells in built.items():
+            AnalyticsCohortMonthly.objects.filter(source=source).delete()
+            AnalyticsCohortMonthly.objects.bulk_create(cells, batch_size=batch_size)
+
+    return {source: len(cells) for source, cells in built.items()}
+
+
+# ---------------------------------------------------------------------------
+# Read path (dashboard + exports)
+# ---------------------------------------------------------------------------
+
+
+def cohort_rows(*, source: str = "orders", months: int = 12) -> list[dict]:
+    """
+    Flat cohort cells for the last `months` acquisition cohorts, with
+    cohort_size (months_since=0 customers) and retention_pct resolved.
+    """
+    months = max(1, int(months))
+    first_cohort = _month_from_index(_month_index(timezone.localdate()) - months + 1)
+
+    cells = list(
+        AnalyticsCohortMonthly.objects.filter(
+            source=source, cohort_month__gte=first_cohort
+        )
+        .order_by("cohort_month", "months_since")
+        .values(
+            "cohort_month",
+            "months_since",
+            "activity_month",
+            "customers",
+            "orders",
+            "revenue",
+        )
+    )
+
+    sizes = {c["cohort_month"]: c["customers"] for c in cells if c["months_since"] == 0}
+    for c in cells:
+        size = sizes.get(c["cohort_month"], 0)
+        c["cohort_size"] = size
+        c["retention_pct"] = round(c["customers"] / size * 100, 2) if size else 0.0
+    return cells
+
+
+def cohort_matrix(*, source: str = "orders", months: int = 12) -> dict:
+    """
+    Cohort matrix shaped for charts: one row per cohort month, one column per
+    months_since (None where the cell is in the future or empty).
+    """
+    cells = cohort_rows(source=source, months=months)
+
+    cohorts = sorted({c["cohort_month"] for c in cells})
+    n_offsets = max((c["months_since"] for c in cells), default=-1) + 1
+    pos = {m: i for i, m in enumerate(cohorts)}
+
+    retention = [[None] * n_offsets for _ in cohorts]
+    sizes = {}
+    for c in cells:
+        retention[pos[c["cohort_month"]]][c["months_since"]] = c["retention_pct"]
+        sizes[c["cohort_month"]] = c["cohort_size"]
+
+    return {
+        "source": source,
+        "cohorts": cohorts,
+        "months_since": list(range(n_offsets)),
+        "retention_pct": retention,
+        "sizes": [sizes.get(m, 0) for m in cohorts],
+    }
@@ -0,0 +1,300 @@
+"""
+Append-only columnar store of the daily analytics rollups, for notebooks and
+offline tools.
+
+Layout under the store root::
+
+    manifest.json               # tables, columns, dtypes, row counts, last day
+    snapshots/revenue.bin       # one raw little-endian fixed-width file per column
+    snapshots/orders.bin
+    product_daily/...
+
+Column files have no header, so `np.memmap(path, dtype, mode="r",
+shape=(rows,))` maps them zero-copy (see `load_table`). Money is stored as
+integer pennies, days as `datetime64[D]`, codes as fixed-width bytes.
+
+Appends only ever add complete days after the table's `last_day` (the last
+day the table covers, whether or not it had rows that day). A day is
+complete once its daily snapshot was built after the day ended; the
+watermark stops before the first day that isn't (not built yet, or built
+while still in progress), so a later run picks it up. Each
+append writes + fsyncs the column files first and then atomically replaces
+the manifest; the manifest row count is authoritative, so a crash mid-append
+leaves at most a torn tail that the next run truncates away. Days that were
+rebuilt after being appended need `--rebuild`.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from analyticsapp.models import (
+    AnalyticsCountryDaily,
+    AnalyticsProductDaily,
+    AnalyticsProductRefundDaily,
+    AnalyticsRefundLatencyDaily,
+    AnalyticsSnapshotDaily,
+)
+
+
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+
+# kind -> (numpy dtype, converter from the model value)
+_KINDS = {
+    "day": ("<M8[D]", lambda v: np.datetime64(v, "D")),
+    "pennies": ("<i8", lambda v: int(round((v or 0) * 100))),
+    "int": ("<i8", lambda v: int(v or 0)),
+    "count": ("<i4", lambda v: int(v or 0)),
+    "code2": ("S2", lambda v: (v or "").encode("ascii", "replace")),
+    "code8": ("S8", lambda v: (v or "").encode("ascii", "replace")),
+}
+
+# table -> (model, ordering, [(column, model field, kind)])
+TABLES = {
+    "snapshots": (
+        AnalyticsSnapshotDaily,
+        ("day",),
+        [
+            ("day", "day", "day"),
+            ("revenue_pennies", "revenue", "pennies"),
+            ("orders", "orders", "count"),
+            ("aov_pennies", "aov", "pennies"),
+            ("refunded_amount_pennies", "refunded_amount", "pennies"),
+            ("refunded_orders", "refunded_orders", "count"),
+            ("unique_customers", "unique_customers", "count"),
+            ("repeat_customers", "repeat_customers", "count"),
+            ("wish_users", "wish_users", "count"),
+            ("purchased_users", "purchased_users", "count"),
+        ],
+    ),
+    "product_daily": (
+        AnalyticsProductDaily,
+        ("day", "product_id"),
+        [
+            ("day", "day", "day"),
+            ("product_id", "product_id", "int"),
+            ("units", "units", "count"),
+            ("revenue_pennies", "revenue", "pennies"),
+        ],
+    ),
+    "country_daily": (
+        AnalyticsCountryDaily,
+        ("day", "country"),
+        [
+            ("day", "day", "day"),
+            ("country", "country", "code2"),
+            ("revenue_pennies", "revenue", "pennies"),
+            ("orders", "orders", "count"),
+            ("refunded_amount_pennies", "refunded_amount", "pennies"),
+            ("refunded_orders", "refunded_orders", "count"),
+        ],
+    ),
+    "product_refunds": (
+        AnalyticsProductRefundDaily,
+        ("day", "product_id"),
+        [
+            ("day", "day", "day"),
+            ("product_id", "product_id", "int"),
+            ("refunded_orders", "refunded_orders", "count"),
+            ("refunded_amount_pennies", "refunded_amount", "pennies"),
+        ],
+    ),
+    "refund_latency": (
+        AnalyticsRefundLatencyDaily,
+        ("day", "bucket"),
+        [
+            ("day", "day", "day"),
+            ("bucket", "bucket", "code8"),
+            ("refunded_orders", "refunded_orders", "count"),
+            ("refunded_amount_pennies", "refunded_amount", "pennies"),
+        ],
+    ),
+}
+
+
+def columnar_root() -> Path:
+    return Path(
+        getattr(settings, "ANALYTICS_COLUMNAR_ROOT", None)
+        or Path(settings.MEDIA_ROOT) / "columnar"
+    )
+
+
+def read_manifest(root: Path) -> dict:
+    path = root / MANIFEST
+    if not path.exists():
+        return {"version": FORMAT_VERSION, "tables": {}}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _write_manifest(root: Path, manifest: dict) -> None:
+    tmp = root / (MANIFEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, root / MANIFEST)
+
+
+def _table_meta(table: str) -> dict:
+    _, ordering, columns = TABLES[table]
+    return {
+        "rows": 0,
+        "last_day": None,
+        "order_by": list(ordering),
+        "columns": {
+            name: {"dtype": np.dtype(_KINDS[kind][0]).str, "file": f"{name}.bin"}
+            for name, _, kind in columns
+        },
+    }
+
+
+def _complete_until(after: date | None, until: date) -> date | None:
+    """
+    Last day in (after, until] up to which every day is complete: it has a
+    daily snapshot computed after the day ended (the builder writes every
+    rollup tier of a day together). None if the first such day isn't.
+    """
+    snaps = AnalyticsSnapshotDaily.objects.filter(day__lte=until)
+    if after:
+        snaps = snaps.filter(day__gt=after)
+
+    done = None
+    expected = after + timedelta(days=1) if after else None
+    for day, computed_at in snaps.order_by("day").values_list("day", "computed_at"):
+        if expected is not None and day != expected:
+            break  # gap: that day was never built
+        if timezone.localdate(computed_at) <= day:
+            break  # built while the day was still in progress
+        done, expected = day, day + timedelta(days=1)
+    return done
+
+
+def append_table(
+    root: Path, manifest: dict, table: str, *, until: date, chunk_size: int = 20000
+) -> int:
+    """
+    Append complete days (last_day, until] of one rollup table (see
+    _complete_until). Updates `manifest` in place (the caller persists it).
+    Returns rows appended.
+    """
+    model, ordering, columns = TABLES[table]
+    meta = manifest["tables"].get(table) or _table_meta(table)
+    table_dir = root / table
+    table_dir.mkdir(parents=True, exist_ok=True)
+
+    # Drop any torn tail left by a crashed append (manifest is authoritative).
+    for name, col in meta["columns"].items():
+        path = table_dir / col["file"]
+        size = meta["rows"] * np.dtype(col["dtype"]).itemsize
+        with open(path, "ab") as fh:
+            fh.truncate(size)
+
+    last_day = date.fromisoformat(meta["last_day"]) if meta["last_day"] else None
+    complete = _complete_until(last_day, until)
+    if complete is None:
+        manifest["tables"][table] = meta
+        return 0
+
+    qs = model.objects.filter(day__lte=complete)
+    if last_day:
+        qs = qs.filter(day__gt=last_day)
+    fields = [field for _, field, _ in columns]
+    rows_iter = qs.order_by(*ordering).values_list(*fields).iterator(chunk_size)
+
+    handles = {
+        name: open(table_dir / meta["columns"][name]["file"], "ab")
+        for name, _, _ in columns
+    }
+    appended = 0
+    try:
+        while True:
+            chunk = []
+            for row in rows_iter:
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    break
+            if not chunk:
+                break
+
+            for i, (name, _, kind) in enumerate(columns):
+                dtype, convert = _KINDS[kind]
+                arr = np.array([convert(r[i]) for r in chunk], dtype=dtype)
+                handles[name].write(arr.tobytes())
+            appended += len(chunk)
+
+        for fh in handles.values():
+            fh.flush()
+            os.fsync(fh.fileno())
+    finally:
+        for fh in handles.values():
+            fh.close()
+
+    meta["rows"] += appended
+    meta["last_day"] = complete.isoformat()
+    manifest["tables"][table] = meta
+    return appended
+
+
+def build_columnar_store(
+    root: Path | None = None,
+    *,
+    tables: list[str] | None = None,
+    until: date | None = None,
+    rebuild: bool = False,
+) -> dict[str, int]:
+    """
+    Append new complete days (default: up to yesterday) for each table and
+    persist the manifest. With `rebuild` the tables are rewritten from
+    scratch. Returns {table: rows appended}.
+    """
+    root = Path(root or columnar_root())
+    root.mkdir(parents=True, exist_ok=True)
+    until = until or timezone.localdate() - timedelta(days=1)
+
+    manifest = read_manifest(root)
+    if manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported columnar store version {manifest.get('version')!r}; "
+            "rebuild into an empty directory."
+        )
+
+    appended = {}
+    for table in tables or list(TABLES):
+        if rebuild:
+            manifest["tables"].pop(table, None)
+            for path in (root / table).glob("*.bin"):
+                path.unlink()
+        appended[table] = append_table(root, manifest, table, until=until)
+        manifest["generated_at"] = timezone.now().isoformat()
+        _write_manifest(root, manifest)
+    return appended
+
+
+def load_table(root: Path | str, table: str) -> dict[str, np.ndarray]:
+    """
+    Memory-map one table's columns read-only (zero-copy), e.g. in a notebook:
+
+        cols = load_table("/app/media/columnar", "snapshots")
+        cols["revenue_pennies"][cols["day"] >= np.datetime64("2026-01-01")].sum()
+    """
+    root = Path(root)
+    meta = read_manifest(root)["tables"][table]
+    rows = meta["rows"]
+    return {
+        name: (
+            np.memmap(
+                root / table / col["file"], dtype=col["dtype"], mode="r", shape=(rows,)
+            )
+            if rows
+            else np.empty(0, dtype=col["dtype"])
+        )
+        for name, col in meta["columns"].items()
+    }
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsCountryDaily
+from orders.models import Order
+
+
+COMPLETED_STATUSES = ("paid", "fulfilled")
+
+_CENT = Decimal("0.01")
+
+
+def compute_country_days(
+    start_day: date, end_day: date
+) -> dict[tuple[date, str], dict]:
+    """
+    Per (day, shipping country) revenue/orders and refunds for the whole range
+    from two grouped queries. Returns {(day, country): {...}}; only pairs with
+    activity are present.
+    """
+    start_dt = timezone.make_aware(datetime.combine(start_day, time.min))
+    end_dt = timezone.make_aware(datetime.combine(end_day, time.max))
+
+    out: dict[tuple[date, str], dict] = {}
+
+    def row(day: date, country: str) -> dict:
+        return out.setdefault(
+            (day, (country or "").upper()),
+            {
+                "revenue": Decimal("0.00"),
+                "orders": 0,
+                "refunded_amount": Decimal("0.00"),
+                "refunded_orders": 0,
+            },
+        )
+
+    paid = (
+        Order.objects.filter(
+            status__in=COMPLETED_STATUSES, created_at__range=(start_dt, end_dt)
+        )
+        .annotate(day=TruncDate("created_at"))
+        .values("day", "shipping_country")
+        .annotate(n=Count("id"), revenue=Sum("total"))
+        .order_by()
+    )
+    for r in paid:
+        target = row(r["day"], r["shipping_country"])
+        target["orders"] += int(r["n"])
+        target["revenue"] = (target["revenue"] + (r["revenue"] or 0)).quantize(_CENT)
+
+    refunds = (
+        Order.objects.filter(
+            refund_amount_pennies__gt=0,
+            refunded_at__isnull=False,
+            refunded_at__range=(start_dt, end_dt),
+        )
+        .annotate(day=TruncDate("refunded_at"))
+        .values("day", "shipping_country")
+        .annotate(n=Count("id"), pennies=Sum("refund_amount_pennies"))
+        .order_by()
+    )
+    for r in refunds:
+        target = row(r["day"], r["shipping_country"])
+        target["refunded_orders"] += int(r["n"])
+        target["refunded_amount"] = (
+            target["refunded_amount"] + Decimal(int(r["pennies"] or 0)) / Decimal("100")
+        ).quantize(_CENT)
+
+    return out
+
+
+def write_country_days(days: Iterable[date], rows: dict) -> int:
+    """
+    Replace the stored country rows for `days` with `rows` (from
+    compute_country_days). Returns rows written.
+    """
+    days = set(days)
+    objs = [
+        AnalyticsCountryDaily(day=day, country=country, **values)
+        for (day, country), values in rows.items()
+        if day in days
+    ]
+    with transaction.atomic():
+        AnalyticsCountryDaily.objects.filter(day__in=days).delete()
+        AnalyticsCountryDaily.objects.bulk_create(objs)
+    return len(objs)
+
+
+def country_rollup(days: int, limit: int | None = None) -> list[dict]:
+    """
+    Revenue/orders/refunds per shipping country over the last `days` days,
+    highest revenue first, read from AnalyticsCountryDaily only.
+    """
+    end_day = timezone.localdate()
+    start_day = end_day - timedelta(days=days - 1)
+
+    rows = (
+        AnalyticsCountryDaily.objects.filter(day__range=(start_day, end_day))
+        .values("country")
+        .annotate(
+            revenue=Sum("revenue"),
+            orders=Sum("orders"),
+            refunded_amount=Sum("refunded_amount"),
+            refunded_orders=Sum("refunded_orders"),
+        )
+        .order_by("-revenue", "country")
+    )
+    if limit:
+        rows = rows[:limit]
+
+    return [
+        {
+            "country": r["country"] or "Unknown",
+            "revenue": Decimal(r["revenue"] or 0).quantize(_CENT),
+            "orders": r["orders"] or 0,
+            "refunded_amount": Decimal(r["refunded_amount"] or 0).quantize(_CENT),
+            "refunded_orders": r["refunded_orders"] or 0,
+        }
+        for r in rows
+    ]
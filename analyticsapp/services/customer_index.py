@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, OuterRef, Subquery, Sum
+
+from analyticsapp.models import CustomerFirstOrder
+from orders.models import Order
+
+
+COMPLETED_STATUSES = ("paid", "fulfilled")
+
+
+def _completed_orders():
+    return Order.objects.filter(status__in=COMPLETED_STATUSES).exclude(email="")
+
+
+def _latest_user_id(qs):
+    """user_id of the most recent order in `qs` that has a user (or None)."""
+    return (
+        qs.filter(user__isnull=False).order_by("-created_at", "-id").values("user_id")
+    )
+
+
+def refresh_customer(email: str) -> CustomerFirstOrder | None:
+    """
+    Recompute one customer's index row from their completed orders.
+
+    Called whenever an order for `email` becomes paid, refunded or canceled.
+    Only that customer's orders are read (Order(email, status) index), so the
+    update stays O(orders per customer) and is idempotent under retries.
+    Removes the row when the customer no longer has any completed order.
+    """
+    email = (email or "").strip()
+    if not email:
+        return None
+
+    qs = _completed_orders().filter(email=email)
+    agg = qs.aggregate(
+        first_order_at=Min("created_at"),
+        last_order_at=Max("created_at"),
+        order_count=Count("id"),
+        lifetime_spend=Sum("total"),
+        lifetime_refunded_pennies=Sum("refund_amount_pennies"),
+    )
+
+    if not agg["order_count"]:
+        CustomerFirstOrder.objects.filter(email=email).delete()
+        return None
+
+    latest = _latest_user_id(qs).first()
+    latest_user_id = latest["user_id"] if latest else None
+
+    obj, _created = CustomerFirstOrder.objects.update_or_create(
+        email=email,
+        defaults={
+            "user_id": latest_user_id,
+            "first_order_at": agg["first_order_at"],
+            "last_order_at": agg["last_order_at"],
+            "order_count": int(agg["order_count"]),
+            "lifetime_spend": agg["lifetime_spend"] or Decimal("0.00"),
+            "lifetime_refunded_pennies": int(agg["lifetime_refunded_pennies"] or 0),
+        },
+    )
+    return obj
+
+
+def rebuild_customer_index(*, batch_size: int = 1000) -> int:
+    """
+    Full backfill of CustomerFirstOrder in one grouped pass over completed orders.
+
+    The index is maintained on write (refresh_customer); this full GROUP BY
+    only runs from `build_analytics_snapshots --rebuild-index` (e.g. after a
+    bulk import that bypassed the order hooks). `user` is the latest order's
+    user, as in refresh_customer. Returns the number of rows.
+    """
+    rows = (
+        _completed_orders()
+        .values("email")
+        .annotate(
+            first_order_at=Min("created_at"),
+            last_order_at=Max("created_at"),
+            order_count=Count("id"),
+            lifetime_spend=Sum("total"),
+            lifetime_refunded_pennies=Sum("refund_amount_pennies"),
+            user_id=Subquery(
+                _latest_user_id(_completed_orders().filter(email=OuterRef("email")))[:1]
+            ),
+        )
+        .order_by()
+    )
+
+    objs = [
+        CustomerFirstOrder(
+            email=r["email"],
+            user_id=r["user_id"],
+            first_order_at=r["first_order_at"],
+            last_order_at=r["last_order_at"],
+            order_count=int(r["order_count"]),
+            lifetime_spend=r["lifetime_spend"] or Decimal("0.00"),
+            lifetime_refunded_pennies=int(r["lifetime_refunded_pennies"] or 0),
+        )
+        for r in rows
+    ]
+
+    with transaction.atomic():
+        CustomerFirstOrder.objects.exclude(
+            email__in=_completed_orders().values("email")
+        ).delete()
+        CustomerFirstOrder.objects.bulk_create(
+            objs,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["email"],
+            update_fields=[
+                "user",
+                "first_order_at",
+                "last_order_at",
+                "order_count",
+                "lifetime_spend",
+                "lifetime_refunded_pennies",
+                "updated_at",
+            ],
+        )
+
+    return len(objs)
@@ -1,4 +1,8 @@
-from django.db.models import Count
+from decimal import Decimal
+
+from django.db.models import Avg
+
+from analyticsapp.models import CustomerFirstOrder
 from orders.models import Order
 
 
@@ -6,19 +10,35 @@ COMPLETED_STATUSES = ("paid", "fulfilled")
 
 
 def customer_kpis(start, end):
-    customers = (
+    """
+    Customer KPIs for the window, resolved against the CustomerFirstOrder index.
+
+    - unique: distinct customers (emails) with a completed order in the window
+    - new: customers whose FIRST completed order falls inside the window
+    - repeat: returning customers (first completed order before the window),
+      i.e. exact repeat buyers even when earlier orders are outside the window
+    - ltv: average lifetime spend of the window's customers
+    """
+    window_emails = (
         Order.objects.filter(
             status__in=COMPLETED_STATUSES, created_at__range=(start, end)
         )
+        .exclude(email="")
         .values("email")
-        .annotate(orders=Count("id"))
     )
-    unique = customers.count()
-    repeat = customers.filter(orders__gt=1).count()
+    active = CustomerFirstOrder.objects.filter(email__in=window_emails)
+
+    unique = active.count()
+    new = active.filter(first_order_at__gte=start).count()
+    repeat = max(unique - new, 0)
     repeat_rate = (repeat / unique * 100) if unique else 0.0
 
+    ltv = active.aggregate(v=Avg("lifetime_spend"))["v"] or Decimal("0.00")
+
     return {
         "unique": unique,
+        "new": new,
         "repeat": repeat,
         "repeat_rate": round(repeat_rate, 2),
+        "ltv": Decimal(ltv).quantize(Decimal("0.01")),
     }
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+from django.conf import settings
+
+
+DEFAULT_MAX_POINTS = 120
+
+
+def _bucket_edges(n: int, buckets: int) -> np.ndarray:
+    """Edges splitting the interior points 1..n-2 into `buckets` near-equal runs."""
+    return np.linspace(1, n - 1, buckets + 1).astype(np.int64)
+
+
+def lttb_indices(y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets over evenly spaced x (point index).
+
+    Keeps the first and last point, then per bucket the point forming the
+    largest triangle with the previously kept point and the next bucket's
+    mean. Bucket selection is inherently sequential; the per-bucket area
+    search is vectorised.
+    """
+    n = y.size
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    y = y.astype(np.float64)
+    x = np.arange(n, dtype=np.float64)
+    edges = _bucket_edges(n, threshold - 2)
+
+    # Next-bucket means for every bucket at once (last bucket uses the end point).
+    sums = np.add.reduceat(y[1 : n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    means_y = np.append((sums / counts)[1:], y[-1])
+    means_x = np.append(((edges[:-1] + edges[1:] - 1) / 2)[1:], x[-1])
+
+    out = np.empty(threshold, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for b in range(threshold - 2):
+        lo, hi = edges[b], edges[b + 1]
+        area = np.abs(
+            (x[a] - means_x[b]) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (means_y[b] - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        out[b + 1] = a
+    return out
+
+
+def minmax_indices(y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Min/max bucketing: keep each bucket's lowest and highest point (fully
+    vectorised). Cheaper than LTTB and guarantees every extreme survives.
+    """
+    n = y.size
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+
+    buckets = max((threshold - 2) // 2, 1)
+    edges = _bucket_edges(n, buckets)
+    starts = edges[:-1]
+    interior = y[1 : n - 1]
+
+    bucket_of = np.repeat(np.arange(buckets), np.diff(edges))
+    hi = np.maximum.reduceat(interior, starts - 1)[bucket_of] == interior
+    lo = np.minimum.reduceat(interior, starts - 1)[bucket_of] == interior
+
+    # First matching position per bucket (ties resolve to the earliest point).
+    first_hi = np.unique(bucket_of[hi], return_index=True)[1]
+    first_lo = np.unique(bucket_of[lo], return_index=True)[1]
+    picked = np.concatenate(
+        (
+            [0],
+            np.flatnonzero(hi)[first_hi] + 1,
+            np.flatnonzero(lo)[first_lo] + 1,
+            [n - 1],
+        )
+    )
+    return np.unique(picked)
+
+
+METHODS = {"lttb": lttb_indices, "minmax": minmax_indices}
+
+
+def _max_points(max_points: int | None) -> int:
+    if max_points is None:
+        return int(getattr(settings, "ANALYTICS_CHART_MAX_POINTS", DEFAULT_MAX_POINTS))
+    return max_points
+
+
+def downsample_series(
+    x: Sequence,
+    y: Sequence,
+    *,
+    max_points: int | None = None,
+    method: str = "lttb",
+) -> tuple[list, list]:
+    """
+    Cap a chart series at `max_points` (default ANALYTICS_CHART_MAX_POINTS),
+    preserving its visual shape. Short series are returned unchanged.
+    """
+    max_points = _max_points(max_points)
+    if len(y) <= max_points:
+        return list(x), list(y)
+
+    idx = METHODS[method](np.asarray(y, dtype=np.float64), max_points)
+    return [x[i] for i in idx], [y[i] for i in idx]
+
+
+def downsample_rows(
+    rows: Sequence[dict],
+    fields: dict[str, str],
+    *,
+    max_points: int | None = None,
+) -> list[dict]:
+    """
+    Cap a multi-series table (one dict per x) at `max_points` whole rows.
+
+    `fields` maps each plotted column to its method ("lttb" / "minmax"). The
+    budget is split evenly between them and the picked rows are unioned, so a
+    spike in any one series keeps its row. Short tables are returned unchanged.
+    """
+    max_points = _max_points(max_points)
+    if len(rows) <= max_points:
+        return list(rows)
+
+    budget = max_points // len(fields)
+    picked = np.unique(
+        np.concatenate(
+            [
+                METHODS[method](
+                    np.array([float(r[f] or 0) for r in rows], dtype=np.float64),
+                    budget,
+                )
+                for f, method in fields.items()
+            ]
+        )
+    )
+    return [rows[i] for i in picked]
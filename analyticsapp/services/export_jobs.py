@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import csv
+import io
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from analyticsapp.models import CustomerSegment, ExportJob
+from orders.models import Order
+
+
+COMPLETED_STATUSES = ("paid", "fulfilled")
+
+ORDERS_EXPORT_HEADERS = [
+    "OrderID",
+    "Email",
+    "Total",
+    "Status",
+    "CreatedAt",
+    "RefundStatus",
+    "RefundPennies",
+    "RefundedAt",
+]
+CUSTOMERS_EXPORT_HEADERS = ["Email", "Orders", "TotalSpent"]
+SEGMENTS_EXPORT_HEADERS = [
+    "Email",
+    "Segment",
+    "R",
+    "F",
+    "M",
+    "RecencyDays",
+    "Orders",
+    "Monetary",
+]
+
+
+def order_export_row(o: Order) -> list:
+    return [
+        o.id,
+        o.email,
+        o.total,
+        o.status,
+        o.created_at.isoformat(),
+        o.refund_status,
+        o.refund_amount_pennies,
+        o.refunded_at.isoformat() if o.refunded_at else "",
+    ]
+
+
+def customer_export_row(r: dict) -> list:
+    return [r["email"], r["orders"], r["total_spent"]]
+
+
+def segment_export_row(s: CustomerSegment) -> list:
+    return [
+        s.email,
+        s.segment,
+        s.r_score,
+        s.f_score,
+        s.m_score,
+        s.recency_days,
+        s.frequency,
+        s.monetary,
+    ]
+
+
+def _window(params: dict) -> tuple[datetime, datetime]:
+    return (
+        datetime.fromisoformat(params["start"]),
+        datetime.fromisoformat(params["end"]),
+    )
+
+
+def _orders_qs(params: dict):
+    return Order.objects.filter(
+        status__in=COMPLETED_STATUSES, created_at__range=_window(params)
+    )
+
+
+def _customers_qs(params: dict):
+    return (
+        Order.objects.filter(
+            status__in=COMPLETED_STATUSES, created_at__range=_window(params)
+        )
+        .values("email")
+        .annotate(orders=Count("id"), total_spent=Sum("total"))
+    )
+
+
+def _segments_qs(params: dict):
+    qs = CustomerSegment.objects.all()
+    if params.get("segment"):
+        qs = qs.filter(segment=params["segment"])
+    return qs
+
+
+# kind -> how to page through it. Jobs page by a unique key (keyset), not by
+# OFFSET, so a resumed job continues exactly after the last checkpointed row.
+EXPORT_KINDS = {
+    "orders": {
+        "headers": ORDERS_EXPORT_HEADERS,
+        "queryset": _orders_qs,
+        "key": "id",
+        "row": order_export_row,
+    },
+    "customers": {
+        "headers": CUSTOMERS_EXPORT_HEADERS,
+        "queryset": _customers_qs,
+        "key": "email",
+        "row": customer_export_row,
+    },
+    "segments": {
+        "headers": SEGMENTS_EXPORT_HEADERS,
+        "queryset": _segments_qs,
+        "key": "email",
+        "row": segment_export_row,
+    },
+}
+
+
+def export_root() -> Path:
+    return Path(
+        getattr(settings, "ANALYTICS_EXPORT_ROOT", None)
+        or Path(settings.MEDIA_ROOT) / "exports"
+    )
+
+
+def window_params(days: int) -> dict:
+    """Freeze a rolling window at enqueue time so resumed chunks stay consistent."""
+    end = timezone.now()
+    start = end - timedelta(days=days)
+    return {"days": days, "start": start.isoformat(), "end": end.isoformat()}
+
+
+def enqueue_export(kind: str, params: dict, *, user=None) -> ExportJob:
+    if kind not in EXPORT_KINDS:
+        raise ValueError(f"Unknown export kind: {kind}")
+    return ExportJob.objects.create(
+        kind=kind, params=params, requested_by=user if user and user.pk else None
+    )
+
+
+def claim_next_job(*, stale_after: timedelta) -> ExportJob | None:
+    """
+    Claim the oldest queued job, or a running job whose worker stopped
+    heart-beating (crash/restart). The claim is a conditional UPDATE, so two
+    workers can never pick up the same job, and it bumps `attempts`, which
+    run_export_job checks before each write so a stalled previous owner
+    stops instead of appending to the same file.
+    """
+    now = timezone.now()
+    candidates = ExportJob.objects.filter(
+        Q(status="queued") | Q(status="running", heartbeat_at__lt=now - stale_after)
+    ).order_by("created_at")
+
+    for job in candidates[:10]:
+        claimed = ExportJob.objects.filter(
+            id=job.id, status=job.status, heartbeat_at=job.heartbeat_at
+        ).update(
+            status="running",
+            heartbeat_at=now,
+            attempts=F("attempts") + 1,
+            started_at=job.started_at or now,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def _encode(rows: list[list]) -> bytes:
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    return buf.getvalue().encode("utf-8")
+
+
+class ExportJobLost(Exception):
+    """Another worker re-claimed the job after our heartbeat went stale."""
+
+
+def _checkpoint(job: ExportJob, **fields) -> None:
+    """
+    Save `fields` (plus a fresh heartbeat) only while this worker still owns
+    the job: every claim bumps `attempts`, so a stale owner's conditional
+    UPDATE matches no row and raises ExportJobLost instead of writing on.
+    """
+    fields["heartbeat_at"] = timezone.now()
+    owned = ExportJob.objects.filter(
+        id=job.id, status="running", attempts=job.attempts
+    ).update(**fields)
+    if not owned:
+        raise ExportJobLost(f"ExportJob #{job.id} was claimed by another worker")
+    for name, value in fields.items():
+        setattr(job, name, value)
+
+
+def run_export_job(job: ExportJob, *, chunk_size: int = 5000) -> ExportJob:
+    """
+    Write (or resume) a job claimed by claim_next_job in chunks,
+    checkpointing after each chunk.
+
+    On resume the file is truncated back to the last checkpoint, dropping any
+    partially written chunk, and paging restarts after the checkpointed key.
+    Ownership is re-checked (and the heartbeat renewed) before every write;
+    if another worker took the job over, this one stops without touching the
+    file or the job's status.
+    """
+    spec = EXPORT_KINDS[job.kind]
+    key = spec["key"]
+    qs = spec["queryset"](job.params)
+
+    root = export_root()
+    root.mkdir(parents=True, exist_ok=True)
+    path = Path(job.file_path) if job.file_path else root / f"export_{job.id}.csv"
+
+    try:
+        total_rows = qs.count() if job.total_rows is None else job.total_rows
+        _checkpoint(job, file_path=str(path), total_rows=total_rows)
+
+        if job.bytes_written and path.exists():
+            with path.open("r+b") as fh:
+                fh.truncate(job.bytes_written)
+        else:
+            path.write_bytes(_encode([spec["headers"]]))
+            _checkpoint(
+                job, cursor="", rows_written=0, bytes_written=path.stat().st_size
+            )
+
+        while True:
+            page = qs.order_by(key)
+            if job.cursor:
+                after = int(job.cursor) if key == "id" else job.cursor
+                page = page.filter(**{f"{key}__gt": after})
+            chunk = list(page[:chunk_size])
+            if not chunk:
+                break
+
+            data = _encode([spec["row"](r) for r in chunk])
+            _checkpoint(job)  # still ours? (also keeps the heartbeat fresh)
+            with path.open("ab") as fh:
+                fh.write(data)
+                fh.flush()
+                os.fsync(fh.fileno())
+
+            last = chunk[-1]
+            _checkpoint(
+                job,
+                cursor=str(last[key] if isinstance(last, dict) else getattr(last, key)),
+                rows_written=job.rows_written + len(chunk),
+                bytes_written=job.bytes_written + len(data),
+            )
+
+        _checkpoint(job, status="done", finished_at=timezone.now())
+    except ExportJobLost:
+        job.refresh_from_db()
+    except Exception as exc:
+        ExportJob.objects.filter(
+            id=job.id, status="running", attempts=job.attempts
+        ).update(status="failed", error=str(exc)[:2000], finished_at=timezone.now())
+        job.refresh_from_db()
+
+    return job
+
+
+def job_payload(job: ExportJob) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "rows_written": job.rows_written,
+        "total_rows": job.total_rows,
+        "progress_pct": job.progress_pct,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def purge_expired_exports(*, retention_days: int | None = None) -> int:
+    """
+    Delete finished (done / failed) export jobs older than the retention
+    period together with their files. Returns jobs deleted.
+    """
+    if retention_days is None:
+        retention_days = settings.ANALYTICS_EXPORT_RETENTION_DAYS
+    cutoff = timezone.now() - timedelta(days=max(retention_days, 1))
+
+    expired = ExportJob.objects.filter(
+        status__in=("done", "failed"), finished_at__lt=cutoff
+    )
+    for path in expired.exclude(file_path="").values_list("file_path", flat=True):
+        Path(path).unlink(missing_ok=True)
+    deleted, _ = expired.delete()
+    return deleted
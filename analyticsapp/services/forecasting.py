@@ -0,0 +1,254 @@
+"""
+Revenue and MRR projections from the snapshot / subscription history.
+
+Both series are fitted with damped-trend exponential smoothing: additive
+Holt-Winters with a weekly season for daily revenue, Holt's linear method
+for MRR (no weekly pattern). The smoothing parameters are picked from a small
+grid by one-step-ahead squared error, and the whole grid is fitted in a
+single pass over the history (each step updates every candidate at once as
+NumPy vectors), so a year of history fits in a few milliseconds.
+
+Forecasts only change when a complete day lands, a snapshot is rebuilt or a
+subscription changes, so `cached_forecasts()` keys the result on that
+watermark and page loads never refit.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsSnapshotDaily
+from subscriptions.models import Subscription
+
+
+HISTORY_DAYS = 365
+FORECAST_HORIZONS = (30, 90)
+FORECAST_CACHE_TTL = 24 * 3600
+
+ALPHAS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.7)
+BETAS = (0.01, 0.05, 0.1, 0.2)
+GAMMAS = (0.05, 0.1, 0.2, 0.3)
+DAMPING = 0.98
+
+# Never-started subscriptions (and trials) carry no MRR.
+NON_MRR_STATUSES = ("incomplete", "incomplete_expired", "trialing")
+LIVE_MRR_STATUSES = ("active", "past_due")
+
+_CENT = Decimal("0.01")
+
+
+def fit_smoothing(y: np.ndarray, *, season: int | None = 7) -> dict | None:
+    """
+    Fit damped additive Holt-Winters (Holt's linear method when `season` is
+    None) over the whole parameter grid at once and keep the best candidate.
+    Needs two full seasons (or 4 points) of history; returns None otherwise.
+    """
+    y = np.asarray(y, dtype=float)
+    m = season or 1
+    n = len(y)
+    if n < max(2 * m, 4):
+        return None
+
+    grid = np.array(
+        np.meshgrid(ALPHAS, BETAS, GAMMAS if season else (0.0,), indexing="ij")
+    ).reshape(3, -1)
+    a, b, g = grid
+    k = a.size
+
+    if season:
+        level0 = y[:m].mean()
+        trend0 = (y[m : 2 * m].mean() - level0) / m
+        seasonal0 = y[:m] - level0
+    else:
+        level0, trend0, seasonal0 = y[0], y[1] - y[0], np.zeros(1)
+
+    level = np.full(k, level0)
+    trend = np.full(k, trend0)
+    seasonal = np.tile(seasonal0, (k, 1))
+    sse = np.zeros(k)
+
+    for t in range(n):
+        s = seasonal[:, t % m]
+        err = y[t] - (level + DAMPING * trend + s)
+        if t >= m:
+            sse += err * err
+        new_level = a * (y[t] - s) + (1 - a) * (level + DAMPING * trend)
+        trend = b * (new_level - level) + (1 - b) * DAMPING * trend
+        seasonal[:, t % m] = g * (y[t] - new_level) + (1 - g) * s
+        level = new_level
+
+    best = int(np.argmin(sse))
+    return {
+        "n": n,
+        "season": m,
+        "level": float(level[best]),
+        "trend": float(trend[best]),
+        "seasonal": seasonal[best].copy(),
+        "alpha": float(a[best]),
+        "beta": float(b[best]),
+        "gamma": float(g[best]),
+        "sigma": float(np.sqrt(sse[best] / max(n - m, 1))),
+    }
+
+
+def project(fit: dict, horizon: int) -> dict[str, np.ndarray]:
+    """
+    Point forecast for the next `horizon` steps, with an approximate 95%
+    band (the error variance grows with the horizon). Values are clipped at 0.
+    """
+    h = np.arange(1, horizon + 1)
+    damped = np.cumsum(DAMPING**h)
+    seasonal = fit["seasonal"][(fit["n"] + h - 1) % fit["season"]]
+    point = fit["level"] + damped * fit["trend"] + seasonal
+
+    spread = 1.96 * fit["sigma"] * np.sqrt(1 + (h - 1) * fit["alpha"] ** 2)
+    return {
+        "value": np.maximum(point, 0),
+        "lo": np.maximum(point - spread, 0),
+        "hi": np.maximum(point + spread, 0),
+    }
+
+
+def daily_revenue_history(start_day: date, end_day: date) -> np.ndarray:
+    """Daily snapshot revenue (pounds) for [start_day, end_day]; gaps are 0."""
+    out = np.zeros((end_day - start_day).days + 1)
+    for day, revenue in AnalyticsSnapshotDaily.objects.filter(
+        day__range=(start_day, end_day)
+    ).values_list("day", "revenue"):
+        out[(day - start_day).days] = float(revenue or 0)
+    return out
+
+
+def daily_mrr_history(start_day: date, end_day: date) -> np.ndarray:
+    """
+    End-of-day MRR (pounds) for [start_day, end_day], reconstructed from
+    subscription lifetimes: a subscription counts from its creation day until
+    it ended/was canceled (live ones until today). Uses each subscription's
+    current `mrr_pennies`, so past plan changes are not replayed.
+    """
+    n = (end_day - start_day).days + 1
+    delta = np.zeros(n + 1, dtype=np.int64)
+
+    rows = Subscription.objects.exclude(status__in=NON_MRR_STATUSES).values_list(
+        "status", "mrr_pennies", "created_at", "ended_at", "canceled_at", "updated_at"
+    )
+    for status, pennies, created, ended, canceled, updated in rows:
+        if not pennies:
+            continue
+        start = (timezone.localdate(created) - start_day).days
+        if start >= n:
+            continue
+        stop = n
+        end_at = ended or canceled or (None if status in LIVE_MRR_STATUSES else updated)
+        if end_at is not None:
+            stop = min((timezone.localdate(end_at) - start_day).days, n)
+        if stop <= max(start, 0):
+            continue
+        delta[max(start, 0)] += pennies
+        delta[stop] -= pennies
+
+    return np.cumsum(delta[:n]) / 100.0
+
+
+def _series_forecast(
+    history: np.ndarray, start_day: date, *, season: int | None, horizon: int
+) -> dict | None:
+    fit = fit_smoothing(history, season=season)
+    if fit is None:
+        return None
+
+    first = start_day + timedelta(days=len(history))
+    proj = project(fit, horizon)
+    return {
+        "history": [
+            {"day": start_day + timedelta(days=i), "value": float(v)}
+            for i, v in enumerate(history)
+        ],
+        "forecast": [
+            {
+                "day": first + timedelta(days=i),
+                "value": float(proj["value"][i]),
+                "lo": float(proj["lo"][i]),
+                "hi": float(proj["hi"][i]),
+            }
+            for i in range(horizon)
+        ],
+        "params": {k: round(fit[k], 4) for k in ("alpha", "beta", "gamma", "sigma")},
+        "proj": proj,
+    }
+
+
+def build_forecasts(
+    *, history_days: int = HISTORY_DAYS, horizons=FORECAST_HORIZONS
+) -> dict:
+    """
+    Revenue and MRR projections fitted on complete days (up to yesterday).
+
+    Returns {"revenue": {...} | None, "mrr": {...} | None} where each series
+    holds "history", "forecast" (daily value/lo/hi), "params" and "totals":
+    projected revenue summed over each horizon, or MRR at the end of it.
+    """
+    end_day = timezone.localdate() - timedelta(days=1)
+    start_day = end_day - timedelta(days=history_days - 1)
+    horizon = max(horizons)
+
+    out = {}
+    for name, history, season in (
+        ("revenue", daily_revenue_history(start_day, end_day), 7),
+        ("mrr", daily_mrr_history(start_day, end_day), None),
+    ):
+        # Fit from the first day with data (a new shop has no year of history).
+        active = np.flatnonzero(history)
+        if not active.size:
+            out[name] = None
+            continue
+        first = int(active[0])
+        result = _series_forecast(
+            history[first:],
+            start_day + timedelta(days=first),
+            season=season,
+            horizon=horizon,
+        )
+        if result is not None:
+            proj = result.pop("proj")
+            result["totals"] = {
+                h: Decimal(
+                    str(
+                        proj["value"][:h].sum()
+                        if name == "revenue"
+                        else proj["value"][h - 1]
+                    )
+                ).quantize(_CENT)
+                for h in horizons
+            }
+        out[name] = result
+    return out
+
+
+def forecast_watermark() -> str:
+    """
+    Fingerprint of everything a forecast depends on: the history day range
+    plus a content checksum of it (day count, revenue sum), and the
+    subscriptions. Snapshot rebuilds that leave the revenue unchanged (every
+    frequent refresh) keep the key, so the models aren't refitted for them.
+    """
+    end_day = timezone.localdate() - timedelta(days=1)
+    snaps = AnalyticsSnapshotDaily.objects.filter(
+        day__range=(end_day - timedelta(days=HISTORY_DAYS - 1), end_day)
+    ).aggregate(n=Count("id"), rev=Sum("revenue"))
+    subs = Subscription.objects.aggregate(n=Count("id"), ts=Max("updated_at"))
+    return f"{end_day}|{snaps['n']}|{snaps['rev']}|{subs['n']}|{subs['ts']}"
+
+
+def cached_forecasts() -> dict:
+    """build_forecasts() cached per watermark (refit only when inputs change)."""
+    mark = forecast_watermark()
+    key = "analytics:forecasts:" + hashlib.sha256(mark.encode()).hexdigest()[:24]
+    return cache.get_or_set(key, build_forecasts, FORECAST_CACHE_TTL)
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import hashlib
+from datetime import date, datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Exists, F, Min, OuterRef, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from analyticsapp.models import UserFunnelState
+from analyticsapp.services.snapshots import (
+    KPI_WINDOWS_CACHE_TTL,
+    kpi_windows_watermark,
+)
+from orders.models import Order
+from wishlist.models import Wishlist
+
+
+COMPLETED_STATUSES = ("paid", "fulfilled")
+
+# Step name -> UserFunnelState column (canonical funnel order).
+FUNNEL_STEPS = {
+    "product_view": "first_product_view_at",
+    "wishlist": "first_wishlist_at",
+    "cart_add": "first_cart_add_at",
+    "checkout": "first_checkout_at",
+    "paid": "first_paid_at",
+}
+
+
+def record_funnel_event(*, user_id: int | None, step: str, at=None) -> None:
+    """
+    Record the first occurrence of a funnel step for a user (idempotent).
+
+    Repeat events (e.g. every product page view) are the hot path: one
+    indexed read finds the step already set and returns without writing.
+    Otherwise a single UPDATE guarded by `column IS NULL` records it, and only
+    a user's very first event creates the row. Anonymous traffic
+    (user_id=None) is ignored.
+    """
+    if not user_id:
+        return
+
+    column = FUNNEL_STEPS[step]
+    current = (
+        UserFunnelState.objects.filter(user_id=user_id)
+        .values_list(column, flat=True)
+        .first()
+    )
+    if current is not None:
+        return
+
+    at = at or timezone.now()
+    updated = UserFunnelState.objects.filter(
+        user_id=user_id, **{f"{column}__isnull": True}
+    ).update(**{column: at, "updated_at": timezone.now()})
+    if updated:
+        return
+    UserFunnelState.objects.get_or_create(user_id=user_id, defaults={column: at})
+
+
+def _step_filters(steps: tuple[str, ...], window: timedelta | None) -> list[Q]:
+    """
+    Cumulative conditions for an ordered funnel: a user reaches step j when
+    every earlier step happened, in order, and step j is within `window` of
+    the entry step.
+
+    `paid` is special: a stored first_paid_at earlier than the previous step
+    (bought before wishlisting) must not hide a later purchase, so the step
+    also matches any completed order placed after the previous step.
+    """
+    columns = [FUNNEL_STEPS[s] for s in steps]
+    filters = [Q(**{f"{columns[0]}__isnull": False})]
+    for step, prev, col in zip(steps[1:], columns, columns[1:]):
+        reached = Q(**{f"{col}__gte": F(prev)})
+        if window is not None:
+            reached &= Q(**{f"{col}__lte": F(columns[0]) + window})
+        if step == "paid":
+            orders = Order.objects.filter(
+                user_id=OuterRef("user_id"),
+                status__in=COMPLETED_STATUSES,
+                created_at__gte=OuterRef(prev),
+            )
+            if window is not None:
+                orders = orders.filter(created_at__lte=OuterRef(columns[0]) + window)
+            reached |= Exists(orders)
+        filters.append(filters[-1] & reached)
+    return filters
+
+
+def funnel_counts(
+    steps: tuple[str, ...], start, end, *, window: timedelta | None = None
+) -> list[dict]:
+    """
+    Ordered funnel for users whose entry step falls in [start, end].
+
+    All step counts come from one conditional-aggregate query.
+    Returns [{"step", "users", "conversion_pct"}] (conversion vs entry step).
+    """
+    filters = _step_filters(steps, window)
+    entry = FUNNEL_STEPS[steps[0]]
+
+    agg = UserFunnelState.objects.filter(
+        **{f"{entry}__gte": start, f"{entry}__lte": end}
+    ).aggregate(**{f"s{i}": Count("id", filter=f) for i, f in enumerate(filters)})
+
+    counts = [int(agg[f"s{i}"] or 0) for i in range(len(steps))]
+    top = counts[0]
+    return [
+        {
+            "step": step,
+            "users": n,
+            "conversion_pct": round(n / top * 100, 2) if top else 0.0,
+        }
+        for step, n in zip(steps, counts)
+    ]
+
+
+def cached_funnel_counts(days: int) -> list[dict]:
+    """
+    The dashboard's purchase funnel (every FUNNEL_STEPS step, entry in the
+    last `days` days, `days`-long conversion window), cached like the KPI
+    windows: the key embeds the snapshot watermark and entries expire after
+    KPI_WINDOWS_CACHE_TTL, so page loads stop re-running the funnel query.
+    """
+    mark = kpi_windows_watermark(days)
+    key = f"analytics:funnel:{days}:" + hashlib.sha256(mark.encode()).hexdigest()[:24]
+
+    def build() -> list[dict]:
+        end = timezone.now()
+        window = timedelta(days=days)
+        return funnel_counts(tuple(FUNNEL_STEPS), end - window, end, window=window)
+
+    return cache.get_or_set(key, build, KPI_WINDOWS_CACHE_TTL)
+
+
+def funnel_counts_by_day(
+    steps: tuple[str, ...],
+    start_day: date,
+    end_day: date,
+    *,
+    window: timedelta | None = None,
+) -> dict[date, list[int]]:
+    """
+    Per-day ordered funnel counts keyed by the entry step's day, for every day
+    in [start_day, end_day] in one grouped query (used by the snapshot builder).
+    """
+    filters = _step_filters(steps, window)
+    entry = FUNNEL_STEPS[steps[0]]
+
+    start_dt = timezone.make_aware(datetime.combine(start_day, time.min))
+    end_dt = timezone.make_aware(datetime.combine(end_day, time.max))
+
+    rows = (
+        UserFunnelState.objects.filter(
+            **{f"{entry}__gte": start_dt, f"{entry}__lte": end_dt}
+        )
+        .annotate(day=TruncDate(entry))
+        .values("day")
+        .annotate(**{f"s{i}": Count("id", filter=f) for i, f in enumerate(filters)})
+        .order_by("day")
+    )
+    return {r["day"]: [int(r[f"s{i}"] or 0) for i in range(len(steps))] for r in rows}
+
+
+def rebuild_funnel_states(*, batch_size: int = 1000) -> int:
+    """
+    Backfill wishlist / checkout / paid first-timestamps from raw tables.
+
+    Product views and cart adds only exist as write-time events, so those
+    columns are preserved. Existing timestamps are only ever moved earlier.
+    Returns the number of users touched.
+    """
+    sources = {
+        "first_wishlist_at": Wishlist.objects.values("user_id"),
+        "first_checkout_at": Order.objects.filter(user__isnull=False).values("user_id"),
+        "first_paid_at": Order.objects.filter(
+            user__isnull=False, status__in=COMPLETED_STATUSES
+        ).values("user_id"),
+    }
+
+    found: dict[int, dict] = {}
+    for column, qs in sources.items():
+        for r in qs.annotate(t=Min("created_at")).order_by():
+            found.setdefault(r["user_id"], {})[column] = r["t"]
+
+    existing = UserFunnelState.objects.in_bulk(list(found), field_name="user_id")
+
+    to_create, to_update = [], []
+    for user_id, cols in found.items():
+        obj = existing.get(user_id)
+        if obj is None:
+            to_create.append(UserFunnelState(user_id=user_id, **cols))
+            continue
+        for column, ts in cols.items():
+            current = getattr(obj, column)
+            if current is None or ts < current:
+                setattr(obj, column, ts)
+        to_update.append(obj)
+
+    with transaction.atomic():
+        UserFunnelState.objects.bulk_create(to_create, batch_size=batch_size)
+        UserFunnelState.objects.bulk_update(
+            to_update, fields=list(sources), batch_size=batch_size
+        )
+
+    return len(found)
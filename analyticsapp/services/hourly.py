@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsSnapshotDaily, AnalyticsSnapshotHourly
+from analyticsapp.services.leases import SNAPSHOT_LEASE, holding_lease
+from analyticsapp.services.snapshot_runner import rebuild_snapshot_days
+from orders.models import Order
+
+
+COMPLETED_STATUSES = ("paid", "fulfilled")
+
+_CENT = Decimal("0.01")
+
+
+def hour_start(dt: datetime) -> datetime:
+    """UTC start of the hour containing `dt` (the AnalyticsSnapshotHourly key)."""
+    return dt.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _bump_hour(hour: datetime, **deltas) -> None:
+    with transaction.atomic():
+        AnalyticsSnapshotHourly.objects.get_or_create(hour=hour)
+        AnalyticsSnapshotHourly.objects.filter(hour=hour).update(
+            **{field: F(field) + delta for field, delta in deltas.items()},
+            updated_at=timezone.now(),
+        )
+
+
+def record_paid_hour(order: Order) -> None:
+    """Count a newly-paid order towards its order hour."""
+    if order.status not in COMPLETED_STATUSES:
+        return
+    _bump_hour(
+        hour_start(order.created_at),
+        orders=1,
+        revenue=order.total or Decimal("0.00"),
+    )
+
+
+def record_refund_hour(
+    order: Order,
+    *,
+    previous_pennies: int,
+    previous_refunded_at: datetime | None,
+) -> None:
+    """
+    Apply a refund update to the refund hour (same rules as the daily live
+    counter: a follow-up refund within the same hour only adds the delta).
+    """
+    if not order.refunded_at or order.refund_amount_pennies <= 0:
+        return
+
+    hour = hour_start(order.refunded_at)
+    same_hour = (
+        previous_refunded_at is not None
+        and previous_pennies > 0
+        and hour_start(previous_refunded_at) == hour
+    )
+    delta_pennies = order.refund_amount_pennies - (previous_pennies if same_hour else 0)
+    _bump_hour(
+        hour,
+        refunded_orders=0 if same_hour else 1,
+        refunded_amount=(Decimal(delta_pennies) / Decimal("100")).quantize(_CENT),
+    )
+
+
+def rebuild_hourly(
+    start_day: date, end_day: date, *, lease_token: str | None = None
+) -> int:
+    """
+    Recompute hourly rows for local days [start_day, end_day] from two grouped
+    queries (orders by created hour, refunds by refund hour) and overwrite the
+    stored rows in that span. Returns hours with activity.
+
+    Runs under SNAPSHOT_LEASE (`lease_token` as in rebuild_snapshot_days;
+    returns 0 while another holder has it) and in one transaction: every
+    hour row up to now is created and locked before the totals are read, so
+    a concurrent _bump_hour is either already counted or waits and lands on
+    top of the rebuilt value.
+    """
+    # Widen to whole UTC hours so no stored row is only partly recomputed.
+    start_dt = hour_start(timezone.make_aware(datetime.combine(start_day, time.min)))
+    end_dt = timezone.make_aware(datetime.combine(end_day, time.max))
+    last_hour = min(hour_start(end_dt), hour_start(timezone.now()))
+    span = int((last_hour - start_dt) / timedelta(hours=1)) + 1
+
+    ttl = timedelta(seconds=settings.ANALYTICS_SNAPSHOT_LEASE_TTL)
+    with holding_lease(SNAPSHOT_LEASE, lease_token, ttl=ttl) as token:
+        if token is None:
+            return 0
+
+        with transaction.atomic():
+            AnalyticsSnapshotHourly.objects.bulk_create(
+                [
+                    AnalyticsSnapshotHourly(hour=start_dt + timedelta(hours=i))
+                    for i in range(max(span, 0))
+                ],
+                ignore_conflicts=True,
+            )
+            stored = {
+                r.hour: r
+                for r in AnalyticsSnapshotHourly.objects.select_for_update().filter(
+                    hour__gte=start_dt, hour__lte=end_dt
+                )
+            }
+
+            totals = _hourly_totals(start_dt, end_dt)
+            now = timezone.now()
+            for hour, obj in stored.items():
+                values = totals.get(hour, {})
+                obj.orders = values.get("orders", 0)
+                obj.revenue = values.get("revenue", Decimal("0.00"))
+                obj.refunded_orders = values.get("refunded_orders", 0)
+                obj.refunded_amount = values.get("refunded_amount", Decimal("0.00"))
+                obj.updated_at = now
+            AnalyticsSnapshotHourly.objects.bulk_update(
+                stored.values(),
+                fields=[
+                    "orders",
+                    "revenue",
+                    "refunded_orders",
+                    "refunded_amount",
+                    "updated_at",
+                ],
+            )
+            # Rows past `now` (clock skew) were not pre-created.
+            AnalyticsSnapshotHourly.objects.bulk_create(
+                [
+                    AnalyticsSnapshotHourly(hour=hour, **values)
+                    for hour, values in totals.items()
+                    if hour not in stored
+                ]
+            )
+    return len(totals)
+
+
+def _hourly_totals(start_dt: datetime, end_dt: datetime) -> dict[datetime, dict]:
+    totals: dict[datetime, dict] = {}
+
+    paid = (
+        Order.objects.filter(
+            status__in=COMPLETED_STATUSES, created_at__range=(start_dt, end_dt)
+        )
+        .annotate(h=TruncHour("created_at", tzinfo=dt_timezone.utc))
+        .values("h")
+        .annotate(n=Count("id"), revenue=Sum("total"))
+        .order_by()
+    )
+    for r in paid:
+        totals.setdefault(r["h"], {}).update(
+            orders=int(r["n"]),
+            revenue=(r["revenue"] or Decimal("0.00")).quantize(_CENT),
+        )
+
+    refunds = (
+        Order.objects.filter(
+            refund_amount_pennies__gt=0,
+            refunded_at__isnull=False,
+            refunded_at__range=(start_dt, end_dt),
+        )
+        .annotate(h=TruncHour("refunded_at", tzinfo=dt_timezone.utc))
+        .values("h")
+        .annotate(n=Count("id"), pennies=Sum("refund_amount_pennies"))
+        .order_by()
+    )
+    for r in refunds:
+        totals.setdefault(r["h"], {}).update(
+            refunded_orders=int(r["n"]),
+            refunded_amount=(Decimal(int(r["pennies"] or 0)) / Decimal("100")).quantize(
+                _CENT
+            ),
+        )
+    return totals
+
+
+def compact_hourly(
+    *, retention_days: int | None = None, lease_token: str | None = None
+) -> int:
+    """
+    Fold hourly rows older than the retention period into the daily tier:
+    any local day they cover that has no AnalyticsSnapshotDaily row yet is
+    built first (under the snapshot lease, see rebuild_snapshot_days), then
+    the hourly rows are deleted. If those days can't be built because a
+    build holds the lease, nothing is deleted. Returns rows deleted.
+    """
+    if retention_days is None:
+        retention_days = settings.ANALYTICS_HOURLY_RETENTION_DAYS
+    cutoff_day = timezone.localdate() - timedelta(days=max(retention_days, 1))
+    cutoff = timezone.make_aware(datetime.combine(cutoff_day, time.min))
+
+    expired = AnalyticsSnapshotHourly.objects.filter(hour__lt=cutoff)
+    days = {timezone.localdate(h) for h in expired.values_list("hour", flat=True)}
+    if not days:
+        return 0
+
+    have = set(
+        AnalyticsSnapshotDaily.objects.filter(day__in=days).values_list(
+            "day", flat=True
+        )
+    )
+    if days - have and not rebuild_snapshot_days(days - have, lease_token=lease_token):
+        return 0
+
+    deleted, _ = expired.delete()
+    return deleted
+
+
+def intraday_series(hours: int = 24) -> list[dict]:
+    """
+    Last `hours` hours (current hour included), oldest first, read from the
+    hourly tier only (at most `hours` rows). Missing hours are zero-filled.
+    """
+    end = hour_start(timezone.now())
+    start = end - timedelta(hours=hours - 1)
+
+    stored = {
+        r["hour"]: r
+        for r in AnalyticsSnapshotHourly.objects.filter(
+            hour__range=(start, end)
+        ).values("hour", "revenue", "orders", "refunded_amount", "refunded_orders")
+    }
+
+    out = []
+    for i in range(hours):
+        hour = start + timedelta(hours=i)
+        r = stored.get(hour, {})
+        out.append(
+            {
+                "hour": timezone.localtime(hour),
+                "revenue": r.get("revenue", Decimal("0.00")),
+                "orders": r.get("orders", 0),
+                "refunded_amount": r.get("refunded_amount", Decimal("0.00")),
+                "refunded_orders": r.get("refunded_orders", 0),
+            }
+        )
+    return out
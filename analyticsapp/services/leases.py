@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsLease
+from audit.services.logger import log_event
+
+
+SNAPSHOT_LEASE = "analytics:snapshots"
+
+
+def acquire_lease(name: str, *, ttl: timedelta) -> str | None:
+    """
+    Try to take the named lease for `ttl`. Returns the holder token, or None
+    if another holder's lease is still live.
+
+    A lease whose holder stopped renewing (expires_at in the past) is stolen;
+    the steal is audit-logged so crashed runs are visible.
+    """
+    try:
+        with transaction.atomic():
+            AnalyticsLease.objects.get_or_create(name=name)
+    except IntegrityError:
+        pass  # created concurrently by another process
+
+    now = timezone.now()
+    current = AnalyticsLease.objects.filter(name=name).values("holder").first()
+    previous = current["holder"] if current else ""
+
+    token = uuid.uuid4().hex
+    taken = (
+        AnalyticsLease.objects.filter(name=name, holder=previous)
+        .filter(Q(expires_at__isnull=True) | Q(expires_at__lt=now))
+        .update(holder=token, acquired_at=now, expires_at=now + ttl, released_at=None)
+    )
+    if not taken:
+        return None
+
+    if previous:
+        log_event(
+            event_type="analytics_lease_stolen",
+            entity_type="analytics",
+            entity_id=name,
+            metadata={"previous_holder": previous},
+        )
+    return token
+
+
+def renew_lease(name: str, token: str, *, ttl: timedelta) -> bool:
+    """Extend a held lease. False means it expired and was taken by someone else."""
+    return bool(
+        AnalyticsLease.objects.filter(name=name, holder=token).update(
+            expires_at=timezone.now() + ttl
+        )
+    )
+
+
+def release_lease(name: str, token: str, *, result: dict | None = None) -> bool:
+    """Give the lease back, recording `result` for any waiting invocations."""
+    return bool(
+        AnalyticsLease.objects.filter(name=name, holder=token).update(
+            holder="",
+            expires_at=None,
+            released_at=timezone.now(),
+            last_result=result or {},
+        )
+    )
+
+
+@contextmanager
+def holding_lease(name: str, token: str | None, *, ttl: timedelta):
+    """
+    Yield a holder token for `name`: the caller's own `token` when it already
+    holds the lease, otherwise a freshly acquired one that is released on
+    exit. Yields None when another holder has the lease.
+    """
+    if token is not None:
+        yield token
+        return
+    token = acquire_lease(name, ttl=ttl)
+    try:
+        yield token
+    finally:
+        if token is not None:
+            release_lease(name, token)
+
+
+def wait_for_release(
+    name: str, *, since: datetime, timeout: float, poll: float = 2.0
+) -> dict | None:
+    """
+    Block until the current holder releases the lease (or it expires).
+
+    Returns the released holder's `last_result` if it finished after `since`,
+    {} if the lease was freed without a fresh result (expired / failed run),
+    or None if it is still held after `timeout` seconds.
+    """
+    deadline = time.monotonic() + max(timeout, 0)
+    while True:
+        lease = AnalyticsLease.objects.filter(name=name).first()
+        if lease is None:
+            return {}
+        if not lease.holder:
+            if lease.released_at and lease.released_at >= since:
+                return lease.last_result or {}
+            return {}
+        if lease.expires_at and lease.expires_at < timezone.now():
+            return {}
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(poll)
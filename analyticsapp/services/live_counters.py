@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsLiveCounter
+from orders.models import Order
+
+
+COMPLETED_STATUSES = ("paid", "fulfilled")
+
+
+def _bump(day, **deltas) -> None:
+    """Atomically add `deltas` to the counter row for `day` (created on demand)."""
+    with transaction.atomic():
+        AnalyticsLiveCounter.objects.get_or_create(day=day)
+        AnalyticsLiveCounter.objects.filter(day=day).update(
+            **{field: F(field) + delta for field, delta in deltas.items()},
+            updated_at=timezone.now(),
+        )
+
+
+def record_paid(order: Order) -> None:
+    """
+    Count a newly-paid order towards its order day (same keying as snapshots).
+    """
+    if order.status not in COMPLETED_STATUSES:
+        return
+
+    day = timezone.localdate(order.created_at)
+    _bump(day, orders=1, revenue=order.total or Decimal("0.00"))
+
+
+def record_refund(
+    order: Order,
+    *,
+    previous_pennies: int,
+    previous_refunded_at: datetime | None,
+) -> None:
+    """
+    Apply a refund update to the refund day's counter.
+
+    Snapshots report each refunded order once, on its latest `refunded_at`
+    day, with the cumulative refunded amount. So a follow-up refund on the
+    same day only adds the delta, while one that moves the order to a new day
+    counts the order (and its full refunded amount) again.
+    """
+    if not order.refunded_at or order.refund_amount_pennies <= 0:
+        return
+
+    day = timezone.localdate(order.refunded_at)
+    same_day = (
+        previous_refunded_at is not None
+        and previous_pennies > 0
+        and timezone.localdate(previous_refunded_at) == day
+    )
+
+    delta_pennies = order.refund_amount_pennies - (previous_pennies if same_day else 0)
+    _bump(
+        day,
+        refunded_orders=0 if same_day else 1,
+        refunded_amount=(Decimal(delta_pennies) / Decimal("100")).quantize(
+            Decimal("0.01")
+        ),
+    )
+
+
+def seed_live_counter(day) -> None:
+    """
+    Reset a day's counter to its revenue KPIs recomputed from orders (builder
+    path). The counter row is locked before the totals are read, so a
+    concurrent _bump either committed first (and is counted here) or waits
+    and lands on top; the builder's own, older figures are never written.
+    """
+    start_dt = timezone.make_aware(datetime.combine(day, time.min))
+    end_dt = timezone.make_aware(datetime.combine(day, time.max))
+
+    with transaction.atomic():
+        AnalyticsLiveCounter.objects.get_or_create(day=day)
+        AnalyticsLiveCounter.objects.select_for_update().get(day=day)
+
+        paid = Order.objects.filter(
+            status__in=COMPLETED_STATUSES, created_at__range=(start_dt, end_dt)
+        ).aggregate(n=Count("id"), revenue=Sum("total"))
+        refunds = Order.objects.filter(
+            refund_amount_pennies__gt=0, refunded_at__range=(start_dt, end_dt)
+        ).aggregate(n=Count("id"), pennies=Sum("refund_amount_pennies"))
+
+        AnalyticsLiveCounter.objects.filter(day=day).update(
+            orders=paid["n"],
+            revenue=(paid["revenue"] or Decimal("0.00")).quantize(Decimal("0.01")),
+            refunded_orders=refunds["n"],
+            refunded_amount=(
+                Decimal(int(refunds["pennies"] or 0)) / Decimal("100")
+            ).quantize(Decimal("0.01")),
+            updated_at=timezone.now(),
+        )
+
+
+def prune_live_counters(before_day) -> int:
+    """Drop counters for days fully covered by snapshots. Returns rows deleted."""
+    deleted, _ = AnalyticsLiveCounter.objects.filter(day__lt=before_day).delete()
+    return deleted
@@ -0,0 +1,56 @@
+"""
+Write-path hooks for analytics structures maintained incrementally.
+
+Payment/refund/lifecycle code calls these right after persisting the order
+transition, inside the same transaction, so derived rows commit or roll back
+together with the order. Nightly `build_analytics_snapshots` rebuilds the same
+structures from scratch and corrects any drift.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from analyticsapp.services.cohorts import record_order_paid
+from analyticsapp.services.customer_index import refresh_customer
+from analyticsapp.services.funnel_events import record_funnel_event
+from analyticsapp.services.hourly import record_paid_hour, record_refund_hour
+from analyticsapp.services.live_counters import record_paid, record_refund
+from analyticsapp.services.refund_rollups import record_refund_rollups
+from orders.models import Order
+
+
+def on_order_paid(order: Order) -> None:
+    refresh_customer(order.email)
+    record_order_paid(order)
+    record_funnel_event(user_id=order.user_id, step="paid")
+    record_paid(order)
+    record_paid_hour(order)
+
+
+def on_order_refunded(
+    order: Order,
+    *,
+    previous_pennies: int = 0,
+    previous_refunded_at: datetime | None = None,
+) -> None:
+    refresh_customer(order.email)
+    record_refund(
+        order,
+        previous_pennies=previous_pennies,
+        previous_refunded_at=previous_refunded_at,
+    )
+    record_refund_hour(
+        order,
+        previous_pennies=previous_pennies,
+        previous_refunded_at=previous_refunded_at,
+    )
+    record_refund_rollups(
+        order,
+        previous_pennies=previous_pennies,
+        previous_refunded_at=previous_refunded_at,
+    )
+
+
+def on_order_canceled(order: Order) -> None:
+    refresh_customer(order.email)
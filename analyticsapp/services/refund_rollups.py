@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsProductRefundDaily, AnalyticsRefundLatencyDaily
+from orders.models import Order, OrderItem
+from products.models import Product
+
+
+_CENT = Decimal("0.01")
+
+# (upper bound exclusive, label) of purchase -> refund latency; None = open.
+# Latency is measured from Order.created_at (orders are created at checkout
+# and paid straight after; there is no separate paid timestamp).
+LATENCY_BUCKETS = (
+    (timedelta(days=1), "<1d"),
+    (timedelta(days=3), "1-3d"),
+    (timedelta(days=7), "3-7d"),
+    (timedelta(days=14), "7-14d"),
+    (timedelta(days=30), "14-30d"),
+    (None, "30d+"),
+)
+
+
+def latency_bucket(created_at: datetime, refunded_at: datetime) -> str:
+    latency = refunded_at - created_at
+    for upper, label in LATENCY_BUCKETS:
+        if upper is None or latency < upper:
+            return label
+    return LATENCY_BUCKETS[-1][1]
+
+
+def _pounds(pennies: int) -> Decimal:
+    return (Decimal(int(pennies)) / Decimal("100")).quantize(_CENT)
+
+
+def _allocate(amount: Decimal, items: list[dict]) -> dict[int, Decimal]:
+    """
+    Split an order-level refund across its products pro rata by line total.
+    Items without a product keep their share unattributed.
+    """
+    basket = sum((i["line_total"] or Decimal("0.00")) for i in items)
+    if basket <= 0:
+        return {}
+
+    out: dict[int, Decimal] = defaultdict(lambda: Decimal("0.00"))
+    for i in items:
+        if i["product_id"]:
+            out[i["product_id"]] += amount * (i["line_total"] or 0) / basket
+    return {pid: amt.quantize(_CENT) for pid, amt in out.items()}
+
+
+def _bump(model, lookup: dict, **deltas) -> None:
+    """F() increments on a rollup row; negative deltas are clamped at zero."""
+    updates = {}
+    for field, delta in deltas.items():
+        expr = F(field) + delta
+        if delta < 0:
+            expr = Greatest(expr, Value(0), output_field=model._meta.get_field(field))
+        updates[field] = expr
+
+    model.objects.get_or_create(**lookup)
+    model.objects.filter(**lookup).update(**updates)
+
+
+def _apply(day, order: Order, items, pennies: int, refunded_at, sign: int) -> None:
+    amount = _pounds(pennies)
+    _bump(
+        AnalyticsRefundLatencyDaily,
+        {"day": day, "bucket": latency_bucket(order.created_at, refunded_at)},
+        refunded_orders=sign,
+        refunded_amount=sign * amount,
+    )
+    for product_id, share in _allocate(amount, items).items():
+        _bump(
+            AnalyticsProductRefundDaily,
+            {"day": day, "product_id": product_id},
+            refunded_orders=sign,
+            refunded_amount=sign * share,
+        )
+
+
+def record_refund_rollups(
+    order: Order,
+    *,
+    previous_pennies: int,
+    previous_refunded_at: datetime | None,
+) -> None:
+    """
+    Apply a refund update to the product and latency rollups. Like the
+    rebuild (compute_refund_rollups), each refunded order counts once, on
+    its latest refund day: the previous contribution is subtracted from the
+    day (and latency bucket) it was recorded under, then the cumulative
+    refund is added to the current refund day.
+    """
+    if not order.refunded_at or order.refund_amount_pennies <= 0:
+        return
+
+    day = timezone.localdate(order.refunded_at)
+    items = list(order.items.values("product_id", "line_total"))
+
+    with transaction.atomic():
+        if previous_refunded_at is not None and previous_pennies > 0:
+            _apply(
+                timezone.localdate(previous_refunded_at),
+                order,
+                items,
+                previous_pennies,
+                previous_refunded_at,
+                -1,
+            )
+        _apply(day, order, items, order.refund_amount_pennies, order.refunded_at, 1)
+
+
+def compute_refund_rollups(start_day: date, end_day: date) -> tuple[dict, dict]:
+    """
+    Product and latency refund rollups for [start_day, end_day] from two
+    queries (refunded orders, their items).
+
+    Returns ({(day, product_id): {...}}, {(day, bucket): {...}}).
+    """
+    start_dt = timezone.make_aware(datetime.combine(start_day, time.min))
+    end_dt = timezone.make_aware(datetime.combine(end_day, time.max))
+    window = {
+        "refund_amount_pennies__gt": 0,
+        "refunded_at__isnull": False,
+        "refunded_at__range": (start_dt, end_dt),
+    }
+
+    items_by_order = defaultdict(list)
+    for i in OrderItem.objects.filter(
+        **{f"order__{k}": v for k, v in window.items()}
+    ).values("order_id", "product_id", "line_total"):
+        items_by_order[i["order_id"]].append(i)
+
+    def empty():
+        return {"refunded_orders": 0, "refunded_amount": Decimal("0.00")}
+
+    products: dict = defaultdict(empty)
+    latency: dict = defaultdict(empty)
+
+    for o in Order.objects.filter(**window).values(
+        "id", "created_at", "refunded_at", "refund_amount_pennies"
+    ):
+        day = timezone.localdate(o["refunded_at"])
+        amount = _pounds(o["refund_amount_pennies"])
+
+        row = latency[(day, latency_bucket(o["created_at"], o["refunded_at"]))]
+        row["refunded_orders"] += 1
+        row["refunded_amount"] += amount
+
+        for product_id, share in _allocate(amount, items_by_order[o["id"]]).items():
+            row = products[(day, product_id)]
+            row["refunded_orders"] += 1
+            row["refunded_amount"] += share
+
+    return dict(products), dict(latency)
+
+
+def write_refund_rollups(days: Iterable[date], products: dict, latency: dict) -> int:
+    """Replace both rollups for `days`. Returns rows written."""
+    days = set(days)
+    product_objs = [
+        AnalyticsProductRefundDaily(day=day, product_id=pid, **values)
+        for (day, pid), values in products.items()
+        if day in days
+    ]
+    latency_objs = [
+        AnalyticsRefundLatencyDaily(day=day, bucket=bucket, **values)
+        for (day, bucket), values in latency.items()
+        if day in days
+    ]
+    with transaction.atomic():
+        AnalyticsProductRefundDaily.objects.filter(day__in=days).delete()
+        AnalyticsRefundLatencyDaily.objects.filter(day__in=days).delete()
+        AnalyticsProductRefundDaily.objects.bulk_create(product_objs)
+        AnalyticsRefundLatencyDaily.objects.bulk_create(latency_objs)
+    return len(product_objs) + len(latency_objs)
+
+
+def _window(days: int) -> tuple[date, date]:
+    end_day = timezone.localdate()
+    return end_day - timedelta(days=days - 1), end_day
+
+
+def top_refunded_products(days: int, limit: int = 10) -> list[dict]:
+    """Most-refunded products (by refunded amount) from the daily rollup."""
+    rows = (
+        AnalyticsProductRefundDaily.objects.filter(day__range=_window(days))
+        .values("product_id")
+        .annotate(
+            refunded_orders=Sum("refunded_orders"),
+            refunded_amount=Sum("refunded_amount"),
+        )
+        .order_by("-refunded_amount")[:limit]
+    )
+    products = Product.objects.in_bulk([r["product_id"] for r in rows])
+
+    out = []
+    for r in rows:
+        p = products.get(r["product_id"])
+        out.append(
+            {
+                "product_name": str(p) if p else f"Product #{r['product_id']}",
+                "refunded_orders": r["refunded_orders"] or 0,
+                "refunded_amount": Decimal(r["refunded_amount"] or 0).quantize(_CENT),
+            }
+        )
+    return out
+
+
+def refund_latency_histogram(days: int) -> list[dict]:
+    """Refunded orders/amount per latency bucket (all buckets, in order)."""
+    totals = {
+        r["bucket"]: r
+        for r in AnalyticsRefundLatencyDaily.objects.filter(day__range=_window(days))
+        .values("bucket")
+        .annotate(
+            refunded_orders=Sum("refunded_orders"),
+            refunded_amount=Sum("refunded_amount"),
+        )
+        .order_by()
+    }
+    return [
+        {
+            "bucket": label,
+            "refunded_orders": (totals.get(label) or {}).get("refunded_orders") or 0,
+            "refunded_amount": Decimal(
+                (totals.get(label) or {}).get("refunded_amount") or 0
+            ).quantize(_CENT),
+        }
+        for _, label in LATENCY_BUCKETS
+    ]
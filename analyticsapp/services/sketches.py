@@ -0,0 +1,176 @@
+"""
+Mergeable quantile sketches (merging t-digest) for order values.
+
+A digest is a plain JSON-able dict so it can live on a snapshot row:
+
+    {"n": <count>, "min": <float>, "max": <float>, "c": [[mean, weight], ...]}
+
+Centroids are kept sorted by mean. Near the tails they stay small (often
+single orders), in the middle they absorb more weight, so p50/p90/p99 stay
+accurate while a day's sketch stays at a few hundred centroids at most
+however many orders it summarises. Merging is concatenate + recompress, so
+any window's percentiles come from its daily sketches without touching
+orders.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Iterable, Sequence
+
+
+DEFAULT_COMPRESSION = 100
+
+EMPTY_DIGEST = {"n": 0, "min": None, "max": None, "c": []}
+
+
+def _compress(centroids: list[list[float]], compression: int) -> list[list[float]]:
+    """One merging pass over centroids sorted by mean (k1-style size bound)."""
+    if not centroids:
+        return []
+
+    total = sum(w for _, w in centroids)
+    out: list[list[float]] = []
+    mean, weight = centroids[0]
+    done = 0.0
+
+    for m, w in centroids[1:]:
+        q0 = done / total
+        q2 = (done + weight + w) / total
+        limit = 4 * total * min(q0 * (1 - q0), q2 * (1 - q2)) / compression
+        if weight + w <= max(limit, 1):
+            weight += w
+            mean += (m - mean) * w / weight
+        else:
+            out.append([mean, weight])
+            done += weight
+            mean, weight = m, w
+    out.append([mean, weight])
+    return out
+
+
+def _pack(centroids: list[list[float]], n: int, lo, hi) -> dict:
+    return {
+        "n": n,
+        "min": lo,
+        "max": hi,
+        "c": [[round(m, 4), w] for m, w in centroids],
+    }
+
+
+def build_digest(
+    values: Iterable[float], *, compression: int = DEFAULT_COMPRESSION
+) -> dict:
+    """Digest of raw values."""
+    xs = sorted(float(v) for v in values)
+    if not xs:
+        return dict(EMPTY_DIGEST)
+    return _pack(_compress([[x, 1] for x in xs], compression), len(xs), xs[0], xs[-1])
+
+
+def merge_digests(
+    digests: Iterable[dict], *, compression: int = DEFAULT_COMPRESSION
+) -> dict:
+    """Merge any number of digests (e.g. a window of daily sketches)."""
+    parts = [d for d in digests if d and d.get("n")]
+    if not parts:
+        return dict(EMPTY_DIGEST)
+
+    centroids = sorted(
+        ([float(m), float(w)] for d in parts for m, w in d["c"]), key=lambda c: c[0]
+    )
+    return _pack(
+        _compress(centroids, compression),
+        sum(int(d["n"]) for d in parts),
+        min(float(d["min"]) for d in parts),
+        max(float(d["max"]) for d in parts),
+    )
+
+
+def digest_quantile(digest: dict, q: float) -> float | None:
+    """
+    Estimated q-quantile (0..1). Interpolates between centroid centres and
+    clamps to the exact min/max at the ends.
+    """
+    n = digest.get("n") or 0
+    if not n:
+        return None
+    cs: Sequence = digest["c"]
+    lo, hi = float(digest["min"]), float(digest["max"])
+    if q <= 0 or n == 1:
+        return lo
+    if q >= 1:
+        return hi
+
+    target = q * n
+    cum = 0.0
+    prev_center, prev_mean = 0.0, lo
+    for mean, weight in cs:
+        center = cum + weight / 2
+        if target < center:
+            span = center - prev_center
+            frac = 0.0 if span <= 0 else (target - prev_center) / span
+            return prev_mean + frac * (mean - prev_mean)
+        prev_center, prev_mean = center, mean
+        cum += weight
+
+    span = n - prev_center
+    frac = 0.0 if span <= 0 else (target - prev_center) / span
+    return prev_mean + frac * (hi - prev_mean)
+
+
+def digest_cdf(digest: dict, x: float) -> float:
+    """Estimated fraction of values <= x (inverse of digest_quantile)."""
+    n = digest.get("n") or 0
+    if not n:
+        return 0.0
+    lo, hi = float(digest["min"]), float(digest["max"])
+    if x < lo:
+        return 0.0
+    if x >= hi:
+        return 1.0
+
+    cum = 0.0
+    prev_center, prev_mean = 0.0, lo
+    for mean, weight in digest["c"]:
+        center = cum + weight / 2
+        if x < mean:
+            span = mean - prev_mean
+            frac = 0.0 if span <= 0 else (x - prev_mean) / span
+            return (prev_center + frac * (center - prev_center)) / n
+        prev_center, prev_mean = center, mean
+        cum += weight
+
+    span = hi - prev_mean
+    frac = 0.0 if span <= 0 else (x - prev_mean) / span
+    return (prev_center + frac * (n - prev_center)) / n
+
+
+def digest_histogram(digest: dict, bins: int = 12) -> list[dict]:
+    """
+    Estimated counts in `bins` equal-width buckets between min and max
+    (for distribution charts). Returns [{"lo", "hi", "count"}].
+    """
+    n = digest.get("n") or 0
+    if not n:
+        return []
+    lo, hi = float(digest["min"]), float(digest["max"])
+    if hi <= lo:
+        return [{"lo": lo, "hi": hi, "count": n}]
+
+    width = (hi - lo) / bins
+    edges = [lo + i * width for i in range(bins)] + [hi]
+    # Round the cumulative counts (not each bucket) so buckets sum to n.
+    cum = (
+        [0]
+        + [int(math.floor(digest_cdf(digest, e) * n + 0.5)) for e in edges[1:-1]]
+        + [n]
+    )
+    return [
+        {
+            "lo": round(edges[i], 2),
+            "hi": round(edges[i + 1], 2),
+            "count": max(cum[i + 1] - cum[i], 0),
+        }
+        for i in range(bins)
+    ]
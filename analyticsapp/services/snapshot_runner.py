@@ -0,0 +1,361 @@
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Avg,
+    BigIntegerField,
+    Case,
+    Count,
+    DecimalField,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Mod, Round, TruncDate
+from django.utils import timezone
+
+from analyticsapp.models import (
+    AnalyticsProductDaily,
+    AnalyticsSnapshotDaily,
+    CustomerFirstOrder,
+)
+from analyticsapp.services.country_rollup import (
+    compute_country_days,
+    write_country_days,
+)
+from analyticsapp.services.funnel_events import funnel_counts_by_day
+from analyticsapp.services.leases import SNAPSHOT_LEASE, holding_lease
+from analyticsapp.services.live_counters import seed_live_counter
+from analyticsapp.services.refund_rollups import (
+    compute_refund_rollups,
+    write_refund_rollups,
+)
+from analyticsapp.services.sketches import build_digest
+from orders.models import Order, OrderItem
+
+
+COMPLETED_STATUSES = ("paid", "fulfilled")
+
+# Conversion window for the snapshot wishlist -> purchase funnel.
+SNAPSHOT_FUNNEL_WINDOW = timedelta(days=30)
+
+# Per-row fingerprint term, reduced mod a prime so SUM() cannot overflow
+# BIGINT. Summing makes the checksum order-independent, so it can be computed
+# in one GROUP BY on the raw side and compared with the stored value.
+_CHECKSUM_MOD = 2_147_483_647
+
+
+def _day_bounds(start_day: date, end_day: date) -> tuple[datetime, datetime]:
+    return (
+        timezone.make_aware(datetime.combine(start_day, time.min)),
+        timezone.make_aware(datetime.combine(end_day, time.max)),
+    )
+
+
+def _order_fingerprint_term():
+    pennies = Cast(
+        Round(F("total") * Value(Decimal("100"), output_field=DecimalField())),
+        BigIntegerField(),
+    )
+    status_code = Case(
+        When(status="fulfilled", then=Value(2)),
+        default=Value(1),
+        output_field=IntegerField(),
+    )
+    return Mod(
+        F("id") * Value(1_000_003)
+        + pennies * Value(7_919)
+        + status_code * Value(104_729),
+        Value(_CHECKSUM_MOD),
+        output_field=BigIntegerField(),
+    )
+
+
+def order_day_fingerprints(start_day: date, end_day: date) -> dict[date, dict]:
+    """
+    Per local day: count + content checksum of the orders that contribute to
+    that day's revenue/orders (ids, totals and paid/fulfilled status), for
+    the whole range in ONE grouped query.
+
+    Returns {day: {"count", "checksum", "revenue", "aov"}}; days without orders are
+    absent (treat as count=0, checksum=0).
+    """
+    start_dt, end_dt = _day_bounds(start_day, end_day)
+
+    rows = (
+        Order.objects.filter(
+            status__in=COMPLETED_STATUSES, created_at__range=(start_dt, end_dt)
+        )
+        .annotate(day=TruncDate("created_at"))
+        .values("day")
+        .annotate(
+            count=Count("id"),
+            checksum=Sum(_order_fingerprint_term()),
+            revenue=Sum("total"),
+            aov=Avg("total"),
+        )
+        .order_by()
+    )
+    return {
+        r["day"]: {
+            "count": int(r["count"]),
+            "checksum": int(r["checksum"] or 0),
+            "revenue": r["revenue"] or Decimal("0.00"),
+            "aov": r["aov"],
+        }
+        for r in rows
+    }
+
+
+# Metric columns of AnalyticsSnapshotDaily produced by compute_snapshot_days().
+SNAPSHOT_METRICS = (
+    "revenue",
+    "orders",
+    "aov",
+    "refunded_amount",
+    "refunded_orders",
+    "unique_customers",
+    "repeat_customers",
+    "wish_users",
+    "purchased_users",
+)
+
+_CENT = Decimal("0.01")
+
+
+def compute_snapshot_days(start_day: date, end_day: date) -> dict[date, dict]:
+    """
+    Set-based snapshot pass: every metric for every day in [start_day, end_day]
+    from a handful of grouped queries (orders, refunds, customers, funnel),
+    instead of per-day KPI calls. Pure read: no locks, no writes.
+
+    Semantics match the per-day definitions in revenue_kpis/customer_kpis:
+    revenue/orders/aov by order day, refunds by refund day, returning
+    customers resolved against CustomerFirstOrder. Each day's dict also
+    carries `source_count` / `source_checksum` (see order_day_fingerprints).
+    """
+    start_dt, end_dt = _day_bounds(start_day, end_day)
+    n_days = (end_day - start_day).days + 1
+
+    out = {
+        start_day + timedelta(days=i): {
+            "revenue": Decimal("0.00"),
+            "orders": 0,
+            "aov": Decimal("0.00"),
+            "refunded_amount": Decimal("0.00"),
+            "refunded_orders": 0,
+            "unique_customers": 0,
+            "repeat_customers": 0,
+            "wish_users": 0,
+            "purchased_users": 0,
+            "source_count": 0,
+            "source_checksum": 0,
+            "total_sketch": build_digest([]),
+        }
+        for i in range(n_days)
+    }
+
+    for day, fp in order_day_fingerprints(start_day, end_day).items():
+        row = out[day]
+        row["revenue"] = fp["revenue"].quantize(_CENT)
+        row["orders"] = fp["count"]
+        row["aov"] = (fp["aov"] or Decimal("0.00")).quantize(_CENT)
+        row["source_count"] = fp["count"]
+        row["source_checksum"] = fp["checksum"]
+
+    # Order-value sketches: stream totals in created_at order, one day at a time.
+    day_totals: list = []
+    current_day = None
+    for day, total in (
+        Order.objects.filter(
+            status__in=COMPLETED_STATUSES, created_at__range=(start_dt, end_dt)
+        )
+        .annotate(day=TruncDate("created_at"))
+        .order_by("created_at")
+        .values_list("day", "total")
+        .iterator(chunk_size=2000)
+    ):
+        if day != current_day and day_totals:
+            out[current_day]["total_sketch"] = build_digest(day_totals)
+            day_totals = []
+        current_day = day
+        day_totals.append(total)
+    if day_totals:
+        out[current_day]["total_sketch"] = build_digest(day_totals)
+
+    refunds = (
+        Order.objects.filter(
+            refund_amount_pennies__gt=0,
+            refunded_at__isnull=False,
+            refunded_at__range=(start_dt, end_dt),
+        )
+        .annotate(day=TruncDate("refunded_at"))
+        .values("day")
+        .annotate(n=Count("id"), pennies=Sum("refund_amount_pennies"))
+        .order_by()
+    )
+    for r in refunds:
+        out[r["day"]]["refunded_orders"] = int(r["n"])
+        out[r["day"]]["refunded_amount"] = (
+            Decimal(int(r["pennies"] or 0)) / Decimal("100")
+        ).quantize(_CENT)
+
+    first_order_at = CustomerFirstOrder.objects.filter(email=OuterRef("email")).values(
+        "first_order_at"
+    )[:1]
+    customers = (
+        Order.objects.filter(
+            status__in=COMPLETED_STATUSES, created_at__range=(start_dt, end_dt)
+        )
+        .exclude(email="")
+        .annotate(
+            day=TruncDate("created_at"),
+            first_day=TruncDate(Subquery(first_order_at)),
+        )
+        .values("day")
+        .annotate(
+            unique=Count("email", distinct=True, filter=Q(first_day__isnull=False)),
+            new=Count("email", distinct=True, filter=Q(first_day__gte=F("day"))),
+        )
+        .order_by()
+    )
+    for r in customers:
+        out[r["day"]]["unique_customers"] = int(r["unique"])
+        out[r["day"]]["repeat_customers"] = max(int(r["unique"]) - int(r["new"]), 0)
+
+    funnel = funnel_counts_by_day(
+        ("wishlist", "paid"), start_day, end_day, window=SNAPSHOT_FUNNEL_WINDOW
+    )
+    for day, (wish_users, purchased_users) in funnel.items():
+        if day in out:
+            out[day]["wish_users"] = wish_users
+            out[day]["purchased_users"] = purchased_users
+
+    return out
+
+
+def diff_snapshot_days(computed: dict[date, dict]) -> list[dict]:
+    """
+    Compare computed day values with stored rows in ONE read (no row locks).
+
+    Returns [{"day", "metric", "stored", "computed"}] for changed metrics only;
+    `stored` is None when the day has no snapshot row yet.
+    """
+    if not computed:
+        return []
+
+    stored = {
+        r["day"]: r
+        for r in AnalyticsSnapshotDaily.objects.filter(
+            day__range=(min(computed), max(computed))
+        ).values("day", *SNAPSHOT_METRICS)
+    }
+
+    changes = []
+    for day in sorted(computed):
+        old_row = stored.get(day)
+        for metric in SNAPSHOT_METRICS:
+            new = computed[day][metric]
+            old = old_row[metric] if old_row else None
+            if old is None or old != new:
+                changes.append(
+                    {"day": day, "metric": metric, "stored": old, "computed": new}
+                )
+    return changes
+
+
+def build_snapshot_day(day: date, values: dict) -> tuple[bool, int]:
+    """
+    Write one day's AnalyticsSnapshotDaily (from compute_snapshot_days values)
+    and rebuild its product rollups. Returns (created, product_rows).
+    """
+    start_dt, end_dt = _day_bounds(day, day)
+
+    product_rows = 0
+    with transaction.atomic():
+        # --- Daily KPI snapshot ---
+        obj, created = AnalyticsSnapshotDaily.objects.select_for_update().get_or_create(
+            day=day
+        )
+        for field in (
+            *SNAPSHOT_METRICS,
+            "source_count",
+            "source_checksum",
+            "total_sketch",
+        ):
+            setattr(obj, field, values[field])
+        obj.save()
+
+        # Today's live counter restarts from totals read at write time: the
+        # `values` pass may predate paid/refund bumps that landed since.
+        if day == timezone.localdate():
+            seed_live_counter(day)
+
+        # --- Product daily rollups (best sellers) ---
+        # Some OrderItems may not have a Product FK (product is NULL). Exclude them.
+        items = (
+            OrderItem.objects.filter(
+                order__status__in=COMPLETED_STATUSES,
+                order__created_at__range=(start_dt, end_dt),
+                product__isnull=False,
+            )
+            .values("product_id")
+            .annotate(
+                units=Sum("qty"),
+                revenue=Sum("line_total"),
+            )
+        )
+
+        for row in items:
+            product_id = row.get("product_id")
+            if not product_id:
+                continue
+
+            AnalyticsProductDaily.objects.update_or_create(
+                day=day,
+                product_id=product_id,
+                defaults={
+                    "units": int(row["units"] or 0),
+                    "revenue": row["revenue"] or 0,
+                },
+            )
+            product_rows += 1
+
+    return created, product_rows
+
+
+def rebuild_snapshot_days(
+    days: Iterable[date], *, lease_token: str | None = None
+) -> list[date]:
+    """
+    Targeted rebuild of specific days (reconciliation / compaction path).
+    Values for the covering range come from one set-based pass.
+
+    Runs under SNAPSHOT_LEASE so it never interleaves with a full build:
+    callers already holding the lease pass its `lease_token`; otherwise it
+    is taken here, and nothing is rebuilt (returns []) while it is held.
+    """
+    days = sorted(set(days))
+    if not days:
+        return []
+
+    ttl = timedelta(seconds=settings.ANALYTICS_SNAPSHOT_LEASE_TTL)
+    with holding_lease(SNAPSHOT_LEASE, lease_token, ttl=ttl) as token:
+        if token is None:
+            return []
+        computed = compute_snapshot_days(days[0], days[-1])
+        for day in days:
+            build_snapshot_day(day, computed[day])
+        write_country_days(days, compute_country_days(days[0], days[-1]))
+        write_refund_rollups(days, *compute_refund_rollups(days[0], days[-1]))
+    return days
@@ -1,79 +1,73 @@
 from __future__ import annotations
 
+import hashlib
 from datetime import timedelta
 from decimal import Decimal
 
-from django.db.models import Sum
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count, Max, Sum
 from django.utils import timezone
 
-from analyticsapp.models import AnalyticsSnapshotDaily
+from analyticsapp.models import AnalyticsLiveCounter, AnalyticsSnapshotDaily
+from analyticsapp.services.sketches import (
+    digest_histogram,
+    digest_quantile,
+    merge_digests,
+)
 
 
-def snapshot_kpis(days: int) -> dict:
-    """
-    Return window KPIs aggregated from daily snapshots for the LAST N CALENDAR DAYS.
+LIVE_FIELDS = ("revenue", "orders", "refunded_amount", "refunded_orders")
 
-    Always returns:
-      - rev, cust, funnel
-      - daily: list of dicts for charts (day, revenue, orders, refunded_amount)
-      - meta: completeness + date window info
+STANDARD_WINDOWS = (7, 30, 90)
 
-    Meta fields:
-      - start_day / end_day: calendar window boundaries (inclusive)
-      - snap_days: how many snapshot rows exist in that window
-      - is_complete: True iff snap_days == days
-      - missing_days: max(days - snap_days, 0)
-    """
-    if days < 1:
-        days = 1
+# Summable snapshot columns; money columns are summed as integer pennies so
+# the in-memory cumulative sums stay exact.
+SUM_FIELDS = (
+    "revenue",
+    "orders",
+    "refunded_amount",
+    "refunded_orders",
+    "unique_customers",
+    "repeat_customers",
+    "wish_users",
+    "purchased_users",
+)
+MONEY_FIELDS = ("revenue", "refunded_amount")
 
-    end_day = timezone.localdate()
-    start_day = end_day - timedelta(days=days - 1)
+DELTA_METRICS = (
+    ("rev", "revenue"),
+    ("rev", "orders"),
+    ("rev", "aov"),
+    ("rev", "refund_amount"),
+    ("cust", "unique"),
+)
 
-    qs = AnalyticsSnapshotDaily.objects.filter(day__range=(start_day, end_day))
-    snap_days = qs.count()
-    is_complete = snap_days == days
-    missing_days = max(days - snap_days, 0)
-
-    agg = qs.aggregate(
-        revenue=Sum("revenue"),
-        orders=Sum("orders"),
-        refunded_amount=Sum("refunded_amount"),
-        refunded_orders=Sum("refunded_orders"),
-        unique_customers=Sum("unique_customers"),
-        repeat_customers=Sum("repeat_customers"),
-        wish_users=Sum("wish_users"),
-        purchased_users=Sum("purchased_users"),
-    )
+KPI_WINDOWS_CACHE_TTL = 300
 
-    daily = list(
-        qs.order_by("day").values("day", "revenue", "orders", "refunded_amount")
-    )
 
-    revenue = agg["revenue"] or Decimal("0.00")
-    orders = int(agg["orders"] or 0)
+def _window_payload(totals: dict, meta: dict, daily: list) -> dict:
+    """Derived KPIs (AOV, rates) for one window from its summed columns."""
+    revenue = (Decimal(int(totals["revenue"])) / 100).quantize(Decimal("0.01"))
+    orders = int(totals["orders"])
 
     # AOV should be computed as revenue / orders (not average of daily AOV)
     aov = (revenue / orders).quantize(Decimal("0.01")) if orders else Decimal("0.00")
 
-    refunded_orders = int(agg["refunded_orders"] or 0)
-    refund_amount = agg["refunded_amount"] or Decimal("0.00")
+    refunded_orders = int(totals["refunded_orders"])
+    refund_amount = (Decimal(int(totals["refunded_amount"])) / 100).quantize(
+        Decimal("0.01")
+    )
     refund_rate_orders = (
         (Decimal(refunded_orders) / Decimal(orders) * 100) if orders else Decimal("0")
     )
 
-    unique = int(agg["unique_customers"] or 0)
-    repeat = int(agg["repeat_customers"] or 0)
+    unique = int(totals["unique_customers"])
+    repeat = int(totals["repeat_customers"])
     repeat_rate = round((repeat / unique * 100), 2) if unique else 0.0
 
     return {
-        "meta": {
-            "start_day": start_day,
-            "end_day": end_day,
-            "snap_days": snap_days,
-            "is_complete": is_complete,
-            "missing_days": missing_days,
-        },
+        "meta": meta,
         "rev": {
             "revenue": revenue,
             "orders": orders,
@@ -88,8 +82,198 @@ def snapshot_kpis(days: int) -> dict:
             "repeat_rate": repeat_rate,
         },
         "funnel": {
-            "wish_users": int(agg["wish_users"] or 0),
-            "purchased_users": int(agg["purchased_users"] or 0),
+            "wish_users": int(totals["wish_users"]),
+            "purchased_users": int(totals["purchased_users"]),
         },
         "daily": daily,
     }
+
+
+def _pct_change(current, previous) -> Decimal | None:
+    if not previous:
+        return None
+    return ((Decimal(current) - Decimal(previous)) / Decimal(previous) * 100).quantize(
+        Decimal("0.01")
+    )
+
+
+def snapshot_kpis_windows(
+    windows: tuple[int, ...] = STANDARD_WINDOWS, *, compare: bool = True
+) -> dict[int, dict]:
+    """
+    KPIs for several trailing windows from ONE read of AnalyticsSnapshotDaily.
+
+    The largest window (doubled when `compare`, to cover the previous period)
+    is loaded once into a day-aligned array; every window's totals are then
+    differences of cumulative sums. Returns {days: payload}, each payload
+    shaped like `snapshot_kpis(days)`; with `compare` it also carries
+    `previous` (the equal-length period before) and `delta` (% change per
+    headline metric, None when the previous value is 0).
+    """
+    windows = tuple(sorted({max(int(w), 1) for w in windows}))
+    span = windows[-1] * (2 if compare else 1)
+
+    end_day = timezone.localdate()
+    start_day = end_day - timedelta(days=span - 1)
+
+    rows = list(
+        AnalyticsSnapshotDaily.objects.filter(day__range=(start_day, end_day)).values(
+            "day", *SUM_FIELDS
+        )
+    )
+    live = AnalyticsLiveCounter.objects.filter(day=end_day).first()
+
+    # Day-aligned matrix (fields x days); missing days stay zero.
+    values = np.zeros((len(SUM_FIELDS), span), dtype=np.int64)
+    present = np.zeros(span, dtype=np.int64)
+    for r in rows:
+        i = (r["day"] - start_day).days
+        present[i] = 1
+        for f, field in enumerate(SUM_FIELDS):
+            v = r[field] or 0
+            values[f, i] = int(v * 100) if field in MONEY_FIELDS else int(v)
+
+    # Merge "today so far": the live counter supersedes today's snapshot row
+    # for revenue/order/refund totals (customer + funnel KPIs stay snapshot-only).
+    if live is not None:
+        for field in LIVE_FIELDS:
+            v = getattr(live, field)
+            values[SUM_FIELDS.index(field), -1] = (
+                int(v * 100) if field in MONEY_FIELDS else int(v)
+            )
+
+    zeros = np.zeros((len(SUM_FIELDS), 1), dtype=np.int64)
+    cum = np.concatenate([zeros, np.cumsum(values, axis=1)], axis=1)
+    cum_present = np.concatenate([[0], np.cumsum(present)])
+
+    def totals(lo: int, hi: int) -> dict:
+        """Summed columns for array positions [lo, hi)."""
+        diff = cum[:, hi] - cum[:, max(lo, 0)]
+        return dict(zip(SUM_FIELDS, diff.tolist()))
+
+    rows.sort(key=lambda r: r["day"])
+    chart_rows = [
+        {
+            "day": r["day"],
+            "revenue": r["revenue"],
+            "orders": r["orders"],
+            "refunded_amount": r["refunded_amount"],
+        }
+        for r in rows
+    ]
+    if live is not None:
+        live_row = {
+            "day": end_day,
+            "revenue": live.revenue,
+            "orders": live.orders,
+            "refunded_amount": live.refunded_amount,
+        }
+        if chart_rows and chart_rows[-1]["day"] == end_day:
+            chart_rows[-1] = live_row
+        else:
+            chart_rows.append(live_row)
+
+    out = {}
+    for days in windows:
+        lo = span - days
+        snap_days = int(cum_present[span] - cum_present[lo])
+        window_start = end_day - timedelta(days=days - 1)
+        meta = {
+            "start_day": window_start,
+            "end_day": end_day,
+            "snap_days": snap_days,
+            "is_complete": snap_days == days,
+            "missing_days": max(days - snap_days, 0),
+            "live_today": live is not None,
+        }
+        daily = [d for d in chart_rows if d["day"] >= window_start]
+        payload = _window_payload(totals(lo, span), meta, daily)
+
+        if compare:
+            previous = _window_payload(totals(lo - days, lo), {}, [])
+            payload["previous"] = {k: previous[k] for k in ("rev", "cust", "funnel")}
+            payload["delta"] = {
+                metric: _pct_change(payload[group][metric], previous[group][metric])
+                for group, metric in DELTA_METRICS
+            }
+        out[days] = payload
+    return out
+
+
+def snapshot_kpis(days: int) -> dict:
+    """
+    Return window KPIs aggregated from daily snapshots for the LAST N CALENDAR DAYS.
+
+    Always returns:
+      - rev, cust, funnel
+      - daily: list of dicts for charts (day, revenue, orders, refunded_amount)
+      - meta: completeness + date window info
+
+    Meta fields:
+      - start_day / end_day: calendar window boundaries (inclusive)
+      - snap_days: how many snapshot rows exist in that window
+      - is_complete: True iff snap_days == days
+      - missing_days: max(days - snap_days, 0)
+      - live_today: True if today's revenue/refund figures come from the
+        write-time AnalyticsLiveCounter instead of the last snapshot build
+    """
+    days = max(int(days), 1)
+    return snapshot_kpis_windows((days,), compare=False)[days]
+
+
+def kpi_windows_watermark(span_days: int) -> str:
+    """Cheap fingerprint of the snapshot rows / live counter behind a span."""
+    end_day = timezone.localdate()
+    agg = AnalyticsSnapshotDaily.objects.filter(
+        day__range=(end_day - timedelta(days=span_days - 1), end_day)
+    ).aggregate(
+        n=Count("id"), ts=Max("computed_at"), rev=Sum("revenue"), orders=Sum("orders")
+    )
+    live = (
+        AnalyticsLiveCounter.objects.filter(day=end_day)
+        .values_list("updated_at", flat=True)
+        .first()
+    )
+    return f"{end_day}|{agg['n']}|{agg['ts']}|{agg['rev']}|{agg['orders']}|{live}"
+
+
+def cached_kpi_windows() -> dict[int, dict]:
+    """
+    All standard windows (7/30/90 + previous periods) as one cached payload,
+    shared by the dashboard and the KPI export. The cache key embeds the
+    snapshot watermark, so a rebuild or live-counter bump is seen at once.
+    """
+    mark = kpi_windows_watermark(STANDARD_WINDOWS[-1] * 2)
+    key = "analytics:kpi_windows:" + hashlib.sha256(mark.encode()).hexdigest()[:24]
+    return cache.get_or_set(key, snapshot_kpis_windows, KPI_WINDOWS_CACHE_TTL)
+
+
+def order_value_distribution(days: int, *, bins: int = 12) -> dict:
+    """
+    Order-value percentiles (p50/p90/p99) and a basket-size histogram for the
+    last N calendar days, merged from the per-day `total_sketch` digests
+    (one read of N snapshot rows; orders are never sorted or scanned).
+    """
+    if days < 1:
+        days = 1
+
+    end_day = timezone.localdate()
+    start_day = end_day - timedelta(days=days - 1)
+
+    digest = merge_digests(
+        AnalyticsSnapshotDaily.objects.filter(
+            day__range=(start_day, end_day)
+        ).values_list("total_sketch", flat=True)
+    )
+
+    def pct(q: float) -> Decimal | None:
+        v = digest_quantile(digest, q)
+        return None if v is None else Decimal(str(v)).quantize(Decimal("0.01"))
+
+    return {
+        "n": digest["n"],
+        "p50": pct(0.5),
+        "p90": pct(0.9),
+        "p99": pct(0.99),
+        "histogram": digest_histogram(digest, bins),
+    }
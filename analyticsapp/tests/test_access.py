@@ -43,6 +43,7 @@ class AnalyticsAccessTests(TestCase):
             "analytics-export-orders",
             "analytics-export-products",
             "analytics-export-customers",
+            "analytics-export-countries",
         ):
             resp = self.client.get(reverse(name) + "?days=30")
             self.assertIn(resp.status_code, (301, 302))
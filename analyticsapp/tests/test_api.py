@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsSnapshotDaily
+
+
+class AnalyticsApiTests(TestCase):
+    def setUp(self) -> None:
+        admin = get_user_model().objects.create_user(
+            username="api_admin", password="x", is_staff=True, is_superuser=True
+        )
+        self.client.force_login(admin)
+        self.snap = AnalyticsSnapshotDaily.objects.create(
+            day=timezone.localdate(), revenue=Decimal("42.50"), orders=2
+        )
+
+    def test_kpis_payload_and_etag(self) -> None:
+        resp = self.client.get(reverse("analytics-api-kpis"), {"days": 7})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp["ETag"].startswith('"'))
+        body = resp.json()
+        self.assertEqual(body["version"], "v1")
+        self.assertEqual(Decimal(body["rev"]["revenue"]), Decimal("42.50"))
+        self.assertEqual(body["rev"]["orders"], 2)
+
+    def test_if_none_match_returns_304_until_snapshot_changes(self) -> None:
+        url = reverse("analytics-api-series")
+        etag = self.client.get(url, {"days": 7})["ETag"]
+
+        resp = self.client.get(url, {"days": 7}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.content, b"")
+
+        # A different window is a different representation.
+        resp = self.client.get(url, {"days": 30}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+
+        self.snap.revenue = Decimal("50.00")
+        self.snap.save()
+        resp = self.client.get(url, {"days": 7}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(Decimal(resp.json()["daily"][-1]["revenue"]), Decimal("50"))
+
+    def test_long_series_is_downsampled_keeping_spikes(self) -> None:
+        today = timezone.localdate()
+        AnalyticsSnapshotDaily.objects.bulk_create(
+            AnalyticsSnapshotDaily(
+                day=today - timedelta(days=i),
+                revenue=Decimal("900.00") if i == 200 else Decimal("10.00") + i % 7,
+                orders=1,
+                refunded_amount=Decimal("75.00") if i == 100 else Decimal("0.00"),
+            )
+            for i in range(1, 365)
+        )
+        url = reverse("analytics-api-series")
+
+        body = self.client.get(url, {"days": 365}).json()
+        days = [row["day"] for row in body["daily"]]
+        self.assertTrue(body["downsampled"])
+        self.assertLessEqual(len(days), body["max_points"])
+        self.assertEqual(days[0], str(today - timedelta(days=364)))
+        self.assertEqual(days[-1], str(today))
+        self.assertIn(str(today - timedelta(days=200)), days)
+        self.assertIn(str(today - timedelta(days=100)), days)
+
+        full = self.client.get(url, {"days": 365, "max_points": 365}).json()
+        self.assertFalse(full["downsampled"])
+        self.assertEqual(len(full["daily"]), 365)
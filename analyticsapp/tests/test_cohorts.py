@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+from datetime import date, datetime, time
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsCohortMonthly
+from analyticsapp.services.cohorts import cohort_matrix, rebuild_cohorts
+from analyticsapp.services.customer_index import rebuild_customer_index
+from orders.models import Order
+from payments.services.webhook_handlers import handle_payment_intent_succeeded
+from subscriptions.models import Subscription
+
+
+def _months_ago(n: int) -> date:
+    today = timezone.localdate()
+    idx = today.year * 12 + today.month - 1 - n
+    return date(idx // 12, idx % 12 + 1, 1)
+
+
+def _at(month: date, day: int = 10):
+    return timezone.make_aware(datetime.combine(month.replace(day=day), time(12)))
+
+
+class CohortEngineTests(TestCase):
+    def _paid(self, email: str, month: date, total: str = "10.00") -> Order:
+        o = Order.objects.create(email=email, status="paid", total=Decimal(total))
+        Order.objects.filter(id=o.id).update(created_at=_at(month))
+        return o
+
+    def _cells(self, source: str = "orders") -> dict:
+        return {
+            (c.cohort_month, c.months_since): (c.customers, c.orders, c.revenue)
+            for c in AnalyticsCohortMonthly.objects.filter(source=source)
+        }
+
+    def test_vectorised_rebuild_matches_expected_matrix(self) -> None:
+        m2, m1, m0 = _months_ago(2), _months_ago(1), _months_ago(0)
+        self._paid("a@example.com", m2)
+        self._paid("a@example.com", m2)
+        self._paid("a@example.com", m1)
+        self._paid("a@example.com", m0)
+        self._paid("b@example.com", m1, total="5.00")
+
+        rebuild_cohorts()
+        cells = self._cells()
+
+        self.assertEqual(cells[(m2, 0)], (1, 2, Decimal("20.00")))
+        self.assertEqual(cells[(m2, 1)], (1, 1, Decimal("10.00")))
+        self.assertEqual(cells[(m2, 2)], (1, 1, Decimal("10.00")))
+        self.assertEqual(cells[(m1, 0)], (1, 1, Decimal("5.00")))
+
+        matrix = cohort_matrix(source="orders", months=12)
+        self.assertEqual(matrix["cohorts"], [m2, m1])
+        self.assertEqual(matrix["retention_pct"][0], [100.0, 100.0, 100.0])
+        self.assertEqual(matrix["sizes"], [1, 1])
+
+    def test_incremental_paid_path_matches_rebuild(self) -> None:
+        self._paid("a@example.com", _months_ago(1))
+        rebuild_customer_index()
+        rebuild_cohorts()
+
+        order = Order.objects.create(
+            email="a@example.com", status="pending", total=Decimal("7.50")
+        )
+        handle_payment_intent_succeeded(
+            intent={"id": "pi_cohort_1", "metadata": {"order_id": str(order.id)}}
+        )
+        incremental = self._cells()
+
+        rebuild_cohorts()
+        self.assertEqual(incremental, self._cells())
+        self.assertEqual(incremental[(_months_ago(1), 1)], (1, 1, Decimal("7.50")))
+
+    def test_frequent_refresh_leaves_the_matrix_to_the_full_build(self) -> None:
+        self._paid("a@example.com", _months_ago(1))
+
+        call_command(
+            "build_analytics_snapshots", days=2, skip_rollups=True, stdout=StringIO()
+        )
+        self.assertEqual(self._cells(), {})
+
+        call_command("build_analytics_snapshots", days=2, stdout=StringIO())
+        self.assertEqual(len(self._cells()), 1)
+
+    def test_subscription_cohorts_track_alive_subscriptions(self) -> None:
+        user = get_user_model().objects.create_user(username="sub_c", password="x")
+        m2 = _months_ago(2)
+
+        live = Subscription.objects.create(user=user, status="active", mrr_pennies=900)
+        ended = Subscription.objects.create(
+            user=user,
+            status="canceled",
+            mrr_pennies=500,
+            ended_at=_at(_months_ago(1)),
+        )
+        Subscription.objects.filter(id__in=[live.id, ended.id]).update(
+            created_at=_at(m2)
+        )
+
+        rebuild_cohorts()
+        cells = self._cells("subscriptions")
+
+        self.assertEqual(cells[(m2, 0)], (2, 0, Decimal("14.00")))
+        self.assertEqual(cells[(m2, 1)], (1, 0, Decimal("9.00")))
+        self.assertEqual(cells[(m2, 2)], (1, 0, Decimal("9.00")))
+
+    def test_cohort_export_csv(self) -> None:
+        admin = get_user_model().objects.create_user(
+            username="cohort_admin", password="x", is_staff=True, is_superuser=True
+        )
+        self.client.force_login(admin)
+        self._paid("a@example.com", _months_ago(0))
+        rebuild_cohorts()
+
+        resp = self.client.get(reverse("analytics-export-cohorts"))
+        self.assertEqual(resp.status_code, 200)
+        lines = resp.content.decode().strip().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(_months_ago(0).isoformat()))
+
+    def test_cohort_export_parquet(self) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        admin = get_user_model().objects.create_user(
+            username="cohort_admin", password="x", is_staff=True, is_superuser=True
+        )
+        self.client.force_login(admin)
+        self._paid("a@example.com", _months_ago(0))
+        rebuild_cohorts()
+
+        resp = self.client.get(
+            reverse("analytics-export-cohorts"), {"format": "parquet"}
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], "application/vnd.apache.parquet")
+        table = pq.read_table(pa.BufferReader(resp.content))
+        self.assertEqual(table.column_names[0], "CohortMonth")
+        self.assertEqual(
+            table.column("CohortMonth").to_pylist(), [_months_ago(0).isoformat()]
+        )
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+import numpy as np
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsCountryDaily, AnalyticsSnapshotDaily
+from analyticsapp.services.columnar import build_columnar_store, load_table
+
+
+class ColumnarStoreTests(TestCase):
+    def setUp(self) -> None:
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+        self.today = timezone.localdate()
+        for offset in (3, 2, 1, 0):
+            day = self.today - timedelta(days=offset)
+            AnalyticsSnapshotDaily.objects.create(
+                day=day, revenue=Decimal("10.05") * offset, orders=offset
+            )
+        AnalyticsCountryDaily.objects.create(
+            day=self.today - timedelta(days=2),
+            country="GB",
+            revenue=Decimal("12.34"),
+            orders=2,
+        )
+
+    def test_columns_are_memory_mapped_and_match_the_database(self) -> None:
+        appended = build_columnar_store(self.root)
+
+        # Only complete days (up to yesterday) are appended.
+        self.assertEqual(appended["snapshots"], 3)
+        cols = load_table(self.root, "snapshots")
+        self.assertIsInstance(cols["revenue_pennies"], np.memmap)
+        self.assertEqual(list(cols["revenue_pennies"]), [3015, 2010, 1005])
+        self.assertEqual(list(cols["orders"]), [3, 2, 1])
+        self.assertEqual(
+            cols["day"][-1], np.datetime64(self.today - timedelta(days=1), "D")
+        )
+
+        country = load_table(self.root, "country_daily")
+        self.assertEqual(list(country["country"]), [b"GB"])
+        self.assertEqual(list(country["revenue_pennies"]), [1234])
+
+        self.assertEqual(len(load_table(self.root, "product_daily")["units"]), 0)
+
+    def test_incremental_run_appends_only_new_days(self) -> None:
+        build_columnar_store(self.root, until=self.today - timedelta(days=2))
+        self.assertEqual(len(load_table(self.root, "snapshots")["day"]), 2)
+
+        # Past days changed after the append are not rewritten...
+        AnalyticsSnapshotDaily.objects.filter(
+            day=self.today - timedelta(days=3)
+        ).update(orders=99)
+        appended = build_columnar_store(self.root, until=self.today)
+        self.assertEqual(appended["snapshots"], 1)  # today isn't complete yet
+        self.assertEqual(list(load_table(self.root, "snapshots")["orders"]), [3, 2, 1])
+
+        # ...until the store is rebuilt.
+        build_columnar_store(self.root, until=self.today, rebuild=True)
+        self.assertEqual(list(load_table(self.root, "snapshots")["orders"]), [99, 2, 1])
+
+    def test_days_built_before_they_ended_are_appended_later(self) -> None:
+        yesterday = self.today - timedelta(days=1)
+        # Yesterday's rollups were last built mid-day, so they're partial.
+        AnalyticsSnapshotDaily.objects.filter(day=yesterday).update(
+            computed_at=timezone.now() - timedelta(days=1)
+        )
+
+        self.assertEqual(build_columnar_store(self.root)["snapshots"], 2)
+        manifest = json.loads((self.root / "manifest.json").read_text())
+        self.assertEqual(
+            manifest["tables"]["snapshots"]["last_day"],
+            (self.today - timedelta(days=2)).isoformat(),
+        )
+
+        # The nightly build rewrites yesterday; the next run picks it up.
+        AnalyticsSnapshotDaily.objects.filter(day=yesterday).update(
+            computed_at=timezone.now()
+        )
+        self.assertEqual(build_columnar_store(self.root)["snapshots"], 1)
+        self.assertEqual(list(load_table(self.root, "snapshots")["orders"]), [3, 2, 1])
+
+    def test_torn_tail_from_a_crashed_append_is_dropped(self) -> None:
+        build_columnar_store(self.root, until=self.today - timedelta(days=2))
+        with open(self.root / "snapshots" / "orders.bin", "ab") as fh:
+            fh.write(b"\x07\x00")
+
+        build_columnar_store(self.root)
+        self.assertEqual(list(load_table(self.root, "snapshots")["orders"]), [3, 2, 1])
+
+    def test_command_writes_manifest(self) -> None:
+        out = StringIO()
+        call_command(
+            "build_columnar_store",
+            root=str(self.root),
+            tables="snapshots",
+            stdout=out,
+        )
+        self.assertIn("snapshots=+3", out.getvalue())
+
+        manifest = json.loads((self.root / "manifest.json").read_text())
+        meta = manifest["tables"]["snapshots"]
+        self.assertEqual(meta["rows"], 3)
+        self.assertEqual(meta["last_day"], (self.today - timedelta(days=1)).isoformat())
+        self.assertEqual(meta["columns"]["revenue_pennies"]["dtype"], "<i8")
+        self.assertNotIn("country_daily", manifest["tables"])
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import csv
+import io
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsCountryDaily
+from analyticsapp.services.country_rollup import country_rollup
+from audit.models import AuditLog
+from orders.models import Order
+
+
+class CountryRollupTests(TestCase):
+    def setUp(self) -> None:
+        yesterday = timezone.now() - timedelta(days=1)
+
+        def order(country, total, **extra):
+            o = Order.objects.create(
+                email=f"{country or 'none'}{total}@example.com",
+                status="paid",
+                total=Decimal(total),
+                shipping_country=country,
+                **extra,
+            )
+            Order.objects.filter(id=o.id).update(created_at=yesterday)
+            return o
+
+        order("GB", "30.00")
+        order("GB", "10.00", refund_amount_pennies=250, refunded_at=timezone.now())
+        order("lk", "15.00")
+        order("", "5.00")
+        Order.objects.create(
+            email="pending@example.com",
+            status="pending",
+            total=Decimal("99.00"),
+            shipping_country="GB",
+        )
+
+        call_command("build_analytics_snapshots", days=7, stdout=StringIO())
+
+    def test_builder_writes_rows_per_country_and_day(self) -> None:
+        day = timezone.localdate() - timedelta(days=1)
+        gb = AnalyticsCountryDaily.objects.get(day=day, country="GB")
+        self.assertEqual((gb.orders, gb.revenue), (2, Decimal("40.00")))
+
+        refund = AnalyticsCountryDaily.objects.get(
+            day=timezone.localdate(), country="GB"
+        )
+        self.assertEqual(
+            (refund.orders, refund.refunded_orders, refund.refunded_amount),
+            (0, 1, Decimal("2.50")),
+        )
+        self.assertTrue(
+            AnalyticsCountryDaily.objects.filter(day=day, country="LK").exists()
+        )
+
+    def test_rollup_reads_only_the_rollup_table(self) -> None:
+        with self.assertNumQueries(1):
+            rows = country_rollup(7)
+
+        self.assertEqual(
+            [(r["country"], r["orders"], r["revenue"]) for r in rows],
+            [
+                ("GB", 2, Decimal("40.00")),
+                ("LK", 1, Decimal("15.00")),
+                ("Unknown", 1, Decimal("5.00")),
+            ],
+        )
+        self.assertEqual(rows[0]["refunded_amount"], Decimal("2.50"))
+
+    def test_countries_export_is_audited(self) -> None:
+        admin = get_user_model().objects.create_user(
+            username="geo_admin", password="x", is_staff=True, is_superuser=True
+        )
+        self.client.force_login(admin)
+
+        resp = self.client.get(reverse("analytics-export-countries"), {"days": 7})
+
+        self.assertEqual(resp.status_code, 200)
+        rows = list(csv.reader(io.StringIO(resp.content.decode())))
+        self.assertEqual(rows[1], ["GB", "2", "40.00", "1", "2.50"])
+        self.assertTrue(
+            AuditLog.objects.filter(
+                event_type="analytics_export", entity_type="countries_csv"
+            ).exists()
+        )
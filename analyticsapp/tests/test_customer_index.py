@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from analyticsapp.models import CustomerFirstOrder
+from analyticsapp.services.customer_index import (
+    rebuild_customer_index,
+    refresh_customer,
+)
+from analyticsapp.services.customers import customer_kpis
+from orders.models import Order
+from payments.services.webhook_handlers import handle_payment_intent_succeeded
+from payments.services.webhook_refund_handlers import handle_charge_refunded
+
+
+class CustomerFirstOrderIndexTests(TestCase):
+    def setUp(self) -> None:
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            username="idx_user", email="idx@example.com", password="pass12345"
+        )
+
+    def _order(self, *, status: str, total: str, days_ago: int = 0) -> Order:
+        o = Order.objects.create(
+            user=self.user,
+            email=self.user.email,
+            status=status,
+            subtotal=Decimal(total),
+            total=Decimal(total),
+        )
+        if days_ago:
+            Order.objects.filter(id=o.id).update(
+                created_at=timezone.now() - timedelta(days=days_ago)
+            )
+            o.refresh_from_db()
+        return o
+
+    def test_index_updated_on_paid_and_refunded(self) -> None:
+        order = self._order(status="pending", total="25.00")
+        self.assertFalse(CustomerFirstOrder.objects.exists())
+
+        handle_payment_intent_succeeded(
+            intent={
+                "id": "pi_idx_1",
+                "metadata": {"order_id": str(order.id)},
+                "latest_charge": "ch_idx_1",
+            }
+        )
+
+        row = CustomerFirstOrder.objects.get(email="idx@example.com")
+        self.assertEqual(row.order_count, 1)
+        self.assertEqual(row.lifetime_spend, Decimal("25.00"))
+        self.assertEqual(row.user_id, self.user.id)
+
+        handle_charge_refunded(
+            charge={
+                "id": "ch_idx_1",
+                "metadata": {"order_id": str(order.id)},
+                "amount": 2500,
+                "amount_refunded": 500,
+            }
+        )
+
+        row.refresh_from_db()
+        self.assertEqual(row.lifetime_refunded_pennies, 500)
+
+    def test_customer_kpis_sees_orders_outside_window(self) -> None:
+        # First purchase long before the window => returning customer in window.
+        self._order(status="paid", total="10.00", days_ago=200)
+        self._order(status="paid", total="15.00", days_ago=2)
+
+        other = Order.objects.create(
+            email="new@example.com", status="paid", total=Decimal("5.00")
+        )
+        self.assertIsNotNone(other.id)
+
+        self.assertEqual(rebuild_customer_index(), 2)
+
+        end = timezone.now()
+        out = customer_kpis(end - timedelta(days=30), end)
+
+        self.assertEqual(out["unique"], 2)
+        self.assertEqual(out["new"], 1)
+        self.assertEqual(out["repeat"], 1)
+        self.assertEqual(out["repeat_rate"], 50.0)
+        self.assertEqual(out["ltv"], Decimal("15.00"))
+
+    def test_rebuild_and_refresh_agree_on_latest_user(self) -> None:
+        # The older order belongs to the higher user id, so Max(user_id) would
+        # disagree with "latest order's user".
+        other = get_user_model().objects.create_user(
+            username="idx_other", password="pass12345"
+        )
+        self._order(status="paid", total="10.00", days_ago=1)
+        old = self._order(status="paid", total="10.00", days_ago=30)
+        Order.objects.filter(id=old.id).update(user=other)
+
+        rebuild_customer_index()
+        rebuilt = CustomerFirstOrder.objects.get(email="idx@example.com").user_id
+
+        refresh_customer("idx@example.com")
+        refreshed = CustomerFirstOrder.objects.get(email="idx@example.com").user_id
+
+        self.assertEqual(rebuilt, self.user.id)
+        self.assertEqual(refreshed, self.user.id)
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from analyticsapp.services.downsample import (
+    downsample_rows,
+    downsample_series,
+    lttb_indices,
+    minmax_indices,
+)
+
+
+class DownsampleTests(SimpleTestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(7)
+        self.y = rng.normal(100, 5, size=2000)
+        self.y[1234] = 900.0  # revenue spike
+        self.y[777] = -50.0  # dip
+
+    def test_lttb_caps_points_and_keeps_spike(self) -> None:
+        idx = lttb_indices(self.y, 100)
+
+        self.assertEqual(idx.size, 100)
+        self.assertEqual((idx[0], idx[-1]), (0, 1999))
+        self.assertTrue(np.all(np.diff(idx) > 0))
+        self.assertIn(1234, idx)
+
+    def test_minmax_keeps_both_extremes(self) -> None:
+        idx = minmax_indices(self.y, 100)
+
+        self.assertLessEqual(idx.size, 100)
+        self.assertIn(1234, idx)
+        self.assertIn(777, idx)
+
+    @override_settings(ANALYTICS_CHART_MAX_POINTS=50)
+    def test_downsample_series_uses_setting_and_skips_short_series(self) -> None:
+        x = [f"d{i}" for i in range(self.y.size)]
+        xs, ys = downsample_series(x, self.y.tolist())
+        self.assertEqual(len(xs), 50)
+        self.assertEqual(len(xs), len(ys))
+        self.assertEqual(xs[0], "d0")
+
+        self.assertEqual(downsample_series(["a", "b"], [1, 2]), (["a", "b"], [1, 2]))
+
+    def test_downsample_rows_keeps_every_series_spike(self) -> None:
+        rows = [{"revenue": v, "refunds": 0.0} for v in self.y.tolist()]
+        rows[99]["refunds"] = 40.0
+
+        out = downsample_rows(
+            rows, {"revenue": "lttb", "refunds": "minmax"}, max_points=100
+        )
+
+        self.assertLessEqual(len(out), 100)
+        self.assertIn(rows[1234], out)
+        self.assertIn(rows[99], out)
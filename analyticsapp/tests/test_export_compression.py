@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import gzip
+from decimal import Decimal
+from unittest import skipIf
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from analyticsapp import streaming
+from orders.models import Order
+
+
+class CompressedExportTests(TestCase):
+    def setUp(self) -> None:
+        admin = get_user_model().objects.create_user(
+            username="gz_admin", password="x", is_staff=True, is_superuser=True
+        )
+        self.client.force_login(admin)
+        for i in range(1200):  # spans several CSV batches
+            Order.objects.create(
+                email=f"c{i}@example.com", status="paid", total=Decimal("9.99")
+            )
+        self.url = reverse("analytics-export-orders")
+
+    def _stream(self, resp) -> bytes:
+        return b"".join(resp.streaming_content)
+
+    def test_compress_param_returns_gzip_file_matching_plain_csv(self) -> None:
+        plain = self.client.get(self.url).content
+
+        resp = self.client.get(self.url, {"compress": "gzip"})
+
+        self.assertEqual(resp["Content-Type"], "application/gzip")
+        self.assertIn('orders_paid_30d.csv.gz"', resp["Content-Disposition"])
+        self.assertFalse(resp.has_header("Content-Encoding"))
+        body = self._stream(resp)
+        self.assertEqual(gzip.decompress(body).decode(), plain.decode())
+        self.assertLess(len(body), len(plain) / 4)
+
+    def test_accept_encoding_negotiates_transfer_encoding(self) -> None:
+        resp = self.client.get(self.url, HTTP_ACCEPT_ENCODING="br, gzip;q=0.8")
+
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+        self.assertTrue(resp["Content-Type"].startswith("text/csv"))
+        self.assertIn("Accept-Encoding", resp["Vary"])
+        lines = gzip.decompress(self._stream(resp)).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[0], "OrderID")
+        self.assertEqual(len(lines), 1201)
+
+    def test_refused_encoding_falls_back_to_plain(self) -> None:
+        resp = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip;q=0")
+
+        self.assertFalse(resp.has_header("Content-Encoding"))
+        self.assertTrue(resp.content.startswith(b"OrderID,"))
+
+    @skipIf(streaming.zstandard is not None, "zstandard installed")
+    def test_explicit_zstd_without_package_is_501(self) -> None:
+        resp = self.client.get(self.url, {"compress": "zstd"})
+        self.assertEqual(resp.status_code, 501)
+
+    @skipIf(streaming.zstandard is None, "zstandard not installed")
+    def test_compress_param_returns_zstd_file_matching_plain_csv(self) -> None:
+        plain = self.client.get(self.url).content
+
+        resp = self.client.get(self.url, {"compress": "zstd"})
+
+        self.assertEqual(resp["Content-Type"], "application/zstd")
+        self.assertIn('orders_paid_30d.csv.zst"', resp["Content-Disposition"])
+        reader = streaming.zstandard.ZstdDecompressor().stream_reader(
+            self._stream(resp)
+        )
+        self.assertEqual(reader.read().decode(), plain.decode())
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import csv
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from analyticsapp.models import ExportJob
+from analyticsapp.services.export_jobs import (
+    claim_next_job,
+    enqueue_export,
+    run_export_job,
+    window_params,
+)
+from orders.models import Order
+
+
+class ExportJobTests(TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        override = override_settings(ANALYTICS_EXPORT_ROOT=self.tmp)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        for i in range(7):
+            Order.objects.create(
+                email=f"c{i}@example.com", status="paid", total=Decimal("10.00")
+            )
+
+    def _rows(self, job: ExportJob) -> list[list[str]]:
+        return list(csv.reader(StringIO(Path(job.file_path).read_text())))
+
+    def test_queue_from_export_view_then_worker_then_download(self) -> None:
+        admin = get_user_model().objects.create_user(
+            username="export_admin", password="x", is_staff=True, is_superuser=True
+        )
+        self.client.force_login(admin)
+
+        resp = self.client.get(
+            reverse("analytics-export-orders"), {"days": 30, "background": 1}
+        )
+        self.assertEqual(resp.status_code, 202)
+        status_url = resp.json()["status_url"]
+
+        call_command("run_export_worker", once=True, chunk_size=3, stdout=StringIO())
+
+        status = self.client.get(status_url).json()
+        self.assertEqual(status["status"], "done")
+        self.assertEqual(status["rows_written"], 7)
+        self.assertEqual(status["progress_pct"], 100.0)
+
+        download = self.client.get(status["download_url"])
+        body = b"".join(download.streaming_content).decode()
+        rows = list(csv.reader(StringIO(body)))
+        self.assertEqual(rows[0][0], "OrderID")
+        self.assertEqual(len(rows), 8)
+
+    def test_dashboard_links_background_exports(self) -> None:
+        admin = get_user_model().objects.create_user(
+            username="export_admin2", password="x", is_staff=True, is_superuser=True
+        )
+        self.client.force_login(admin)
+
+        page = self.client.get(reverse("analytics-dashboard"), {"days": 7})
+        href = reverse("analytics-export-orders") + "?days=7&background=1"
+        self.assertContains(page, f'data-background-export href="{href}"')
+
+        resp = self.client.get(href)
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(ExportJob.objects.get().params["days"], 7)
+
+    def test_crashed_job_resumes_from_last_checkpoint(self) -> None:
+        job = enqueue_export("orders", window_params(30))
+        job = claim_next_job(stale_after=timedelta(minutes=5))
+        run_export_job(job, chunk_size=3)
+        expected = self._rows(job)
+
+        # Simulate a crash after the first checkpoint: rewind the job state and
+        # leave a torn, un-checkpointed write at the end of the file.
+        header_and_first_chunk = b"".join(
+            Path(job.file_path).read_bytes().splitlines(keepends=True)[:4]
+        )
+        Path(job.file_path).write_bytes(header_and_first_chunk + b"999,torn-ro")
+        ExportJob.objects.filter(id=job.id).update(
+            status="running",
+            cursor=expected[3][0],
+            rows_written=3,
+            bytes_written=len(header_and_first_chunk),
+            heartbeat_at=job.heartbeat_at - timedelta(hours=1),
+        )
+
+        resumed = claim_next_job(stale_after=timedelta(minutes=5))
+        self.assertEqual(resumed.id, job.id)
+        self.assertEqual(resumed.attempts, 2)
+
+        run_export_job(resumed, chunk_size=3)
+        self.assertEqual(resumed.status, "done")
+        self.assertEqual(self._rows(resumed), expected)
+
+    def test_stale_owner_stops_once_another_worker_reclaims(self) -> None:
+        enqueue_export("orders", window_params(30))
+        first = claim_next_job(stale_after=timedelta(minutes=5))
+
+        # The first worker stalls long enough for its heartbeat to go stale.
+        ExportJob.objects.filter(id=first.id).update(
+            heartbeat_at=first.heartbeat_at - timedelta(hours=1)
+        )
+        second = claim_next_job(stale_after=timedelta(minutes=5))
+        self.assertEqual((second.id, second.attempts), (first.id, 2))
+
+        run_export_job(first, chunk_size=3)
+        self.assertEqual(first.status, "running")
+        self.assertEqual(first.rows_written, 0)
+        self.assertFalse(Path(self.tmp, f"export_{first.id}.csv").exists())
+
+        run_export_job(second, chunk_size=3)
+        self.assertEqual(second.status, "done")
+        self.assertEqual(len(self._rows(second)), 8)
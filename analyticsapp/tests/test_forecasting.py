@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import UserRole
+from analyticsapp.models import AnalyticsSnapshotDaily
+from analyticsapp.services import forecasting
+from analyticsapp.services.forecasting import (
+    build_forecasts,
+    cached_forecasts,
+    daily_mrr_history,
+    fit_smoothing,
+    project,
+)
+from subscriptions.models import Subscription
+
+
+def weekly_revenue(day) -> Decimal:
+    return Decimal("200.00") if day.weekday() >= 5 else Decimal("100.00")
+
+
+class ForecastingTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.yesterday = timezone.localdate() - timedelta(days=1)
+        AnalyticsSnapshotDaily.objects.bulk_create(
+            AnalyticsSnapshotDaily(day=day, revenue=weekly_revenue(day), orders=1)
+            for day in (self.yesterday - timedelta(days=i) for i in range(120))
+        )
+        self.user = get_user_model().objects.create_user(
+            username="forecast", password="pass12345"
+        )
+
+    def _subscription(self, *, days_ago: int, pennies: int, **extra):
+        sub = Subscription.objects.create(user=self.user, mrr_pennies=pennies, **extra)
+        Subscription.objects.filter(id=sub.id).update(
+            created_at=timezone.now() - timedelta(days=days_ago)
+        )
+        return sub
+
+    def test_weekly_season_is_projected_forward(self) -> None:
+        y = np.tile([100.0] * 5 + [200.0] * 2, 20)
+        fit = fit_smoothing(y, season=7)
+        ahead = project(fit, 14)["value"]
+
+        np.testing.assert_allclose(ahead, np.tile([100.0] * 5 + [200.0] * 2, 2), atol=1)
+        self.assertIsNone(fit_smoothing(y[:10], season=7))
+
+    def test_mrr_history_follows_subscription_lifetimes(self) -> None:
+        self._subscription(days_ago=10, pennies=1000, status="active")
+        self._subscription(
+            days_ago=20,
+            pennies=500,
+            status="canceled",
+            canceled_at=timezone.now() - timedelta(days=5),
+        )
+        self._subscription(days_ago=30, pennies=9900, status="incomplete")
+
+        start = self.yesterday - timedelta(days=29)
+        mrr = daily_mrr_history(start, self.yesterday)
+
+        self.assertEqual(mrr[0], 0)
+        self.assertEqual(mrr[-8], 15.0)  # 8 days ago: both live
+        self.assertEqual(mrr[-1], 10.0)  # the canceled one stopped 5 days ago
+
+    def test_revenue_totals_and_flat_mrr(self) -> None:
+        self._subscription(days_ago=60, pennies=2500, status="active")
+
+        forecasts = build_forecasts()
+
+        revenue = forecasts["revenue"]
+        expected_30 = sum(
+            weekly_revenue(self.yesterday + timedelta(days=i)) for i in range(1, 31)
+        )
+        self.assertLess(abs(revenue["totals"][30] - expected_30), Decimal("30"))
+        self.assertEqual(len(revenue["forecast"]), 90)
+        self.assertEqual(revenue["forecast"][0]["day"], timezone.localdate())
+        self.assertEqual(len(revenue["history"]), 120)
+
+        self.assertEqual(forecasts["mrr"]["totals"][90], Decimal("25.00"))
+
+    def test_cached_until_a_new_day_lands(self) -> None:
+        with mock.patch.object(
+            forecasting, "build_forecasts", wraps=build_forecasts
+        ) as build:
+            cached_forecasts()
+            cached_forecasts()
+            self.assertEqual(build.call_count, 1)
+
+            # A refresh that rewrites the same values is not a new input.
+            AnalyticsSnapshotDaily.objects.get(day=self.yesterday).save()
+            cached_forecasts()
+            self.assertEqual(build.call_count, 1)
+
+            AnalyticsSnapshotDaily.objects.filter(day=self.yesterday).update(
+                revenue=Decimal("150.00")
+            )
+            cached_forecasts()
+            self.assertEqual(build.call_count, 2)
+
+    def test_dashboard_shows_projections(self) -> None:
+        staff = get_user_model().objects.create_user(
+            username="analyst-fc", password="pass12345", is_staff=True
+        )
+        UserRole.objects.update_or_create(user=staff, defaults={"role": "analyst"})
+        self.client.force_login(staff)
+
+        resp = self.client.get(reverse("analytics-dashboard"))
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, "Projected Revenue")
+        self.assertContains(resp, "Revenue forecast")
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsSnapshotDaily, UserFunnelState
+from analyticsapp.services.funnel_events import (
+    cached_funnel_counts,
+    funnel_counts,
+    funnel_counts_by_day,
+    record_funnel_event,
+    rebuild_funnel_states,
+)
+from orders.models import Order
+
+
+class UserFunnelEventTests(TestCase):
+    def setUp(self) -> None:
+        User = get_user_model()
+        self.users = [
+            User.objects.create_user(username=f"f{i}", password="pass12345")
+            for i in range(4)
+        ]
+        self.t0 = timezone.now() - timedelta(days=10)
+
+    def _events(self, user, **offsets_hours) -> None:
+        for step, hours in offsets_hours.items():
+            record_funnel_event(
+                user_id=user.id, step=step, at=self.t0 + timedelta(hours=hours)
+            )
+
+    def test_first_event_wins(self) -> None:
+        u = self.users[0]
+        self._events(u, product_view=5)
+        self._events(u, product_view=1)
+        self._events(u, product_view=9)
+
+        state = UserFunnelState.objects.get(user=u)
+        self.assertEqual(state.first_product_view_at, self.t0 + timedelta(hours=5))
+
+    def test_repeat_event_is_a_single_read(self) -> None:
+        u = self.users[0]
+        self._events(u, product_view=5)
+
+        with self.assertNumQueries(1):
+            self._events(u, product_view=9)
+
+    def test_dashboard_funnel_is_cached_until_snapshots_change(self) -> None:
+        cache.clear()
+        a, b = self.users[:2]
+        recent = timezone.now() - timedelta(hours=1)
+        record_funnel_event(user_id=a.id, step="product_view", at=recent)
+
+        self.assertEqual(cached_funnel_counts(7)[0]["users"], 1)
+
+        record_funnel_event(user_id=b.id, step="product_view", at=recent)
+        self.assertEqual(cached_funnel_counts(7)[0]["users"], 1)
+
+        AnalyticsSnapshotDaily.objects.create(day=timezone.localdate(), orders=1)
+        self.assertEqual(cached_funnel_counts(7)[0]["users"], 2)
+
+    def test_ordered_funnel_with_conversion_window(self) -> None:
+        a, b, c, d = self.users
+        self._events(a, product_view=0, cart_add=1, checkout=2, paid=3)
+        self._events(b, product_view=0, cart_add=1, checkout=200)  # outside 72h
+        self._events(c, product_view=0, checkout=1)  # skipped cart_add
+        self._events(d, cart_add=0, product_view=1)  # out of order
+
+        start, end = self.t0 - timedelta(hours=1), self.t0 + timedelta(days=1)
+        out = funnel_counts(
+            ("product_view", "cart_add", "checkout", "paid"),
+            start,
+            end,
+            window=timedelta(hours=72),
+        )
+
+        self.assertEqual([s["users"] for s in out], [4, 2, 1, 1])
+        self.assertEqual(out[-1]["conversion_pct"], 25.0)
+
+    def test_counts_by_day_and_backfill(self) -> None:
+        buyer = self.users[0]
+        order = Order.objects.create(user=buyer, email="f0@example.com", status="paid")
+        Order.objects.filter(id=order.id).update(created_at=self.t0)
+        self._events(buyer, wishlist=-1)
+
+        self.assertEqual(rebuild_funnel_states(), 1)
+
+        day = timezone.localtime(self.t0 - timedelta(hours=1)).date()
+        by_day = funnel_counts_by_day(
+            ("wishlist", "paid"), day, day, window=timedelta(days=30)
+        )
+        self.assertEqual(by_day[day], [1, 1])
+
+    def test_purchase_after_wish_counts_even_after_an_earlier_purchase(self) -> None:
+        buyer = self.users[0]
+        for hours in (-48, 5):  # bought before wishlisting, then again after
+            order = Order.objects.create(
+                user=buyer, email="f0@example.com", status="paid"
+            )
+            Order.objects.filter(id=order.id).update(
+                created_at=self.t0 + timedelta(hours=hours)
+            )
+        rebuild_funnel_states()
+        self._events(buyer, wishlist=0)
+
+        day = timezone.localtime(self.t0).date()
+        by_day = funnel_counts_by_day(
+            ("wishlist", "paid"), day, day, window=timedelta(days=30)
+        )
+        self.assertEqual(by_day[day], [1, 1])
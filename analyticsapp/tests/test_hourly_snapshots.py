@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsSnapshotDaily, AnalyticsSnapshotHourly
+from analyticsapp.services.hourly import (
+    compact_hourly,
+    hour_start,
+    intraday_series,
+    rebuild_hourly,
+)
+from analyticsapp.services.leases import SNAPSHOT_LEASE, acquire_lease
+from orders.models import Order
+from payments.services.webhook_handlers import handle_payment_intent_succeeded
+from payments.services.webhook_refund_handlers.charge_refunded import (
+    handle_charge_refunded,
+)
+
+
+class HourlySnapshotTests(TestCase):
+    def _pay(self, total: str) -> Order:
+        order = Order.objects.create(
+            email="hourly@example.com", status="pending", total=Decimal(total)
+        )
+        handle_payment_intent_succeeded(
+            intent={"id": f"pi_hr_{order.id}", "metadata": {"order_id": str(order.id)}}
+        )
+        return order
+
+    def test_hooks_bump_current_hour_and_rebuild_agrees(self) -> None:
+        order = self._pay("20.00")
+        self._pay("5.00")
+        handle_charge_refunded(
+            charge={
+                "id": f"ch_hr_{order.id}",
+                "metadata": {"order_id": str(order.id)},
+                "amount_refunded": 500,
+                "amount": 2000,
+            }
+        )
+
+        def current():
+            row = AnalyticsSnapshotHourly.objects.get(hour=hour_start(timezone.now()))
+            return (row.orders, row.revenue, row.refunded_orders, row.refunded_amount)
+
+        live = current()
+        self.assertEqual(live, (2, Decimal("25.00"), 1, Decimal("5.00")))
+
+        today = timezone.localdate()
+        rebuild_hourly(today, today)
+        self.assertEqual(current(), live)
+
+    def test_compaction_builds_missing_daily_rows_then_drops_hours(self) -> None:
+        old_day = timezone.localdate() - timedelta(days=10)
+        old = Order.objects.create(
+            email="old@example.com", status="paid", total=Decimal("12.00")
+        )
+        created = timezone.now() - timedelta(days=10)
+        Order.objects.filter(id=old.id).update(created_at=created)
+        AnalyticsSnapshotHourly.objects.create(
+            hour=hour_start(created), orders=1, revenue=Decimal("12.00")
+        )
+        recent = AnalyticsSnapshotHourly.objects.create(
+            hour=hour_start(timezone.now()), orders=1
+        )
+
+        deleted = compact_hourly(retention_days=7)
+
+        self.assertEqual(deleted, 1)
+        self.assertEqual(list(AnalyticsSnapshotHourly.objects.all()), [recent])
+        self.assertEqual(
+            AnalyticsSnapshotDaily.objects.get(day=old_day).revenue, Decimal("12.00")
+        )
+
+    def test_intraday_series_reads_only_the_hourly_tier(self) -> None:
+        AnalyticsSnapshotHourly.objects.create(
+            hour=hour_start(timezone.now()) - timedelta(hours=3),
+            orders=4,
+            revenue=Decimal("40.00"),
+        )
+
+        with self.assertNumQueries(1):
+            series = intraday_series(48)
+
+        self.assertEqual(len(series), 48)
+        self.assertEqual(series[-4]["orders"], 4)
+        self.assertEqual(sum(r["orders"] for r in series), 4)
+
+    def test_dashboard_shows_selected_intraday_window(self) -> None:
+        admin = get_user_model().objects.create_user(
+            username="hr_admin", password="x", is_staff=True, is_superuser=True
+        )
+        self.client.force_login(admin)
+
+        resp = self.client.get(reverse("analytics-dashboard"), {"hours": 48})
+
+        self.assertEqual(resp.status_code, 200)
+        fig = json.loads(resp.context["intraday_json"])
+        self.assertEqual(len(fig["data"][0]["x"]), 48)
+
+    def test_dashboard_downsamples_the_seven_day_hourly_view(self) -> None:
+        admin = get_user_model().objects.create_user(
+            username="hr_admin3", password="x", is_staff=True, is_superuser=True
+        )
+        self.client.force_login(admin)
+        spike = hour_start(timezone.now()) - timedelta(hours=100)
+        AnalyticsSnapshotHourly.objects.create(
+            hour=spike, revenue=Decimal("500.00"), orders=9
+        )
+
+        resp = self.client.get(reverse("analytics-dashboard"), {"hours": 168})
+
+        self.assertEqual(resp.status_code, 200)
+        x = json.loads(resp.context["intraday_json"])["data"][0]["x"]
+        self.assertLessEqual(len(x), 120)
+        self.assertIn(timezone.localtime(spike).strftime("%Y-%m-%d %H:00"), x)
+
+    def test_dashboard_falls_back_on_bad_window_params(self) -> None:
+        admin = get_user_model().objects.create_user(
+            username="hr_admin2", password="x", is_staff=True, is_superuser=True
+        )
+        self.client.force_login(admin)
+
+        resp = self.client.get(
+            reverse("analytics-dashboard"), {"hours": "abc", "days": "x"}
+        )
+
+        self.assertEqual(resp.status_code, 200)
+        fig = json.loads(resp.context["intraday_json"])
+        self.assertEqual(len(fig["data"][0]["x"]), 24)
+
+    def test_rebuild_waits_for_the_snapshot_lease(self) -> None:
+        self._pay("9.00")
+        AnalyticsSnapshotHourly.objects.all().delete()
+        today = timezone.localdate()
+        token = acquire_lease(SNAPSHOT_LEASE, ttl=timedelta(minutes=5))
+
+        self.assertEqual(rebuild_hourly(today, today), 0)
+        self.assertFalse(AnalyticsSnapshotHourly.objects.exists())
+
+        self.assertEqual(rebuild_hourly(today, today, lease_token=token), 1)
+        row = AnalyticsSnapshotHourly.objects.get(hour=hour_start(timezone.now()))
+        self.assertEqual((row.orders, row.revenue), (1, Decimal("9.00")))
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsSnapshotDaily
+from analyticsapp.services.snapshots import (
+    cached_kpi_windows,
+    snapshot_kpis,
+    snapshot_kpis_windows,
+)
+
+
+class KpiWindowsTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        today = timezone.localdate()
+        # 60 days: 1 order of £10 per day in the last 30, £5 per day before that.
+        for offset in range(60):
+            AnalyticsSnapshotDaily.objects.create(
+                day=today - timedelta(days=offset),
+                revenue=Decimal("10.00") if offset < 30 else Decimal("5.00"),
+                orders=1,
+                refunded_orders=1 if offset % 10 == 0 else 0,
+                refunded_amount=Decimal("2.50") if offset % 10 == 0 else 0,
+                unique_customers=1,
+                repeat_customers=offset % 2,
+            )
+
+    def test_all_windows_from_one_read_match_single_window_kpis(self) -> None:
+        with self.assertNumQueries(2):  # snapshot slice + live counter
+            windows = snapshot_kpis_windows()
+
+        self.assertEqual(sorted(windows), [7, 30, 90])
+        for days, payload in windows.items():
+            single = snapshot_kpis(days)
+            for key in ("rev", "cust", "funnel", "meta", "daily"):
+                self.assertEqual(payload[key], single[key], f"{days}d {key}")
+
+        self.assertEqual(windows[90]["meta"]["missing_days"], 30)
+
+    def test_previous_period_deltas(self) -> None:
+        w30 = snapshot_kpis_windows((30,))[30]
+
+        self.assertEqual(w30["previous"]["rev"]["revenue"], Decimal("150.00"))
+        self.assertEqual(w30["delta"]["revenue"], Decimal("100.00"))
+        self.assertEqual(w30["delta"]["orders"], Decimal("0.00"))
+
+        # No snapshots before the 60-day history: no baseline, no delta.
+        self.assertIsNone(snapshot_kpis_windows((90,))[90]["delta"]["revenue"])
+
+    def test_cached_payload_is_reused_until_snapshots_change(self) -> None:
+        first = cached_kpi_windows()
+
+        with self.assertNumQueries(2):  # watermark + live counter, no slice read
+            self.assertEqual(cached_kpi_windows()[30]["rev"], first[30]["rev"])
+
+        snap = AnalyticsSnapshotDaily.objects.get(day=timezone.localdate())
+        snap.revenue = Decimal("20.00")
+        snap.save()
+
+        self.assertEqual(
+            cached_kpi_windows()[7]["rev"]["revenue"],
+            first[7]["rev"]["revenue"] + Decimal("10.00"),
+        )
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsLiveCounter, AnalyticsSnapshotDaily
+from analyticsapp.services.snapshot_runner import (
+    build_snapshot_day,
+    compute_snapshot_days,
+)
+from analyticsapp.services.snapshots import snapshot_kpis
+from orders.models import Order
+from payments.services.webhook_handlers import handle_payment_intent_succeeded
+from payments.services.webhook_refund_handlers.charge_refunded import (
+    handle_charge_refunded,
+)
+
+
+class LiveCounterTests(TestCase):
+    def _pay(self, total: str) -> Order:
+        order = Order.objects.create(
+            email="live@example.com", status="pending", total=Decimal(total)
+        )
+        handle_payment_intent_succeeded(
+            intent={
+                "id": f"pi_live_{order.id}",
+                "metadata": {"order_id": str(order.id)},
+            }
+        )
+        return order
+
+    def _refund(self, order: Order, pennies: int) -> None:
+        handle_charge_refunded(
+            charge={
+                "id": f"ch_live_{order.id}",
+                "metadata": {"order_id": str(order.id)},
+                "amount_refunded": pennies,
+                "amount": int(order.total * 100),
+            }
+        )
+
+    def test_paid_and_refund_hooks_bump_today(self) -> None:
+        order = self._pay("20.00")
+        self._pay("5.00")
+        self._refund(order, 500)
+        self._refund(order, 800)  # same-day follow-up only adds the delta
+
+        live = AnalyticsLiveCounter.objects.get(day=timezone.localdate())
+        self.assertEqual((live.orders, live.revenue), (2, Decimal("25.00")))
+        self.assertEqual(
+            (live.refunded_orders, live.refunded_amount), (1, Decimal("8.00"))
+        )
+
+    def test_snapshot_kpis_merges_live_counter_over_stale_today(self) -> None:
+        today = timezone.localdate()
+        AnalyticsSnapshotDaily.objects.create(
+            day=today, revenue=Decimal("10.00"), orders=1
+        )
+        AnalyticsLiveCounter.objects.create(
+            day=today, revenue=Decimal("30.00"), orders=3
+        )
+
+        out = snapshot_kpis(1)
+
+        self.assertTrue(out["meta"]["live_today"])
+        self.assertEqual(out["rev"]["revenue"], Decimal("30.00"))
+        self.assertEqual(out["rev"]["orders"], 3)
+        self.assertEqual(out["daily"][-1]["revenue"], Decimal("30.00"))
+
+    def test_builder_reseeds_counter_matching_snapshot(self) -> None:
+        self._pay("12.00")
+        AnalyticsLiveCounter.objects.filter(day=timezone.localdate()).update(orders=99)
+
+        call_command("build_analytics_snapshots", days=1, stdout=StringIO())
+
+        live = AnalyticsLiveCounter.objects.get(day=timezone.localdate())
+        snap = AnalyticsSnapshotDaily.objects.get(day=timezone.localdate())
+        self.assertEqual((live.orders, live.revenue), (snap.orders, snap.revenue))
+
+    def test_reseed_keeps_bumps_that_land_during_the_build(self) -> None:
+        today = timezone.localdate()
+        self._pay("12.00")
+        values = compute_snapshot_days(today, today)[today]
+        self._pay("8.00")  # paid after the compute pass, before the write
+
+        build_snapshot_day(today, values)
+
+        live = AnalyticsLiveCounter.objects.get(day=today)
+        self.assertEqual((live.orders, live.revenue), (2, Decimal("20.00")))
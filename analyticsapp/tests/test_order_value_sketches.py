@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import random
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsSnapshotDaily
+from analyticsapp.services.sketches import (
+    build_digest,
+    digest_histogram,
+    digest_quantile,
+    merge_digests,
+)
+from analyticsapp.services.snapshots import order_value_distribution
+from orders.models import Order
+
+
+class DigestTests(SimpleTestCase):
+    def setUp(self) -> None:
+        rng = random.Random(7)
+        self.values = [round(rng.lognormvariate(3.3, 0.6), 2) for _ in range(20000)]
+        self.sorted = sorted(self.values)
+
+    def _exact(self, q: float) -> float:
+        return self.sorted[int(q * (len(self.sorted) - 1))]
+
+    def test_quantiles_are_close_and_sketch_is_compact(self) -> None:
+        digest = build_digest(self.values)
+
+        for q in (0.5, 0.9, 0.99):
+            self.assertAlmostEqual(
+                digest_quantile(digest, q), self._exact(q), delta=self._exact(q) * 0.01
+            )
+        self.assertLess(len(digest["c"]), 1000)
+        self.assertEqual(digest_quantile(digest, 1), self.sorted[-1])
+
+    def test_merging_daily_sketches_matches_one_sketch(self) -> None:
+        parts = [build_digest(self.values[i::30]) for i in range(30)]
+        merged = merge_digests(parts)
+
+        self.assertEqual(merged["n"], len(self.values))
+        for q in (0.5, 0.9, 0.99):
+            self.assertAlmostEqual(
+                digest_quantile(merged, q), self._exact(q), delta=self._exact(q) * 0.01
+            )
+        self.assertEqual(
+            sum(b["count"] for b in digest_histogram(merged, 8)), len(self.values)
+        )
+
+    def test_small_and_empty_digests_are_exact(self) -> None:
+        self.assertIsNone(digest_quantile(build_digest([]), 0.5))
+        self.assertEqual(digest_quantile(build_digest([10, 20, 30]), 0.5), 20.0)
+        self.assertEqual(digest_quantile(build_digest([5]), 0.9), 5.0)
+
+
+class SnapshotSketchTests(TestCase):
+    def test_builder_stores_daily_sketches_and_window_merges_them(self) -> None:
+        now = timezone.now()
+        for offset, totals in ((1, ("10.00", "20.00")), (2, ("30.00", "90.00"))):
+            for total in totals:
+                o = Order.objects.create(
+                    email=f"s{total}@example.com", status="paid", total=Decimal(total)
+                )
+                Order.objects.filter(id=o.id).update(
+                    created_at=now - timedelta(days=offset)
+                )
+
+        call_command("build_analytics_snapshots", days=7, stdout=StringIO())
+
+        yesterday = AnalyticsSnapshotDaily.objects.get(
+            day=timezone.localdate() - timedelta(days=1)
+        )
+        self.assertEqual(yesterday.total_sketch["n"], 2)
+
+        with self.assertNumQueries(1):
+            dist = order_value_distribution(7)
+
+        self.assertEqual(dist["n"], 4)
+        self.assertEqual(dist["p50"], Decimal("25.00"))
+        self.assertEqual(dist["p99"], Decimal("90.00"))
+        self.assertEqual(sum(b["count"] for b in dist["histogram"]), 4)
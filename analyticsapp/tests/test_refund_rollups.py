@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsProductRefundDaily, AnalyticsRefundLatencyDaily
+from analyticsapp.services.refund_rollups import (
+    LATENCY_BUCKETS,
+    refund_latency_histogram,
+    top_refunded_products,
+)
+from orders.models import Order, OrderItem
+from payments.services.webhook_refund_handlers.charge_refunded import (
+    handle_charge_refunded,
+)
+from products.models import Category, Product
+
+
+class RefundRollupTests(TestCase):
+    def setUp(self) -> None:
+        category = Category.objects.create(name="Cat", slug="cat")
+
+        def product(name):
+            return Product.objects.create(
+                name=name,
+                slug=name.lower(),
+                category=category,
+                price=Decimal("10.00"),
+                stock=10,
+                is_active=True,
+            )
+
+        self.tea = product("Tea")
+        self.mug = product("Mug")
+
+        self.order = Order.objects.create(
+            email="refund@example.com",
+            status="paid",
+            total=Decimal("40.00"),
+            stripe_charge_id="ch_rollup",
+        )
+        Order.objects.filter(id=self.order.id).update(
+            created_at=timezone.now() - timedelta(days=2)
+        )
+        for p, total in ((self.tea, "30.00"), (self.mug, "10.00")):
+            OrderItem.objects.create(
+                order=self.order,
+                product=p,
+                product_name=p.name,
+                unit_price=Decimal(total),
+                qty=1,
+                line_total=Decimal(total),
+            )
+
+    def _refund(self, pennies: int) -> None:
+        handle_charge_refunded(
+            charge={"id": "ch_rollup", "amount_refunded": pennies, "amount": 4000}
+        )
+
+    def _stored(self):
+        products = {
+            r.product_id: (r.refunded_orders, r.refunded_amount)
+            for r in AnalyticsProductRefundDaily.objects.filter(
+                day=timezone.localdate()
+            )
+        }
+        latency = {
+            r.bucket: (r.refunded_orders, r.refunded_amount)
+            for r in AnalyticsRefundLatencyDaily.objects.filter(
+                day=timezone.localdate()
+            )
+            if r.refunded_orders
+        }
+        return products, latency
+
+    def test_refund_hook_allocates_pro_rata_and_replaces_same_day_refunds(self) -> None:
+        self._refund(2000)
+        self._refund(4000)  # follow-up on the same day: still one order
+
+        products, latency = self._stored()
+        self.assertEqual(
+            products,
+            {
+                self.tea.id: (1, Decimal("30.00")),
+                self.mug.id: (1, Decimal("10.00")),
+            },
+        )
+        self.assertEqual(latency, {"1-3d": (1, Decimal("40.00"))})
+
+    def test_builder_rebuild_matches_incremental_rows(self) -> None:
+        self._refund(2000)
+        incremental = self._stored()
+
+        call_command("build_analytics_snapshots", days=7, stdout=StringIO())
+
+        self.assertEqual(self._stored(), incremental)
+
+    def test_refund_moving_to_a_new_day_leaves_the_old_day(self) -> None:
+        self._refund(2000)
+        # Pretend that partial refund happened yesterday.
+        yesterday = timezone.localdate() - timedelta(days=1)
+        Order.objects.filter(id=self.order.id).update(
+            refunded_at=timezone.now() - timedelta(days=1)
+        )
+        AnalyticsProductRefundDaily.objects.update(day=yesterday)
+        AnalyticsRefundLatencyDaily.objects.update(day=yesterday)
+
+        self._refund(4000)
+
+        self.assertFalse(
+            AnalyticsProductRefundDaily.objects.filter(
+                day=yesterday, refunded_orders__gt=0
+            ).exists()
+        )
+        self.assertFalse(
+            AnalyticsRefundLatencyDaily.objects.filter(
+                day=yesterday, refunded_orders__gt=0
+            ).exists()
+        )
+        products, _ = self._stored()
+        self.assertEqual(
+            products,
+            {
+                self.tea.id: (1, Decimal("30.00")),
+                self.mug.id: (1, Decimal("10.00")),
+            },
+        )
+
+    def test_readers_use_rollups_only(self) -> None:
+        self._refund(4000)
+
+        with self.assertNumQueries(2):
+            products = top_refunded_products(30)
+        with self.assertNumQueries(1):
+            histogram = refund_latency_histogram(30)
+
+        self.assertEqual(
+            [(p["product_name"], p["refunded_amount"]) for p in products],
+            [("Tea", Decimal("30.00")), ("Mug", Decimal("10.00"))],
+        )
+        self.assertEqual(
+            [b["bucket"] for b in histogram], [label for _, label in LATENCY_BUCKETS]
+        )
+        self.assertEqual(histogram[1]["refunded_orders"], 1)
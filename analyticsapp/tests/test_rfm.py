@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import UserRole
+from analyticsapp.models import CustomerFirstOrder, CustomerSegment
+from analyticsapp.services.rfm import build_rfm_segments, quintile_scores
+
+
+class QuintileScoreTests(SimpleTestCase):
+    def test_scores_spread_one_to_five(self) -> None:
+        scores = quintile_scores(np.arange(10))
+        self.assertEqual(scores.tolist(), [1, 1, 2, 2, 3, 3, 4, 4, 5, 5])
+
+    def test_lower_is_better_inverts_scores(self) -> None:
+        scores = quintile_scores(np.array([1, 100]), higher_is_better=False)
+        self.assertEqual(scores.tolist(), [3, 1])
+
+    def test_ties_share_a_score(self) -> None:
+        scores = quintile_scores(np.array([1, 1, 1, 1, 9]))
+        self.assertEqual(len(set(scores[:4].tolist())), 1)
+        self.assertEqual(int(scores[4]), 5)
+
+
+class RfmSegmentationTests(TestCase):
+    def _customer(self, email: str, *, days_ago: int, orders: int, spend: str):
+        ts = timezone.now() - timedelta(days=days_ago)
+        CustomerFirstOrder.objects.create(
+            email=email,
+            first_order_at=ts - timedelta(days=400),
+            last_order_at=ts,
+            order_count=orders,
+            lifetime_spend=Decimal(spend),
+        )
+
+    def test_build_segments_stores_one_row_per_customer(self) -> None:
+        self._customer("vip@example.com", days_ago=1, orders=12, spend="900.00")
+        self._customer("lapsed@example.com", days_ago=300, orders=1, spend="10.00")
+        for i in range(8):
+            self._customer(f"c{i}@example.com", days_ago=30 + i, orders=2, spend="50")
+
+        counts = build_rfm_segments()
+
+        self.assertEqual(sum(counts.values()), 10)
+        self.assertEqual(CustomerSegment.objects.count(), 10)
+
+        vip = CustomerSegment.objects.get(email="vip@example.com")
+        self.assertEqual((vip.r_score, vip.f_score, vip.m_score), (5, 5, 5))
+        self.assertEqual(vip.segment, "champions")
+
+        lapsed = CustomerSegment.objects.get(email="lapsed@example.com")
+        self.assertEqual(lapsed.r_score, 1)
+        self.assertEqual(lapsed.segment, "hibernating")
+
+    def test_rebuild_replaces_previous_assignments(self) -> None:
+        CustomerSegment.objects.create(email="gone@example.com", segment="loyal")
+        self._customer("a@example.com", days_ago=5, orders=1, spend="20.00")
+
+        build_rfm_segments()
+
+        self.assertEqual(
+            list(CustomerSegment.objects.values_list("email", flat=True)),
+            ["a@example.com"],
+        )
+
+    def test_export_ignores_unknown_segment_names(self) -> None:
+        CustomerSegment.objects.create(email="a@example.com", segment="loyal")
+        analyst = get_user_model().objects.create_user(username="rfm_a", password="x")
+        analyst.is_staff = True
+        analyst.save()
+        UserRole.objects.update_or_create(user=analyst, defaults={"role": "analyst"})
+        self.client.force_login(analyst)
+        url = reverse("analytics-export-segments")
+
+        resp = self.client.get(url, {"segment": 'x"; filename="evil.sh'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('filename="rfm_segments.csv"', resp["Content-Disposition"])
+
+        resp = self.client.get(url, {"segment": "loyal"})
+        self.assertIn("rfm_segments_loyal.csv", resp["Content-Disposition"])
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import csv
+import os
+import tempfile
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsSnapshotDaily
+from analyticsapp.services.customer_index import rebuild_customer_index
+from analyticsapp.services.customers import customer_kpis
+from analyticsapp.services.revenue import revenue_kpis
+from analyticsapp.services.snapshot_runner import compute_snapshot_days
+from orders.models import Order
+
+
+def _at(day, hour=12):
+    return timezone.make_aware(datetime.combine(day, time(hour)))
+
+
+class SnapshotDryRunTests(TestCase):
+    def setUp(self) -> None:
+        self.today = timezone.localdate()
+        self.d1 = self.today - timedelta(days=1)
+        self.d3 = self.today - timedelta(days=3)
+
+        def order(email, day, total, **extra):
+            o = Order.objects.create(
+                email=email, status="paid", total=Decimal(total), **extra
+            )
+            Order.objects.filter(id=o.id).update(created_at=_at(day))
+            return o
+
+        order("a@example.com", self.d3, "10.00")
+        order("a@example.com", self.d1, "20.00")  # returning customer on d1
+        order("b@example.com", self.d1, "5.55")
+        self.refunded = order(
+            "c@example.com",
+            self.d3,
+            "8.00",
+            refund_amount_pennies=300,
+            refunded_at=_at(self.d1, 9),
+        )
+        rebuild_customer_index()
+
+    def test_set_based_pass_matches_per_day_kpis(self) -> None:
+        computed = compute_snapshot_days(self.d3, self.today)
+
+        for day, values in computed.items():
+            start, end = (
+                _at(day, 0),
+                timezone.make_aware(datetime.combine(day, time.max)),
+            )
+            rev = revenue_kpis(start, end)
+            cust = customer_kpis(start, end)
+            self.assertEqual(values["revenue"], rev["revenue"])
+            self.assertEqual(values["orders"], rev["orders"])
+            self.assertEqual(
+                values["aov"], Decimal(rev["aov"]).quantize(Decimal("0.01"))
+            )
+            self.assertEqual(values["refunded_amount"], rev["refund_amount"])
+            self.assertEqual(values["refunded_orders"], rev["refunded_orders"])
+            self.assertEqual(values["unique_customers"], cust["unique"])
+            self.assertEqual(values["repeat_customers"], cust["repeat"])
+
+        self.assertEqual(computed[self.d1]["repeat_customers"], 1)
+
+    def test_dry_run_diff_reports_only_changed_metrics_without_writing(self) -> None:
+        call_command("build_analytics_snapshots", days=5, stdout=StringIO())
+        Order.objects.filter(email="b@example.com").update(total=Decimal("9.55"))
+        before = AnalyticsSnapshotDaily.objects.get(day=self.d1)
+
+        out = StringIO()
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        call_command(
+            "build_analytics_snapshots",
+            days=5,
+            dry_run=True,
+            diff=True,
+            diff_csv=path,
+            stdout=out,
+        )
+
+        lines = out.getvalue().splitlines()
+        self.assertIn(f"{self.d1.isoformat()} revenue: 25.55 -> 29.55", lines)
+        self.assertIn("1 day(s) would change, 2 metric value(s)", lines[-1])
+
+        with open(path, newline="") as fh:
+            rows = list(csv.reader(fh))
+        self.assertEqual([r[1] for r in rows[1:]], ["revenue", "aov"])
+
+        after = AnalyticsSnapshotDaily.objects.get(day=self.d1)
+        self.assertEqual(after.revenue, before.revenue)
+        self.assertEqual(after.computed_at, before.computed_at)
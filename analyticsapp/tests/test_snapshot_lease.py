@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsLease, AnalyticsSnapshotDaily
+from analyticsapp.services.leases import (
+    SNAPSHOT_LEASE,
+    acquire_lease,
+    release_lease,
+    renew_lease,
+)
+from audit.models import AuditLog
+
+
+TTL = timedelta(minutes=5)
+
+
+class LeaseServiceTests(TestCase):
+    def test_second_acquire_fails_while_lease_is_live(self) -> None:
+        token = acquire_lease("job", ttl=TTL)
+
+        self.assertIsNotNone(token)
+        self.assertIsNone(acquire_lease("job", ttl=TTL))
+
+        self.assertTrue(release_lease("job", token, result={"ok": 1}))
+        self.assertIsNotNone(acquire_lease("job", ttl=TTL))
+
+    def test_expired_lease_is_stolen_and_old_holder_cannot_renew(self) -> None:
+        old = acquire_lease("job", ttl=TTL)
+        AnalyticsLease.objects.filter(name="job").update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        new = acquire_lease("job", ttl=TTL)
+
+        self.assertIsNotNone(new)
+        self.assertFalse(renew_lease("job", old, ttl=TTL))
+        self.assertFalse(release_lease("job", old))
+        self.assertTrue(
+            AuditLog.objects.filter(event_type="analytics_lease_stolen").exists()
+        )
+
+
+class SnapshotSingleFlightTests(TestCase):
+    def test_build_records_result_and_releases_lease(self) -> None:
+        call_command("build_analytics_snapshots", days=3, stdout=StringIO())
+
+        lease = AnalyticsLease.objects.get(name=SNAPSHOT_LEASE)
+        self.assertEqual(lease.holder, "")
+        self.assertEqual(lease.last_result["days"], 3)
+        self.assertEqual(lease.last_result["end_day"], timezone.localdate().isoformat())
+
+    def test_overlapping_build_exits_without_work(self) -> None:
+        acquire_lease(SNAPSHOT_LEASE, ttl=TTL)
+        out = StringIO()
+
+        call_command("build_analytics_snapshots", days=3, stdout=out)
+
+        self.assertIn("skipped", out.getvalue())
+        self.assertFalse(AnalyticsSnapshotDaily.objects.exists())
+
+    def test_waiting_build_reuses_the_running_builds_result(self) -> None:
+        token = acquire_lease(SNAPSHOT_LEASE, ttl=TTL)
+        result = {"days": 7, "end_day": timezone.localdate().isoformat()}
+
+        def finish_other_build(_seconds):
+            release_lease(SNAPSHOT_LEASE, token, result=result)
+
+        out = StringIO()
+        with mock.patch(
+            "analyticsapp.services.leases.time.sleep", side_effect=finish_other_build
+        ):
+            call_command("build_analytics_snapshots", days=3, lock_wait=60, stdout=out)
+
+        self.assertIn("Reused concurrent snapshot build", out.getvalue())
+        self.assertFalse(AnalyticsSnapshotDaily.objects.exists())
+
+    def test_waiting_build_runs_when_finished_build_was_narrower(self) -> None:
+        token = acquire_lease(SNAPSHOT_LEASE, ttl=TTL)
+        result = {"days": 1, "end_day": timezone.localdate().isoformat()}
+
+        def finish_other_build(_seconds):
+            release_lease(SNAPSHOT_LEASE, token, result=result)
+
+        with mock.patch(
+            "analyticsapp.services.leases.time.sleep", side_effect=finish_other_build
+        ):
+            call_command(
+                "build_analytics_snapshots", days=3, lock_wait=60, stdout=StringIO()
+            )
+
+        self.assertEqual(AnalyticsSnapshotDaily.objects.count(), 3)
+
+    def test_build_stops_when_lease_is_lost_between_phases(self) -> None:
+        def slow_cohorts():
+            # Another build steals the lease while the rollups run.
+            AnalyticsLease.objects.filter(name=SNAPSHOT_LEASE).update(
+                holder="other", expires_at=timezone.now() + TTL
+            )
+            return {}
+
+        with mock.patch(
+            "analyticsapp.management.commands.build_analytics_snapshots"
+            ".rebuild_cohorts",
+            side_effect=slow_cohorts,
+        ):
+            with self.assertRaises(CommandError):
+                call_command("build_analytics_snapshots", days=3, stdout=StringIO())
+
+        self.assertFalse(AnalyticsSnapshotDaily.objects.exists())
+        self.assertEqual(
+            AnalyticsLease.objects.get(name=SNAPSHOT_LEASE).holder, "other"
+        )
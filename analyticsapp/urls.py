@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path("dashboard/", views.dashboard, name="analytics-dashboard"),
@@ -12,9 +12,32 @@ urlpatterns = [
     path(
         "export/products/", views.export_products_csv, name="analytics-export-products"
     ),
+    path(
+        "export/countries/",
+        views.export_countries_csv,
+        name="analytics-export-countries",
+    ),
     path(
         "export/customers/",
         views.export_customers_csv,
         name="analytics-export-customers",
     ),
+    path("export/cohorts/", views.export_cohorts, name="analytics-export-cohorts"),
+    path(
+        "export/segments/",
+        views.export_segments_csv,
+        name="analytics-export-segments",
+    ),
+    path(
+        "export/jobs/<int:job_id>/",
+        views.export_job_status,
+        name="analytics-export-job",
+    ),
+    path(
+        "export/jobs/<int:job_id>/download/",
+        views.export_job_download,
+        name="analytics-export-job-download",
+    ),
+    path("api/v1/kpis/", api.kpis, name="analytics-api-kpis"),
+    path("api/v1/series/", api.series, name="analytics-api-series"),
 ]
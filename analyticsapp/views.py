@@ -1,20 +1,40 @@
-import csv
 import json
 from decimal import Decimal
 
 from audit.services.logger import log_event
 from django.db.models import Count, Sum
-from django.http import HttpResponse
-from django.shortcuts import render
+from django.http import FileResponse, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
 from django.utils import timezone
 
 from accounts.decorators import role_required
-from analyticsapp.models import AnalyticsSnapshotDaily
+from analyticsapp.models import AnalyticsSnapshotDaily, CustomerSegment, ExportJob
 from orders.models import Order
 
+from .services.cohorts import cohort_matrix, cohort_rows
+from .services.country_rollup import country_rollup
+from .services.downsample import downsample_rows
+from .services.export_jobs import (
+    CUSTOMERS_EXPORT_HEADERS,
+    ORDERS_EXPORT_HEADERS,
+    SEGMENTS_EXPORT_HEADERS,
+    customer_export_row,
+    enqueue_export,
+    job_payload,
+    order_export_row,
+    segment_export_row,
+    window_params,
+)
+from .services.forecasting import cached_forecasts
+from .services.funnel_events import cached_funnel_counts
+from .services.hourly import intraday_series
 from .services.products_rollup import top_products_rollup
-from .services.snapshots import snapshot_kpis
+from .services.refund_rollups import refund_latency_histogram, top_refunded_products
+from .services.rfm import SEGMENT_NAMES
+from .services.snapshots import cached_kpi_windows, order_value_distribution
 from .services.subscriptions import churn_timeseries, subscription_kpis
+from .streaming import compressed_response, csv_response
 
 
 def _compute_refund_rate_value_pct(
@@ -29,11 +49,15 @@ def _compute_refund_rate_value_pct(
 
 @role_required("analyst", "ops", staff_only=True)
 def dashboard(request):
-    days = int(request.GET.get("days", 30))
-    days = days if days in (7, 30, 90) else 30
+    days = request.GET.get("days", "30")
+    days = int(days) if days in ("7", "30", "90") else 30
+    hours = request.GET.get("hours", "24")
+    hours = int(hours) if hours in ("24", "48", "168") else 24
 
     # --- Snapshot KPIs (calendar-window based + completeness meta) ---
-    snap = snapshot_kpis(days)
+    # All standard windows come from one cached snapshot read, so switching
+    # between 7/30/90 (or exporting) does not hit the snapshot table again.
+    snap = cached_kpi_windows()[days]
     meta = snap.get("meta", {})
     rev = snap["rev"]
     cust = snap["cust"]
@@ -42,6 +66,7 @@ def dashboard(request):
 
     snapshots_incomplete = not meta.get("is_complete", False)
     snapshots_missing_days = int(meta.get("missing_days", 0))
+    live_today = bool(meta.get("live_today", False))
 
     # Optional: compute extra KPI that your updated HTML can show
     rev["refund_rate_value"] = _compute_refund_rate_value_pct(
@@ -106,6 +131,105 @@ def dashboard(request):
         },
     }
 
+    # --- Basket-size distribution (merged per-day order-value sketches) ---
+    basket = order_value_distribution(days)
+    basket_hist = {
+        "data": [
+            {
+                "type": "bar",
+                "x": [f"£{b['lo']:.0f}–{b['hi']:.0f}" for b in basket["histogram"]],
+                "y": [b["count"] for b in basket["histogram"]],
+            }
+        ],
+        "layout": {
+            "title": f"Order Value Distribution — {days}d",
+            "margin": {"t": 40, "l": 50, "r": 20, "b": 80},
+        },
+    }
+
+    # --- Revenue / MRR projections (refit only when the watermark moves) ---
+    forecasts = cached_forecasts()
+    forecast_fig = {
+        "data": [],
+        "layout": {
+            "title": "Revenue & MRR Forecast (next 90d, 95% band)",
+            "margin": {"t": 40, "l": 50, "r": 50, "b": 60},
+            "yaxis2": {"overlaying": "y", "side": "right", "title": "MRR"},
+        },
+    }
+    for name, label, axis in (("revenue", "Revenue", "y"), ("mrr", "MRR", "y2")):
+        fc = forecasts.get(name)
+        if not fc:
+            continue
+        hist = fc["history"][-90:]
+        ahead = fc["forecast"]
+        ahead_x = [str(r["day"]) for r in ahead]
+        forecast_fig["data"] += [
+            {
+                "type": "scatter",
+                "mode": "lines",
+                "name": label,
+                "x": [str(r["day"]) for r in hist],
+                "y": [round(r["value"], 2) for r in hist],
+                "yaxis": axis,
+            },
+            {
+                "type": "scatter",
+                "mode": "lines",
+                "name": f"{label} band",
+                "x": ahead_x + ahead_x[::-1],
+                "y": [round(r["hi"], 2) for r in ahead]
+                + [round(r["lo"], 2) for r in ahead][::-1],
+                "fill": "toself",
+                "line": {"width": 0},
+                "opacity": 0.2,
+                "hoverinfo": "skip",
+                "showlegend": False,
+                "yaxis": axis,
+            },
+            {
+                "type": "scatter",
+                "mode": "lines",
+                "name": f"{label} forecast",
+                "x": ahead_x,
+                "y": [round(r["value"], 2) for r in ahead],
+                "line": {"dash": "dash"},
+                "yaxis": axis,
+            },
+        ]
+
+    # --- Intraday (hourly tier, no order scan) ---
+    # The 7-day view is 168 bars; it is downsampled server-side (peaks kept)
+    # to ANALYTICS_CHART_MAX_POINTS.
+    intraday = downsample_rows(
+        intraday_series(hours), {"revenue": "lttb", "orders": "lttb"}
+    )
+    intraday_x = [r["hour"].strftime("%Y-%m-%d %H:00") for r in intraday]
+    intraday_fig = {
+        "data": [
+            {
+                "type": "bar",
+                "name": "Revenue",
+                "x": intraday_x,
+                "y": [float(r["revenue"]) for r in intraday],
+            },
+            {
+                "type": "scatter",
+                "mode": "lines+markers",
+                "name": "Orders",
+                "x": intraday_x,
+                "y": [r["orders"] for r in intraday],
+                "yaxis": "y2",
+            },
+        ],
+        "layout": {
+            "title": f"Intraday Revenue & Orders (Hourly) — last {hours}h",
+            "margin": {"t": 40, "l": 50, "r": 50, "b": 60},
+            "yaxis2": {"overlaying": "y", "side": "right"},
+            "showlegend": False,
+        },
+    }
+
     # --- Product charts (snapshot-driven) ---
     product_units_bar = {
         "data": [
@@ -135,6 +259,56 @@ def dashboard(request):
         },
     }
 
+    # --- Refund rollups (per product + latency histogram) ---
+    refunded_products = top_refunded_products(days, limit=10)
+    refunded_products_bar = {
+        "data": [
+            {
+                "type": "bar",
+                "x": [p["product_name"] for p in refunded_products],
+                "y": [float(p["refunded_amount"]) for p in refunded_products],
+                "text": [p["refunded_orders"] for p in refunded_products],
+            }
+        ],
+        "layout": {
+            "title": f"Most Refunded Products (£) — {days}d",
+            "margin": {"t": 40, "l": 40, "r": 20, "b": 80},
+        },
+    }
+
+    latency = refund_latency_histogram(days)
+    refund_latency_bar = {
+        "data": [
+            {
+                "type": "bar",
+                "x": [b["bucket"] for b in latency],
+                "y": [b["refunded_orders"] for b in latency],
+            }
+        ],
+        "layout": {
+            "title": f"Time to Refund (orders) — {days}d",
+            "margin": {"t": 40, "l": 40, "r": 20, "b": 60},
+        },
+    }
+
+    # --- Countries (snapshot-driven rollups) ---
+    countries = country_rollup(days, limit=15)
+    country_rev_bar = {
+        "data": [
+            {
+                "type": "bar",
+                "orientation": "h",
+                "x": [float(c["revenue"]) for c in countries],
+                "y": [c["country"] for c in countries],
+            }
+        ],
+        "layout": {
+            "title": f"Revenue by Shipping Country — {days}d",
+            "margin": {"t": 40, "l": 80, "r": 20, "b": 40},
+            "yaxis": {"autorange": "reversed"},
+        },
+    }
+
     # --- Churn line (monthly, live) ---
     churn_x = [str(r["month"].date()) for r in churn if r.get("month")]
     churn_y = [r["count"] for r in churn if r.get("month")]
@@ -148,6 +322,29 @@ def dashboard(request):
         },
     }
 
+    # --- Cohort retention (orders, last 12 acquisition months) ---
+    cohorts = cohort_matrix(source="orders", months=12)
+    cohort_heatmap = {
+        "data": [
+            {
+                "type": "heatmap",
+                "x": [f"M+{m}" for m in cohorts["months_since"]],
+                "y": [
+                    f"{c:%Y-%m} (n={n})"
+                    for c, n in zip(cohorts["cohorts"], cohorts["sizes"])
+                ],
+                "z": cohorts["retention_pct"],
+                "colorscale": "Blues",
+                "hoverongaps": False,
+            }
+        ],
+        "layout": {
+            "title": "Cohort Retention (% of cohort ordering)",
+            "margin": {"t": 40, "l": 120, "r": 20, "b": 40},
+            "yaxis": {"autorange": "reversed"},
+        },
+    }
+
     # --- Funnel ---
     funnel_fig = {
         "data": [
@@ -163,26 +360,68 @@ def dashboard(request):
         },
     }
 
+    # --- Multi-step purchase funnel (first-touch, per-user funnel table; cached) ---
+    steps = cached_funnel_counts(days)
+    purchase_funnel_fig = {
+        "data": [
+            {
+                "type": "funnel",
+                "y": [s["step"].replace("_", " ").title() for s in steps],
+                "x": [s["users"] for s in steps],
+            }
+        ],
+        "layout": {
+            "title": f"Purchase Funnel (first touch, {days}d window)",
+            "margin": {"t": 40, "l": 100, "r": 20, "b": 40},
+        },
+    }
+
     context = {
         "days": days,
+        "hours": hours,
         "rev": rev,
         "cust": cust,
+        "delta": snap.get("delta", {}),
         "subs": subs,
         "latest_snapshot_day": latest_snapshot_day,
         "snapshots_stale": snapshots_stale,
         "snapshots_incomplete": snapshots_incomplete,
         "snapshots_missing_days": snapshots_missing_days,
+        "live_today": live_today,
         "revenue_daily_line_json": json.dumps(revenue_daily_line),
         "orders_daily_line_json": json.dumps(orders_daily_line),
         "refunds_daily_line_json": json.dumps(refunds_daily_line),
+        "intraday_json": json.dumps(intraday_fig),
+        "forecasts": forecasts,
+        "forecast_json": json.dumps(forecast_fig),
+        "basket": basket,
+        "basket_hist_json": json.dumps(basket_hist),
         "product_units_bar_json": json.dumps(product_units_bar),
         "product_rev_bar_json": json.dumps(product_rev_bar),
+        "refunded_products_bar_json": json.dumps(refunded_products_bar),
+        "refund_latency_bar_json": json.dumps(refund_latency_bar),
+        "countries": countries,
+        "country_rev_bar_json": json.dumps(country_rev_bar),
         "churn_line_json": json.dumps(churn_line),
         "funnel_json": json.dumps(funnel_fig),
+        "cohort_heatmap_json": json.dumps(cohort_heatmap),
+        "purchase_funnel_json": json.dumps(purchase_funnel_fig),
     }
     return render(request, "analytics/dashboard.html", context)
 
 
+def _wants_background(request) -> bool:
+    return request.GET.get("background") in ("1", "true", "yes")
+
+
+def _queue_export(request, kind: str, params: dict) -> JsonResponse:
+    """Queue a background ExportJob instead of streaming inside the request."""
+    job = enqueue_export(kind, params, user=request.user)
+    payload = job_payload(job)
+    payload["status_url"] = reverse("analytics-export-job", args=[job.id])
+    return JsonResponse(payload, status=202)
+
+
 @role_required("analyst", "ops", staff_only=True)
 def export_kpi_summary_csv(request):
     """
@@ -200,7 +439,7 @@ def export_kpi_summary_csv(request):
         metadata={"days": days},
     )
 
-    snap = snapshot_kpis(days)
+    snap = cached_kpi_windows()[days]
     rev = snap["rev"]
     cust = snap["cust"]
     funnel = snap["funnel"]
@@ -208,48 +447,41 @@ def export_kpi_summary_csv(request):
     latest = AnalyticsSnapshotDaily.objects.order_by("-day").first()
     latest_snapshot_day = latest.day.isoformat() if latest else ""
 
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = f'attachment; filename="kpi_summary_{days}d.csv"'
-    w = csv.writer(response)
-
-    w.writerow(
-        [
-            "window_days",
-            "latest_snapshot_day",
-            "revenue",
-            "orders",
-            "aov",
-            "refunded_amount",
-            "refunded_orders",
-            "refund_rate_orders_pct",
-            "unique_customers",
-            "repeat_customers",
-            "repeat_rate_pct",
-            "wishlisted_users",
-            "purchased_users",
-        ]
+    headers = [
+        "window_days",
+        "latest_snapshot_day",
+        "revenue",
+        "orders",
+        "aov",
+        "refunded_amount",
+        "refunded_orders",
+        "refund_rate_orders_pct",
+        "unique_customers",
+        "repeat_customers",
+        "repeat_rate_pct",
+        "wishlisted_users",
+        "purchased_users",
+    ]
+    row = [
+        days,
+        latest_snapshot_day,
+        rev.get("revenue", Decimal("0.00")),
+        rev.get("orders", 0),
+        rev.get("aov", Decimal("0.00")),
+        rev.get("refund_amount", Decimal("0.00")),
+        rev.get("refunded_orders", 0),
+        rev.get("refund_rate_orders", 0),
+        cust.get("unique", 0),
+        cust.get("repeat", 0),
+        cust.get("repeat_rate", 0),
+        funnel.get("wish_users", 0),
+        funnel.get("purchased_users", 0),
+    ]
+
+    return csv_response(
+        request, filename=f"kpi_summary_{days}d.csv", headers=headers, rows=[row]
     )
 
-    w.writerow(
-        [
-            days,
-            latest_snapshot_day,
-            rev.get("revenue", Decimal("0.00")),
-            rev.get("orders", 0),
-            rev.get("aov", Decimal("0.00")),
-            rev.get("refund_amount", Decimal("0.00")),
-            rev.get("refunded_orders", 0),
-            rev.get("refund_rate_orders", 0),
-            cust.get("unique", 0),
-            cust.get("repeat", 0),
-            cust.get("repeat_rate", 0),
-            funnel.get("wish_users", 0),
-            funnel.get("purchased_users", 0),
-        ]
-    )
-
-    return response
-
 
 @role_required("analyst", "ops", staff_only=True)
 def export_orders_csv(request):
@@ -264,43 +496,22 @@ def export_orders_csv(request):
         metadata={"days": days},
     )
 
+    if _wants_background(request):
+        return _queue_export(request, "orders", window_params(days))
+
     # Export is still raw orders for the window; snapshot mismatch check will guard this.
     start = timezone.now() - timezone.timedelta(days=days)
     end = timezone.now()
 
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = f'attachment; filename="orders_paid_{days}d.csv"'
-    w = csv.writer(response)
-    w.writerow(
-        [
-            "OrderID",
-            "Email",
-            "Total",
-            "Status",
-            "CreatedAt",
-            "RefundStatus",
-            "RefundPennies",
-            "RefundedAt",
-        ]
-    )
-
     qs = Order.objects.filter(
         status__in=("paid", "fulfilled"), created_at__range=(start, end)
     ).order_by("-created_at")[:5000]
-    for o in qs:
-        w.writerow(
-            [
-                o.id,
-                o.email,
-                o.total,
-                o.status,
-                o.created_at.isoformat(),
-                o.refund_status,
-                o.refund_amount_pennies,
-                o.refunded_at.isoformat() if o.refunded_at else "",
-            ]
-        )
-    return response
+    return csv_response(
+        request,
+        filename=f"orders_paid_{days}d.csv",
+        headers=ORDERS_EXPORT_HEADERS,
+        rows=(order_export_row(o) for o in qs.iterator(chunk_size=2000)),
+    )
 
 
 @role_required("analyst", "ops", staff_only=True)
@@ -316,16 +527,44 @@ def export_products_csv(request):
         metadata={"days": days},
     )
 
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = f'attachment; filename="best_sellers_{days}d.csv"'
-    w = csv.writer(response)
-    w.writerow(["Product", "Units", "Revenue"])
-
     rows = top_products_rollup(days, limit=5000)
-    for r in rows:
-        w.writerow([r["product_name"], r["units"], r["revenue"]])
+    return csv_response(
+        request,
+        filename=f"best_sellers_{days}d.csv",
+        headers=["Product", "Units", "Revenue"],
+        rows=([r["product_name"], r["units"], r["revenue"]] for r in rows),
+    )
 
-    return response
+
+@role_required("analyst", "ops", staff_only=True)
+def export_countries_csv(request):
+    days = int(request.GET.get("days", 30))
+    days = days if days in (7, 30, 90) else 30
+
+    log_event(
+        event_type="analytics_export",
+        entity_type="countries_csv",
+        entity_id=f"{days}d",
+        user=request.user,
+        metadata={"days": days},
+    )
+
+    rows = country_rollup(days)
+    return csv_response(
+        request,
+        filename=f"countries_{days}d.csv",
+        headers=["Country", "Orders", "Revenue", "RefundedOrders", "RefundedAmount"],
+        rows=(
+            [
+                r["country"],
+                r["orders"],
+                r["revenue"],
+                r["refunded_orders"],
+                r["refunded_amount"],
+            ]
+            for r in rows
+        ),
+    )
 
 
 @role_required("analyst", "ops", staff_only=True)
@@ -341,14 +580,12 @@ def export_customers_csv(request):
         metadata={"days": days},
     )
 
+    if _wants_background(request):
+        return _queue_export(request, "customers", window_params(days))
+
     start = timezone.now() - timezone.timedelta(days=days)
     end = timezone.now()
 
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = f'attachment; filename="customers_{days}d.csv"'
-    w = csv.writer(response)
-    w.writerow(["Email", "Orders", "TotalSpent"])
-
     qs = (
         Order.objects.filter(
             status__in=("paid", "fulfilled"), created_at__range=(start, end)
@@ -357,7 +594,178 @@ def export_customers_csv(request):
         .annotate(orders=Count("id"), total_spent=Sum("total"))
         .order_by("-total_spent")[:5000]
     )
-    for r in qs:
-        w.writerow([r["email"], r["orders"], r["total_spent"]])
+    return csv_response(
+        request,
+        filename=f"customers_{days}d.csv",
+        headers=CUSTOMERS_EXPORT_HEADERS,
+        rows=(customer_export_row(r) for r in qs.iterator(chunk_size=2000)),
+    )
+
+
+COHORT_EXPORT_HEADERS = [
+    "CohortMonth",
+    "MonthsSince",
+    "ActivityMonth",
+    "CohortSize",
+    "Customers",
+    "RetentionPct",
+    "Orders",
+    "Revenue",
+]
+
+
+def _parquet_bytes(headers: list[str], rows: list[list]) -> bytes | None:
+    """
+    Serialise rows to Parquet. pyarrow is imported lazily (it is heavy) and
+    returns None on installs that leave it out.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+
+    columns = {h: [r[i] for r in rows] for i, h in enumerate(headers)}
+    table = pa.table(columns)
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink)
+    return sink.getvalue().to_pybytes()
+
+
+@role_required("analyst", "ops", staff_only=True)
+def export_cohorts(request):
+    """
+    Cohort retention matrix export (snapshot table, no raw scans).
+    ?source=orders|subscriptions, ?months=1..36, ?format=csv|parquet
+    """
+    source = request.GET.get("source", "orders")
+    source = source if source in ("orders", "subscriptions") else "orders"
+    try:
+        months = int(request.GET.get("months", 12))
+    except (TypeError, ValueError):
+        months = 12
+    months = min(max(months, 1), 36)
+    fmt = request.GET.get("format", "csv")
+    fmt = fmt if fmt in ("csv", "parquet") else "csv"
+
+    log_event(
+        event_type="analytics_export",
+        entity_type="cohorts_" + fmt,
+        entity_id=f"{source}:{months}m",
+        user=request.user,
+        metadata={"source": source, "months": months, "format": fmt},
+    )
 
-    return response
+    rows = [
+        [
+            c["cohort_month"].isoformat(),
+            c["months_since"],
+            c["activity_month"].isoformat(),
+            c["cohort_size"],
+            c["customers"],
+            c["retention_pct"],
+            c["orders"],
+            str(c["revenue"]),
+        ]
+        for c in cohort_rows(source=source, months=months)
+    ]
+    filename = f"cohorts_{source}_{months}m"
+
+    if fmt == "parquet":
+        payload = _parquet_bytes(COHORT_EXPORT_HEADERS, rows)
+        if payload is None:
+            return HttpResponse(
+                "Parquet export requires pyarrow to be installed.",
+                status=501,
+                content_type="text/plain",
+            )
+        response = HttpResponse(payload, content_type="application/vnd.apache.parquet")
+        response["Content-Disposition"] = f'attachment; filename="{filename}.parquet"'
+        return response
+
+    return csv_response(
+        request, filename=f"{filename}.csv", headers=COHORT_EXPORT_HEADERS, rows=rows
+    )
+
+
+@role_required("analyst", "ops", staff_only=True)
+def export_segments_csv(request):
+    """
+    RFM segment assignments (nightly table) for marketing.
+    Optional ?segment=<name> filter.
+    """
+    segment = (request.GET.get("segment", "") or "").strip()
+    # Only known names reach the filter and the Content-Disposition filename.
+    segment = segment if segment in SEGMENT_NAMES else ""
+
+    log_event(
+        event_type="analytics_export",
+        entity_type="segments_csv",
+        entity_id=segment or "all",
+        user=request.user,
+        metadata={"segment": segment},
+    )
+
+    if _wants_background(request):
+        return _queue_export(request, "segments", {"segment": segment})
+
+    filename = f"rfm_segments_{segment}.csv" if segment else "rfm_segments.csv"
+    qs = CustomerSegment.objects.order_by("segment", "-monetary")
+    if segment:
+        qs = qs.filter(segment=segment)
+    return csv_response(
+        request,
+        filename=filename,
+        headers=SEGMENTS_EXPORT_HEADERS,
+        rows=(segment_export_row(s) for s in qs.iterator(chunk_size=2000)),
+    )
+
+
+@role_required("analyst", "ops", staff_only=True)
+def export_job_status(request, job_id: int):
+    """JSON progress for a background export (poll until status=done)."""
+    job = get_object_or_404(ExportJob, id=job_id)
+    payload = job_payload(job)
+    if job.status == "done":
+        payload["download_url"] = reverse(
+            "analytics-export-job-download", args=[job.id]
+        )
+    return JsonResponse(payload)
+
+
+def _file_chunks(path: str, size: int = 64 * 1024):
+    with open(path, "rb") as fh:
+        while chunk := fh.read(size):
+            yield chunk
+
+
+@role_required("analyst", "ops", staff_only=True)
+def export_job_download(request, job_id: int):
+    job = get_object_or_404(ExportJob, id=job_id)
+    if job.status != "done" or not job.file_path:
+        return JsonResponse(job_payload(job), status=409)
+
+    log_event(
+        event_type="analytics_export",
+        entity_type=f"{job.kind}_csv_job",
+        entity_id=job.id,
+        user=request.user,
+        metadata={"params": job.params, "rows": job.rows_written},
+    )
+
+    filename = f"{job.kind}_export_{job.id}.csv"
+    response = compressed_response(
+        request,
+        _file_chunks(job.file_path),
+        filename=filename,
+        content_type="text/csv",
+    )
+    if response is not None:
+        return response
+
+    return FileResponse(
+        open(job.file_path, "rb"),
+        as_attachment=True,
+        filename=filename,
+        content_type="text/csv",
+    )
@@ -3,6 +3,8 @@ from django.core.exceptions import ValidationError
 from django.shortcuts import redirect, render
 from django.views.decorators.http import require_POST
 
+from analyticsapp.services.funnel_events import record_funnel_event
+
 from .services.cart import cart_summary, add_to_cart, set_qty, remove, clear
 
 
@@ -24,6 +26,7 @@ def cart_add(request):
             qty=qty,
             variant_id=variant_id,
         )
+        record_funnel_event(user_id=request.user.id, step="cart_add")
         messages.success(request, "Added to cart.")
     except (TypeError, ValueError):
         messages.error(request, "Invalid quantity or product selection.")
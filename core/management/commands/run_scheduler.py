@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.scheduler import Scheduler, enabled_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Run monitoring checks, snapshot refreshes, export cleanup and retention "
+        "on their schedules from one long-lived process (replaces per-job cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--job",
+            action="append",
+            dest="jobs",
+            metavar="NAME",
+            help="Only schedule this job (repeatable). Default: all enabled jobs.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run the selected jobs once, now, and exit (cron / CI / debugging).",
+        )
+        parser.add_argument(
+            "--list",
+            action="store_true",
+            help="Print the schedule and exit.",
+        )
+        parser.add_argument(
+            "--max-sleep",
+            type=float,
+            default=5.0,
+            help="Upper bound on one idle sleep, in seconds (default 5).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            jobs = enabled_jobs(options["jobs"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if not jobs:
+            raise CommandError("No jobs enabled (see SCHEDULER_DISABLED_JOBS).")
+
+        if options["once"]:
+            failed = 0
+            for job in jobs:
+                outcome = run_job(job)
+                failed += outcome["status"] == "failed"
+                self._report(outcome)
+            if failed:
+                raise CommandError(f"{failed} job(s) failed.")
+            return
+
+        scheduler = Scheduler(jobs)
+        if options["list"]:
+            for job in jobs:
+                when = f"every {job.every}s" if job.every else f"cron '{job.cron}'"
+                first = timezone.localtime(scheduler.due[job.name])
+                self.stdout.write(
+                    f"{job.name}: {when}, next at {first:%Y-%m-%d %H:%M:%S}"
+                )
+            return
+
+        stop = threading.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: stop.set())
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Scheduler started: {', '.join(j.name for j in jobs)}")
+        )
+        max_sleep = max(float(options["max_sleep"]), 0.1)
+        while not stop.is_set():
+            for outcome in scheduler.run_pending():
+                self._report(outcome, scheduler.stats[outcome["job"]])
+            idle = (scheduler.next_due() - timezone.now()).total_seconds()
+            stop.wait(min(max(idle, 0), max_sleep))
+
+        self.stdout.write("Scheduler stopped. Per-job metrics:")
+        for name, stats in scheduler.stats.items():
+            self.stdout.write(f" - {name}: {stats.as_dict()}")
+
+    def _report(self, outcome, stats=None):
+        status = outcome["status"]
+        line = f"{outcome['job']}: {status}"
+        if "duration_ms" in outcome:
+            line += f" in {outcome['duration_ms']} ms"
+        if stats is not None and stats.avg_ms is not None:
+            line += f" (avg {stats.avg_ms} ms over {stats.runs} runs)"
+        if outcome.get("error"):
+            line += f" error={outcome['error']}"
+        style = {
+            "ok": self.style.SUCCESS,
+            "failed": self.style.ERROR,
+        }.get(status, self.style.WARNING)
+        self.stdout.write(style(line))
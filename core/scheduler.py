@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import io
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import close_old_connections
+from django.utils import timezone
+
+from analyticsapp.services.export_jobs import purge_expired_exports
+from analyticsapp.services.hourly import compact_hourly
+from analyticsapp.services.leases import acquire_lease, release_lease
+from audit.services.logger import log_event
+from monitoring.services.run_all import run_all_checks
+from monitoring.services.run_history import prune_run_history
+
+
+class Cron:
+    """
+    Minimal 5-field cron expression ("minute hour day-of-month month
+    day-of-week"), evaluated in local time. Fields accept `*`, numbers,
+    ranges `a-b`, steps `*/n` / `a-b/n` and comma lists; day-of-week is 0-6
+    from Sunday (7 is also Sunday). As in cron, when both day fields are
+    restricted a day matching either one matches.
+    """
+
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expr: str):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expr!r}")
+        self.expr = expr
+        parsed = [self._field(f, lo, hi) for f, (lo, hi) in zip(fields, self.RANGES)]
+        self.minutes, self.hours, self.days, self.months, dows = parsed
+        self.dows = {d % 7 for d in dows}
+        self.any_day = fields[2] == "*"
+        self.any_dow = fields[4] == "*"
+
+    @staticmethod
+    def _field(text: str, lo: int, hi: int) -> set[int]:
+        values: set[int] = set()
+        for part in text.split(","):
+            rng, _, step = part.partition("/")
+            if rng == "*":
+                start, end = lo, hi
+            elif "-" in rng:
+                start, end = (int(v) for v in rng.split("-", 1))
+            else:
+                start = end = int(rng)
+            if not (lo <= start <= end <= hi):
+                raise ValueError(f"Cron field out of range {lo}-{hi}: {text!r}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return values
+
+    def _day_matches(self, t: datetime) -> bool:
+        dom = t.day in self.days
+        dow = (t.weekday() + 1) % 7 in self.dows
+        if self.any_day:
+            return dow
+        if self.any_dow:
+            return dom
+        return dom or dow
+
+    def next_after(self, after: datetime) -> datetime:
+        """First matching minute strictly after `after`."""
+        t = timezone.localtime(after).replace(second=0, microsecond=0)
+        t += timedelta(minutes=1)
+        limit = t + timedelta(days=366 * 5)
+        while t < limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1) + timedelta(days=32)).replace(
+                    day=1, hour=0, minute=0
+                )
+            elif not self._day_matches(t):
+                t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+            elif t.hour not in self.hours:
+                t = (t + timedelta(hours=1)).replace(minute=0)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise ValueError(f"Cron expression never matches: {self.expr!r}")
+
+
+@dataclass
+class Job:
+    """
+    A scheduled job: `every` seconds, or on a `cron` expression. `jitter`
+    (seconds, default SCHEDULER_JITTER_SECONDS) randomly delays each start so
+    replicas don't stampede; `lease_ttl` bounds how long a crashed holder
+    keeps the single-flight lease.
+    """
+
+    name: str
+    func: Callable[[], dict[str, Any]]
+    every: int | None = None
+    cron: str | None = None
+    jitter: int | None = None
+    lease_ttl: int = 900
+
+    def __post_init__(self):
+        if (self.every is None) == (self.cron is None):
+            raise ValueError(f"Job {self.name}: set exactly one of every/cron")
+        self._cron = Cron(self.cron) if self.cron else None
+
+    def next_run(self, scheduled: datetime, now: datetime) -> datetime:
+        """Next slot after `now`; missed interval slots are skipped, not replayed."""
+        if self._cron is not None:
+            return self._cron.next_after(now)
+        step = timedelta(seconds=self.every)
+        nxt = scheduled + step
+        if nxt <= now:
+            nxt += step * ((now - nxt) // step + 1)
+        return nxt
+
+
+@dataclass
+class JobStats:
+    runs: int = 0
+    failures: int = 0
+    skipped: int = 0  # another process held the lease
+    last_ms: int | None = None
+    max_ms: int = 0
+    total_ms: int = 0
+    last_status: str = ""
+
+    @property
+    def avg_ms(self) -> int | None:
+        return self.total_ms // self.runs if self.runs else None
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_ms": self.last_ms,
+            "avg_ms": self.avg_ms,
+            "max_ms": self.max_ms,
+        }
+
+
+# --- Jobs ------------------------------------------------------------------
+
+
+def monitoring_checks() -> dict[str, Any]:
+    results = run_all_checks()
+    return {
+        "status": results["status"],
+        "total_ms": results["total_ms"],
+        "run_id": results["run_id"],
+    }
+
+
+def snapshot_refresh() -> dict[str, Any]:
+    # Recent days only: today's and yesterday's totals are the ones still
+    # moving. The whole-history rollups (cohorts, RFM) are left to
+    # snapshot_full_build.
+    call_command(
+        "build_analytics_snapshots",
+        days=2,
+        skip_rollups=True,
+        lock_wait=0,
+        stdout=io.StringIO(),
+    )
+    return {"days": 2}
+
+
+def snapshot_full_build() -> dict[str, Any]:
+    # Nightly source of truth: the full window plus the cohort matrix and RFM
+    # segments. Waits out a running refresh instead of skipping the night.
+    call_command(
+        "build_analytics_snapshots", days=180, lock_wait=900, stdout=io.StringIO()
+    )
+    return {"days": 180}
+
+
+def export_cleanup() -> dict[str, Any]:
+    return {"deleted": purge_expired_exports()}
+
+
+def retention() -> dict[str, Any]:
+    return {
+        "hourly_compacted": compact_hourly(),
+        "monitoring_runs_pruned": prune_run_history(),
+    }
+
+
+JOBS = [
+    Job("monitoring_checks", monitoring_checks, every=5 * 60),
+    Job("snapshot_refresh", snapshot_refresh, every=15 * 60),
+    Job(
+        "snapshot_full_build", snapshot_full_build, cron="0 2 * * *", lease_ttl=4 * 3600
+    ),
+    Job("export_cleanup", export_cleanup, cron="15 * * * *"),
+    Job("retention", retention, cron="30 3 * * *", lease_ttl=3600),
+]
+
+
+def enabled_jobs(names: list[str] | None = None) -> list[Job]:
+    """JOBS minus SCHEDULER_DISABLED_JOBS, optionally restricted to `names`."""
+    disabled = set(getattr(settings, "SCHEDULER_DISABLED_JOBS", []))
+    known = {j.name for j in JOBS}
+    unknown = set(names or []) - known
+    if unknown:
+        raise ValueError(f"Unknown job(s): {', '.join(sorted(unknown))}")
+    return [
+        j for j in JOBS if j.name not in disabled and (not names or j.name in names)
+    ]
+
+
+# --- Runner ----------------------------------------------------------------
+
+
+def run_job(job: Job, stats: JobStats | None = None) -> dict[str, Any]:
+    """
+    Run `job` once under its single-flight lease (`scheduler:<name>`), so
+    overlapping schedulers or a leftover cron entry never run it twice at
+    the same time. Never raises: failures are audit-logged and returned.
+    """
+    stats = stats if stats is not None else JobStats()
+    close_old_connections()  # long-lived process: drop dead connections
+
+    lease = f"scheduler:{job.name}"
+    token = acquire_lease(lease, ttl=timedelta(seconds=job.lease_ttl))
+    if token is None:
+        stats.skipped += 1
+        stats.last_status = "skipped"
+        return {"job": job.name, "status": "skipped"}
+
+    started = time.perf_counter()
+    outcome: dict[str, Any] = {"job": job.name}
+    try:
+        outcome.update(status="ok", result=job.func())
+    except Exception as exc:
+        outcome.update(status="failed", error=f"{exc.__class__.__name__}: {exc}")
+    finally:
+        ms = int((time.perf_counter() - started) * 1000)
+        outcome["duration_ms"] = ms
+        release_lease(lease, token, result=outcome)
+        close_old_connections()
+
+    stats.runs += 1
+    stats.failures += outcome["status"] == "failed"
+    stats.last_ms = ms
+    stats.max_ms = max(stats.max_ms, ms)
+    stats.total_ms += ms
+    stats.last_status = outcome["status"]
+
+    log_event(
+        event_type=(
+            "scheduler_job_completed"
+            if outcome["status"] == "ok"
+            else "scheduler_job_failed"
+        ),
+        entity_type="scheduler",
+        entity_id=job.name,
+        metadata={**outcome, "stats": stats.as_dict()},
+    )
+    return outcome
+
+
+@dataclass
+class Scheduler:
+    """
+    In-process scheduler: one long-lived process runs every job on its
+    schedule, sequentially, instead of a cold-started command per cron tick.
+    """
+
+    jobs: list[Job]
+    rng: random.Random = field(default_factory=random.Random)
+    default_jitter: int = field(
+        default_factory=lambda: int(getattr(settings, "SCHEDULER_JITTER_SECONDS", 30))
+    )
+
+    def __post_init__(self):
+        now = timezone.now()
+        self.stats = {j.name: JobStats() for j in self.jobs}
+        # Slot times (un-jittered) and the jittered time each job actually starts.
+        self.slots = {
+            j.name: (j._cron.next_after(now) if j._cron else now) for j in self.jobs
+        }
+        self.due = {j.name: self._jitter(j, self.slots[j.name]) for j in self.jobs}
+
+    def _jitter(self, job: Job, at: datetime) -> datetime:
+        spread = self.default_jitter if job.jitter is None else job.jitter
+        return at + timedelta(seconds=self.rng.uniform(0, max(spread, 0)))
+
+    def next_due(self) -> datetime:
+        return min(self.due.values())
+
+    def run_pending(self, now: datetime | None = None) -> list[dict[str, Any]]:
+        """Run every job whose start time has passed; returns their outcomes."""
+        now = now or timezone.now()
+        outcomes = []
+        for job in self.jobs:
+            if self.due[job.name] > now:
+                continue
+            outcomes.append(run_job(job, self.stats[job.name]))
+            after = timezone.now()
+            self.slots[job.name] = job.next_run(self.slots[job.name], after)
+            self.due[job.name] = self._jitter(job, self.slots[job.name])
+        return outcomes
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from analyticsapp.models import (
+    AnalyticsCohortMonthly,
+    AnalyticsLease,
+    AnalyticsSnapshotDaily,
+    ExportJob,
+)
+from analyticsapp.services.leases import acquire_lease
+from audit.models import AuditLog
+from core.scheduler import JOBS, Cron, Job, Scheduler, run_job
+from orders.models import Order
+
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class CronTests(TestCase):
+    def test_next_matching_minute(self) -> None:
+        self.assertEqual(
+            Cron("15 * * * *").next_after(utc(2026, 3, 2, 10, 20)),
+            utc(2026, 3, 2, 11, 15),
+        )
+        self.assertEqual(
+            Cron("30 3 * * *").next_after(utc(2026, 3, 2, 3, 30)),
+            utc(2026, 3, 3, 3, 30),
+        )
+        # 2026-03-02 is a Monday; "1" is Monday, "7" Sunday.
+        self.assertEqual(
+            Cron("0 9 * * 1").next_after(utc(2026, 3, 2, 9, 0)),
+            utc(2026, 3, 9, 9, 0),
+        )
+        self.assertEqual(
+            Cron("*/20 8-9 1 1,7 *").next_after(utc(2026, 3, 2)),
+            utc(2026, 7, 1, 8, 0),
+        )
+
+    def test_invalid_expressions(self) -> None:
+        for expr in ("* * * *", "60 * * * *", "0 0 31 2 *"):
+            with self.assertRaises(ValueError):
+                Cron(expr).next_after(utc(2026, 1, 1))
+
+    def test_interval_jobs_skip_missed_slots(self) -> None:
+        job = Job("j", dict, every=300)
+        slot = utc(2026, 3, 2, 10, 0)
+        self.assertEqual(
+            job.next_run(slot, utc(2026, 3, 2, 10, 1)), slot + timedelta(minutes=5)
+        )
+        # A 17 minute overrun resumes on the grid instead of replaying 3 runs.
+        self.assertEqual(
+            job.next_run(slot, utc(2026, 3, 2, 10, 17)), utc(2026, 3, 2, 10, 20)
+        )
+
+
+class RunJobTests(TestCase):
+    def test_single_flight_skips_when_lease_is_held(self) -> None:
+        calls = []
+        job = Job("busy", lambda: calls.append(1) or {}, every=60)
+        acquire_lease("scheduler:busy", ttl=timedelta(minutes=5))
+
+        self.assertEqual(run_job(job)["status"], "skipped")
+        self.assertEqual(calls, [])
+
+    def test_failures_are_logged_and_release_the_lease(self) -> None:
+        def broken():
+            raise RuntimeError("boom")
+
+        outcome = run_job(Job("broken", broken, every=60))
+
+        self.assertEqual(outcome["status"], "failed")
+        self.assertIn("boom", outcome["error"])
+        self.assertEqual(AnalyticsLease.objects.get(name="scheduler:broken").holder, "")
+        self.assertTrue(
+            AuditLog.objects.filter(
+                event_type="scheduler_job_failed", entity_id="broken"
+            ).exists()
+        )
+
+    def test_scheduler_runs_due_jobs_and_tracks_metrics(self) -> None:
+        calls = []
+        scheduler = Scheduler(
+            [Job("tick", lambda: calls.append(1) or {"n": len(calls)}, every=60)],
+            default_jitter=0,
+        )
+
+        scheduler.run_pending()
+        scheduler.run_pending()  # not due again for a minute
+
+        self.assertEqual(calls, [1])
+        self.assertGreater(scheduler.next_due(), timezone.now())
+        stats = scheduler.stats["tick"]
+        self.assertEqual((stats.runs, stats.failures, stats.last_status), (1, 0, "ok"))
+
+
+class RunSchedulerCommandTests(TestCase):
+    def test_once_runs_export_cleanup(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            old_file = Path(tmp) / "old.csv"
+            old_file.write_text("x")
+            old = ExportJob.objects.create(
+                kind="orders",
+                status="done",
+                file_path=str(old_file),
+                finished_at=timezone.now() - timedelta(days=30),
+            )
+            fresh = ExportJob.objects.create(
+                kind="orders", status="done", finished_at=timezone.now()
+            )
+
+            out = StringIO()
+            call_command(
+                "run_scheduler", "--once", "--job", "export_cleanup", stdout=out
+            )
+
+            self.assertIn("export_cleanup: ok", out.getvalue())
+            self.assertFalse(old_file.exists())
+            self.assertFalse(ExportJob.objects.filter(id=old.id).exists())
+            self.assertTrue(ExportJob.objects.filter(id=fresh.id).exists())
+
+
+class SnapshotJobTests(TestCase):
+    def test_refresh_skips_rollups_and_nightly_build_runs_them(self) -> None:
+        Order.objects.create(
+            email="sched@example.com", status="paid", total=Decimal("10.00")
+        )
+        jobs = {j.name: j for j in JOBS}
+
+        self.assertEqual(run_job(jobs["snapshot_refresh"])["status"], "ok")
+        self.assertEqual(AnalyticsSnapshotDaily.objects.count(), 2)
+        self.assertFalse(AnalyticsCohortMonthly.objects.exists())
+
+        self.assertEqual(run_job(jobs["snapshot_full_build"])["status"], "ok")
+        self.assertEqual(AnalyticsSnapshotDaily.objects.count(), 180)
+        self.assertTrue(AnalyticsCohortMonthly.objects.exists())
@@ -1,6 +1,11 @@
 from django.contrib import admin
 from django.utils import timezone
-from .models import DataQualityIssue
+from .models import (
+    CheckWatermark,
+    DataQualityIssue,
+    MonitoringCheckResult,
+    MonitoringRun,
+)
 
 
 @admin.register(DataQualityIssue)
@@ -24,3 +29,32 @@ class DataQualityIssueAdmin(admin.ModelAdmin):
         queryset.update(
             status="open", resolved_at=None, resolved_by=None, resolution_notes=""
         )
+
+
+@admin.register(CheckWatermark)
+class CheckWatermarkAdmin(admin.ModelAdmin):
+    list_display = ("name", "changed_through", "last_full_sweep_at", "updated_at")
+    readonly_fields = ("updated_at",)
+
+
+class MonitoringCheckResultInline(admin.TabularInline):
+    model = MonitoringCheckResult
+    extra = 0
+    can_delete = False
+    readonly_fields = (
+        "name",
+        "status",
+        "mode",
+        "duration_ms",
+        "rows_scanned",
+        "issues_opened",
+        "issues_resolved",
+    )
+
+
+@admin.register(MonitoringRun)
+class MonitoringRunAdmin(admin.ModelAdmin):
+    list_display = ("started_at", "status", "duration_ms", "full_sweep", "workers")
+    list_filter = ("status", "full_sweep")
+    ordering = ("-started_at",)
+    inlines = [MonitoringCheckResultInline]
@@ -1,43 +1,90 @@
 from __future__ import annotations
 
-from datetime import datetime, time, timedelta
+from datetime import timedelta
 from decimal import Decimal
 
-from django.db import models
 from django.utils import timezone
 
 from analyticsapp.models import AnalyticsSnapshotDaily
+from analyticsapp.services.snapshot_runner import (
+    order_day_fingerprints,
+    rebuild_snapshot_days,
+)
+from audit.services.logger import log_event
 from monitoring.models import DataQualityIssue
-from orders.models import Order
 
 
 ISSUE_TYPE = "analytics_snapshot_reconciliation"
 
+EMPTY_FINGERPRINT = {"count": 0, "checksum": 0, "revenue": Decimal("0.00")}
+
+
+def _diverged_days(days: list, raw: dict, *, tolerance_pounds: Decimal) -> dict:
+    """
+    Days whose stored snapshot fingerprint/totals differ from the raw side.
+    Returns {day: short reason}.
+    """
+    snaps = {
+        s["day"]: s
+        for s in AnalyticsSnapshotDaily.objects.filter(day__in=days).values(
+            "day", "orders", "revenue", "source_count", "source_checksum"
+        )
+    }
+
+    out = {}
+    for day in days:
+        snap = snaps.get(day)
+        fp = raw.get(day, EMPTY_FINGERPRINT)
+        if snap is None:
+            out[day] = "missing snapshot"
+        elif (snap["source_count"], snap["source_checksum"]) != (
+            fp["count"],
+            fp["checksum"],
+        ):
+            out[day] = (
+                f"orders fingerprint changed (count {snap['source_count']}"
+                f"->{fp['count']})"
+            )
+        elif snap["orders"] != fp["count"] or (
+            (snap["revenue"] - fp["revenue"]).copy_abs() > tolerance_pounds
+        ):
+            out[day] = (
+                f"totals differ (snapshot {snap['orders']}/{snap['revenue']}, "
+                f"raw {fp['count']}/{fp['revenue']})"
+            )
+    return out
+
 
 def run_analytics_snapshot_reconciliation(
-    *, days: int = 30, tolerance_pounds: Decimal = Decimal("0.50")
+    *,
+    days: int = 30,
+    tolerance_pounds: Decimal = Decimal("0.50"),
+    rebuild: bool = True,
 ) -> None:
     """
-    Compare AnalyticsSnapshotDaily totals vs raw paid/fulfilled Orders totals
-    for the same window. Creates/updates a DataQualityIssue if mismatch exceeds tolerance.
-    Auto-resolves any previously open issue when the window matches.
+    Per-day reconciliation of AnalyticsSnapshotDaily vs raw paid/fulfilled
+    Orders using the fingerprints stored by the snapshot builder.
+
+    The raw side is one grouped query (count + checksum + revenue per day), so
+    the diff pinpoints exactly which days diverged. With `rebuild=True` only
+    those days are rebuilt; an issue stays open only for days that still
+    diverge afterwards. The repair needs the snapshot lease: while a build
+    holds it the days are only reported (that build rewrites them anyway).
+    Today is left out: its fingerprint moves with every payment and the live
+    counter serves it, so reconciling it would rebuild it on every run.
+    Auto-resolves when the window matches.
     """
     today = timezone.localdate()
     start_day = today - timedelta(days=days - 1)
     reference_id = f"analytics:snapshot_recon:{days}d"
+    yesterday = today - timedelta(days=1)
+    window = [start_day + timedelta(days=i) for i in range(days - 1)]
 
-    # --- Snapshot aggregates ---
-    snap_qs = AnalyticsSnapshotDaily.objects.filter(day__range=(start_day, today))
-    snap_days = snap_qs.count()
+    snap_days = AnalyticsSnapshotDaily.objects.filter(
+        day__range=(start_day, today)
+    ).count()
 
-    snap_agg = snap_qs.aggregate(
-        revenue_sum=models.Sum("revenue"),
-        orders_sum=models.Sum("orders"),
-    )
-    snap_revenue = snap_agg["revenue_sum"] or Decimal("0.00")
-    snap_orders = int(snap_agg["orders_sum"] or 0)
-
-    # Guard: snapshots missing (avoid false mismatches)
+    # Guard: snapshots missing (a full build is needed, not a targeted repair)
     if snap_days < days:
         DataQualityIssue.objects.update_or_create(
             issue_type=ISSUE_TYPE,
@@ -53,33 +100,39 @@ def run_analytics_snapshot_reconciliation(
         )
         return
 
-    # --- Raw aggregates (paid + fulfilled) ---
-    start_dt = timezone.make_aware(datetime.combine(start_day, time.min))
-    end_dt = timezone.make_aware(datetime.combine(today, time.max))
-
-    raw_agg = Order.objects.filter(
-        status__in=("paid", "fulfilled"),
-        created_at__range=(start_dt, end_dt),
-    ).aggregate(
-        revenue_sum=models.Sum("total"),
-        orders_sum=models.Count("id"),
-    )
-    raw_revenue = raw_agg["revenue_sum"] or Decimal("0.00")
-    raw_orders = int(raw_agg["orders_sum"] or 0)
+    raw = order_day_fingerprints(start_day, yesterday)
+    diverged = _diverged_days(window, raw, tolerance_pounds=tolerance_pounds)
 
-    revenue_diff = (raw_revenue - snap_revenue).copy_abs()
-    orders_diff = abs(raw_orders - snap_orders)
+    skipped = ""
+    rebuilt = rebuild_snapshot_days(diverged) if diverged and rebuild else []
+    if diverged and rebuild and not rebuilt:
+        skipped = " Repair skipped: a snapshot build holds the lease."
+    if rebuilt:
+        log_event(
+            event_type="analytics_snapshot_days_rebuilt",
+            entity_type="analytics",
+            entity_id=reference_id,
+            metadata={
+                "days": [d.isoformat() for d in rebuilt],
+                "reasons": {d.isoformat(): r for d, r in diverged.items()},
+            },
+        )
+        raw = order_day_fingerprints(rebuilt[0], rebuilt[-1])
+        diverged = _diverged_days(rebuilt, raw, tolerance_pounds=tolerance_pounds)
 
-    if revenue_diff > tolerance_pounds or orders_diff != 0:
+    if diverged:
+        listed = "; ".join(
+            f"{d.isoformat()}: {r}" for d, r in sorted(diverged.items())[:10]
+        )
+        more = f" (+{len(diverged) - 10} more)" if len(diverged) > 10 else ""
         DataQualityIssue.objects.update_or_create(
             issue_type=ISSUE_TYPE,
             reference_id=reference_id,
             defaults={
                 "description": (
-                    f"Snapshot vs raw mismatch for {days}d window. "
-                    f"snapshot_revenue={snap_revenue}, raw_revenue={raw_revenue}, diff={revenue_diff}. "
-                    f"snapshot_orders={snap_orders}, raw_orders={raw_orders}, orders_diff={orders_diff}. "
-                    f"tolerance_pounds={tolerance_pounds}."
+                    f"Snapshot vs raw mismatch on {len(diverged)} day(s) in the "
+                    f"{days}d window: {listed}{more}. "
+                    f"tolerance_pounds={tolerance_pounds}.{skipped}"
                 ),
                 "status": "open",
                 "resolved_at": None,
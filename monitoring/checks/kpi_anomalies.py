@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import warnings
+from datetime import date, timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsSnapshotDaily
+from monitoring.models import DataQualityIssue
+
+
+ISSUE_TYPE = "kpi_anomaly"
+
+METRICS = ("revenue", "orders", "refund_rate")
+
+# Lower bound on each metric's robust scale, so a flat baseline (MAD = 0)
+# doesn't turn every small wobble into an infinite z-score.
+SCALE_FLOOR = {"revenue": 1.0, "orders": 1.0, "refund_rate": 0.01}
+
+# 1.4826 * MAD estimates the standard deviation of normally distributed data.
+MAD_TO_SIGMA = 1.4826
+
+
+def load_daily_series(start_day: date, end_day: date) -> dict[str, np.ndarray]:
+    """
+    Daily metric arrays for [start_day, end_day] (index 0 = start_day) from
+    one snapshot query. Days without a snapshot, and the refund rate of days
+    without orders, are NaN.
+    """
+    n = (end_day - start_day).days + 1
+    rows = list(
+        AnalyticsSnapshotDaily.objects.filter(
+            day__range=(start_day, end_day)
+        ).values_list("day", "revenue", "orders", "refunded_orders")
+    )
+
+    series = {m: np.full(n, np.nan) for m in METRICS}
+    if not rows:
+        return series
+
+    days, revenue, orders, refunded = zip(*rows)
+    idx = np.array([(d - start_day).days for d in days])
+    orders_arr = np.array(orders, dtype=float)
+
+    series["revenue"][idx] = np.array(revenue, dtype=float)
+    series["orders"][idx] = orders_arr
+    with np.errstate(divide="ignore", invalid="ignore"):
+        series["refund_rate"][idx] = np.where(
+            orders_arr > 0, np.array(refunded, dtype=float) / orders_arr, np.nan
+        )
+    return series
+
+
+def _lagged(values: np.ndarray, lags: np.ndarray) -> np.ndarray:
+    """(n, len(lags)) matrix whose row t holds values[t - lag] (NaN before start)."""
+    pad = int(lags.max())
+    padded = np.concatenate([np.full(pad, np.nan), values])
+    return padded[np.arange(len(values))[:, None] - lags[None, :] + pad]
+
+
+def robust_z(
+    values: np.ndarray, baseline: np.ndarray, *, floor: float, min_periods: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Robust z-score of each value against its row of `baseline` (median/MAD).
+    Rows with fewer than `min_periods` observations score NaN.
+    Returns (z, baseline median).
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN rows
+        med = np.nanmedian(baseline, axis=1)
+        mad = np.nanmedian(np.abs(baseline - med[:, None]), axis=1)
+
+    scale = np.maximum(MAD_TO_SIGMA * mad, floor)
+    enough = np.count_nonzero(~np.isnan(baseline), axis=1) >= min_periods
+    with np.errstate(invalid="ignore"):
+        z = np.where(enough, (values - med) / scale, np.nan)
+    return z, med
+
+
+def detect_anomalies(
+    series: dict[str, np.ndarray],
+    *,
+    window: int = 28,
+    seasonal_weeks: int = 8,
+    threshold: float = 3.5,
+) -> dict[str, dict[str, np.ndarray]]:
+    """
+    Score every day of every metric at once against two baselines:
+
+    - rolling: the previous `window` days;
+    - seasonal: the same weekday over the previous `seasonal_weeks` weeks.
+
+    A day is flagged only when both robust z-scores exceed `threshold` in the
+    same direction, so ordinary weekday/weekend swings (explained by the
+    seasonal baseline) and slow trends (explained by the rolling one) stay
+    quiet. Returns {metric: {"flags", "z_rolling", "z_seasonal", "expected"}}.
+    """
+    rolling_lags = np.arange(1, window + 1)
+    seasonal_lags = 7 * np.arange(1, seasonal_weeks + 1)
+
+    out = {}
+    for metric, values in series.items():
+        floor = SCALE_FLOOR.get(metric, 1e-9)
+        z_roll, _ = robust_z(
+            values,
+            _lagged(values, rolling_lags),
+            floor=floor,
+            min_periods=window // 2,
+        )
+        z_seas, expected = robust_z(
+            values,
+            _lagged(values, seasonal_lags),
+            floor=floor,
+            min_periods=max(3, seasonal_weeks // 2),
+        )
+        with np.errstate(invalid="ignore"):
+            flags = (
+                (np.abs(z_roll) >= threshold)
+                & (np.abs(z_seas) >= threshold)
+                & (np.sign(z_roll) == np.sign(z_seas))
+            )
+        out[metric] = {
+            "flags": flags,
+            "z_rolling": z_roll,
+            "z_seasonal": z_seas,
+            "expected": expected,
+        }
+    return out
+
+
+def _format(metric: str, value: float) -> str:
+    if metric == "revenue":
+        return f"£{value:,.2f}"
+    if metric == "refund_rate":
+        return f"{value:.1%}"
+    return f"{value:,.0f}"
+
+
+def run_kpi_anomaly_check(
+    *,
+    history_days: int = 730,
+    report_days: int = 14,
+    threshold: float = 3.5,
+) -> None:
+    """
+    Robust anomaly detection over daily revenue, orders and refund rate.
+
+    The whole `history_days` series is scored in one vectorised pass over the
+    snapshot table; issues are raised for flagged days among the last
+    `report_days` complete days (today is still accumulating and is skipped),
+    one per metric and day. Issues in that window that no longer flag (e.g.
+    after a snapshot rebuild) are resolved; ones a person resolved (a
+    reviewed, genuine spike or drop) are never reopened. These issues are
+    advisory: `run_checks --fail-on-issues` reports but doesn't fail on them.
+    """
+    end_day = timezone.localdate() - timedelta(days=1)
+    start_day = end_day - timedelta(days=history_days - 1)
+
+    series = load_daily_series(start_day, end_day)
+    scores = detect_anomalies(series, threshold=threshold)
+
+    report_from = max(0, history_days - report_days)
+    flagged_refs = set()
+    window_refs = {
+        f"kpi:{metric}:{(start_day + timedelta(days=i)).isoformat()}"
+        for metric in scores
+        for i in range(report_from, history_days)
+    }
+    acknowledged = set(
+        DataQualityIssue.objects.filter(
+            issue_type=ISSUE_TYPE,
+            reference_id__in=window_refs,
+            resolved_by__isnull=False,
+        ).values_list("reference_id", flat=True)
+    )
+
+    for metric, s in scores.items():
+        for i in range(report_from, history_days):
+            day = start_day + timedelta(days=i)
+            reference_id = f"kpi:{metric}:{day.isoformat()}"
+            if not s["flags"][i] or reference_id in acknowledged:
+                continue
+
+            flagged_refs.add(reference_id)
+            value, expected = series[metric][i], s["expected"][i]
+            direction = "spike" if s["z_seasonal"][i] > 0 else "drop"
+            DataQualityIssue.objects.update_or_create(
+                issue_type=ISSUE_TYPE,
+                reference_id=reference_id,
+                defaults={
+                    "description": (
+                        f"{metric} {direction} on {day.isoformat()}: "
+                        f"{_format(metric, value)} vs expected "
+                        f"{_format(metric, expected)} "
+                        f"(robust z rolling={s['z_rolling'][i]:.1f}, "
+                        f"seasonal={s['z_seasonal'][i]:.1f}, "
+                        f"threshold={threshold})."
+                    ),
+                    "status": "open",
+                    "resolved_at": None,
+                },
+            )
+
+    DataQualityIssue.objects.filter(
+        issue_type=ISSUE_TYPE,
+        reference_id__in=window_refs - flagged_refs,
+        status="open",
+    ).update(status="resolved", resolved_at=timezone.now())
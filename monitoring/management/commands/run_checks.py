@@ -1,11 +1,16 @@
 from django.core.management.base import BaseCommand, CommandError
-from django.core.management import call_command
 from django.db.models import Count
 
+from monitoring.checks.kpi_anomalies import ISSUE_TYPE as KPI_ANOMALY
 from monitoring.models import DataQualityIssue
 from monitoring.services.run_all import run_all_checks
 
 
+# Reported like any other issue but never fail --fail-on-issues: a KPI
+# anomaly can be genuine business movement, not a data-quality failure.
+ADVISORY_ISSUE_TYPES = (KPI_ANOMALY,)
+
+
 class Command(BaseCommand):
     help = "Run monitoring checks and print a concise operational report."
 
@@ -13,7 +18,10 @@ class Command(BaseCommand):
         parser.add_argument(
             "--fail-on-issues",
             action="store_true",
-            help="Exit with error code if any OPEN issues exist (useful for CI).",
+            help=(
+                "Exit with error code if any OPEN issues exist, advisory KPI "
+                "anomalies excepted (useful for CI)."
+            ),
         )
         parser.add_argument(
             "--top",
@@ -34,17 +42,43 @@ class Command(BaseCommand):
             default=90,
             help="How many days to rebuild when refreshing snapshots (default: 90).",
         )
+        parser.add_argument(
+            "--snapshots-wait",
+            type=int,
+            default=600,
+            help=(
+                "If a snapshot build is already running, wait up to N seconds and "
+                "reuse it instead of rebuilding (default: 600)."
+            ),
+        )
+
+        parser.add_argument(
+            "--full-sweep",
+            action="store_true",
+            help=(
+                "Examine every row instead of only rows changed since the last run "
+                "(implied by --fail-on-issues)."
+            ),
+        )
 
     def handle(self, *args, **options):
         # ✅ NEW: refresh snapshots before running checks
         # - If you're using --fail-on-issues (CI), you almost always want fresh snapshots.
+        # - The refresh runs as the first task of the check runner; only the
+        #   snapshot-based checks wait for it, the rest start immediately.
         should_refresh = bool(options["refresh_snapshots"] or options["fail_on_issues"])
+        refresh = None
         if should_refresh:
-            days = max(1, int(options["snapshots_days"] or 90))
-            # keep output quiet; your command already prints a report
-            call_command("build_analytics_snapshots", days=days, verbosity=0)
+            refresh = {
+                "days": max(1, int(options["snapshots_days"] or 90)),
+                "lock_wait": max(0, int(options["snapshots_wait"])),
+            }
 
-        run_all_checks()
+        # CI gates must not depend on a previous run's watermark.
+        results = run_all_checks(
+            full=bool(options["full_sweep"] or options["fail_on_issues"]),
+            refresh_snapshots=refresh,
+        )
 
         total = DataQualityIssue.objects.count()
         open_count = DataQualityIssue.objects.filter(status="open").count()
@@ -70,6 +104,13 @@ class Command(BaseCommand):
                 )
             )
 
+        if results["status"] != "ok":
+            for key in ("failed", "timed_out", "skipped"):
+                if results[key]:
+                    self.stdout.write(
+                        self.style.WARNING(f"Checks {key}: {', '.join(results[key])}")
+                    )
+
         if total:
             self.stdout.write("\nBreakdown:")
             for row in breakdown:
@@ -95,5 +136,10 @@ class Command(BaseCommand):
                             f" - #{i.id} [{i.status}] {i.issue_type} {i.reference_id} :: {desc}"
                         )
 
-        if options["fail_on_issues"] and open_count > 0:
-            raise CommandError(f"Monitoring failed: {open_count} open issue(s).")
+        blocking = (
+            DataQualityIssue.objects.filter(status="open")
+            .exclude(issue_type__in=ADVISORY_ISSUE_TYPES)
+            .count()
+        )
+        if options["fail_on_issues"] and blocking > 0:
+            raise CommandError(f"Monitoring failed: {blocking} open issue(s).")
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.10 on 2026-10-19 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("monitoring", "0005_alter_dataqualityissue_unique_together_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CheckWatermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, unique=True)),
+                ("changed_through", models.DateTimeField(blank=True, null=True)),
+                ("last_full_sweep_at", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "ordering": ["name"],
+            },
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.10 on 2026-10-19 19:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("monitoring", "0006_check_watermark"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MonitoringRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("started_at", models.DateTimeField(db_index=True)),
+                ("duration_ms", models.PositiveIntegerField(default=0)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("ok", "OK"), ("degraded", "Degraded")], max_length=20
+                    ),
+                ),
+                ("full_sweep", models.BooleanField(default=False)),
+                ("workers", models.PositiveSmallIntegerField(default=1)),
+            ],
+            options={
+                "ordering": ["-started_at"],
+            },
+        ),
+        migrations.CreateModel(
+            name="MonitoringCheckResult",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("ok", "OK"),
+                            ("failed", "Failed"),
+                            ("timed_out", "Timed out"),
+                            ("skipped", "Skipped"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("mode", models.CharField(blank=True, max_length=20)),
+                ("duration_ms", models.PositiveIntegerField(blank=True, null=True)),
+                ("rows_scanned", models.PositiveIntegerField(blank=True, null=True)),
+                ("issues_opened", models.PositiveIntegerField(blank=True, null=True)),
+                ("issues_resolved", models.PositiveIntegerField(blank=True, null=True)),
+                (
+                    "run",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="checks",
+                        to="monitoring.monitoringrun",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["name", "run"], name="dqcheck_name_run")
+                ],
+            },
+        ),
+    ]
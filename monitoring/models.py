@@ -34,7 +34,87 @@ class DataQualityIssue(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        unique_together = ("issue_type", "reference_id")
+        constraints = [
+            # One issue per rule + entity; checks insert-or-ignore against it.
+            models.UniqueConstraint(
+                fields=["issue_type", "reference_id"], name="uq_dqissue_type_ref"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["-created_at"], name="dqissue_created_desc"),
+            models.Index(fields=["status"], name="dqissue_status"),
+            models.Index(fields=["issue_type"], name="dqissue_type"),
+            models.Index(fields=["reference_id"], name="dqissue_ref"),
+        ]
 
     def __str__(self):
         return f"{self.issue_type} {self.reference_id} ({self.status})"
+
+
+class CheckWatermark(models.Model):
+    """
+    Per-check progress for incremental monitoring: rows changed after
+    `changed_through` (minus a small overlap) are examined on the next run;
+    a full sweep runs when `last_full_sweep_at` is older than the configured
+    interval.
+    """
+
+    name = models.CharField(max_length=100, unique=True)
+    changed_through = models.DateTimeField(null=True, blank=True)
+    last_full_sweep_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self):
+        return f"{self.name} (through {self.changed_through})"
+
+
+class MonitoringRun(models.Model):
+    """One run_all_checks() invocation; per-check rows hang off `checks`."""
+
+    started_at = models.DateTimeField(db_index=True)
+    duration_ms = models.PositiveIntegerField(default=0)
+    status = models.CharField(
+        max_length=20, choices=(("ok", "OK"), ("degraded", "Degraded"))
+    )
+    full_sweep = models.BooleanField(default=False)
+    workers = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        ordering = ["-started_at"]
+
+    def __str__(self):
+        return f"{self.started_at:%Y-%m-%d %H:%M} ({self.status})"
+
+
+class MonitoringCheckResult(models.Model):
+    """Timing and outcome of one check in a MonitoringRun, for trending."""
+
+    STATUSES = (
+        ("ok", "OK"),
+        ("failed", "Failed"),
+        ("timed_out", "Timed out"),
+        ("skipped", "Skipped"),
+    )
+
+    run = models.ForeignKey(
+        MonitoringRun, on_delete=models.CASCADE, related_name="checks"
+    )
+    name = models.CharField(max_length=100)
+    status = models.CharField(max_length=20, choices=STATUSES)
+    mode = models.CharField(max_length=20, blank=True)  # "full" / "incremental"
+    duration_ms = models.PositiveIntegerField(null=True, blank=True)
+    # Null when the check doesn't report them (non set-based checks).
+    rows_scanned = models.PositiveIntegerField(null=True, blank=True)
+    issues_opened = models.PositiveIntegerField(null=True, blank=True)
+    issues_resolved = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["name", "run"], name="dqcheck_name_run"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} {self.status} ({self.duration_ms} ms)"
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from django.db.models import CharField, QuerySet, Value
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+
+from monitoring.models import DataQualityIssue
+
+
+BATCH_SIZE = 1000
+
+
+def _refs(qs: QuerySet, prefix: str) -> QuerySet:
+    """Subquery of the issue references (`"<prefix><pk>"`) of `qs` rows."""
+    return qs.annotate(
+        dq_ref=Concat(Value(prefix), Cast("pk", CharField()), output_field=CharField())
+    ).values("dq_ref")
+
+
+def sync_issues(
+    *,
+    issue_type: str,
+    prefix: str,
+    violating: QuerySet,
+    description,
+    changed_since: datetime | None = None,
+) -> dict[str, int]:
+    """
+    Set-based upkeep of the issues one rule owns (`issue_type` + references
+    `"<prefix><pk>"`), in a handful of statements however large the table:
+
+    - `violating` is a filtered queryset of exactly the offending rows; only
+      those rows are read, and their issues are bulk inserted, ignoring ones
+      that already exist (uq_dqissue_type_ref);
+    - auto-resolved issues that violate again are reopened (issues resolved
+      by a person, i.e. with `resolved_by`, are left alone);
+    - open issues whose row no longer violates are resolved in one UPDATE.
+
+    `description` is a DB expression evaluated per violating row.
+
+    With `changed_since` only rows whose `updated_at` is later are examined
+    (incremental run): new violations among them are inserted/reopened and
+    their issues resolved if they're fixed; issues of unchanged rows are left
+    as they are until the next full sweep.
+
+    Returns {"scanned", "violations", "opened", "reopened", "resolved"}:
+    `scanned` is the number of rows in scope (the whole table, or the changed
+    rows on an incremental run) and `opened` counts newly inserted issues.
+    """
+    started = timezone.now()
+    owned = DataQualityIssue.objects.filter(
+        issue_type=issue_type, reference_id__startswith=prefix
+    )
+    if changed_since is not None:
+        changed = {"updated_at__gt": changed_since}
+        violating = violating.filter(**changed)
+        owned = owned.filter(
+            reference_id__in=_refs(violating.model.objects.filter(**changed), prefix)
+        )
+    refs = _refs(violating, prefix)
+    scanned = violating.model.objects.filter(
+        **({"updated_at__gt": changed_since} if changed_since is not None else {})
+    ).count()
+
+    violations = 0
+    batch: list[DataQualityIssue] = []
+    rows = (
+        violating.annotate(dq_desc=description).values_list("pk", "dq_desc").order_by()
+    )
+    for pk, desc in rows.iterator(chunk_size=BATCH_SIZE):
+        violations += 1
+        batch.append(
+            DataQualityIssue(
+                issue_type=issue_type,
+                reference_id=f"{prefix}{pk}",
+                description=desc,
+            )
+        )
+        if len(batch) >= BATCH_SIZE:
+            DataQualityIssue.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        DataQualityIssue.objects.bulk_create(batch, ignore_conflicts=True)
+
+    reopened = owned.filter(
+        status="resolved", resolved_by__isnull=True, reference_id__in=refs
+    ).update(status="open", resolved_at=None)
+    resolved = (
+        owned.filter(status="open")
+        .exclude(reference_id__in=refs)
+        .update(status="resolved", resolved_at=timezone.now())
+    )
+
+    opened = owned.filter(created_at__gte=started).count() if violations else 0
+
+    return {
+        "scanned": scanned,
+        "violations": violations,
+        "opened": opened,
+        "reopened": reopened,
+        "resolved": resolved,
+    }
+
+
+def merge_counts(*results: dict[str, int]) -> dict[str, int]:
+    """Sum sync_issues() summaries of the rules making up one check."""
+    out = dict.fromkeys(("scanned", "violations", "opened", "reopened", "resolved"), 0)
+    for r in results:
+        for key in out:
+            out[key] += r[key]
+    return out
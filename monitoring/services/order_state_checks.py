@@ -1,8 +1,20 @@
-from orders.models import Order
-from monitoring.models import DataQualityIssue
+from datetime import datetime
 
+from django.db.models import Case, Q, Value, When
 
-def check_invalid_order_states() -> None:
+from orders.models import Order
+from monitoring.services.issues import sync_issues
+from monitoring.services.payment_checks import (
+    MOCK_PAID,
+    NO_REFS,
+    STRIPE_PAID,
+    with_payment_refs,
+)
+
+
+def check_invalid_order_states(
+    *, changed_since: datetime | None = None
+) -> dict[str, int]:
     """
     Enterprise order-state rules (NO false positives):
 
@@ -14,57 +26,25 @@ def check_invalid_order_states() -> None:
     2) Fulfilled order must be paid (and must have payment proof).
 
     3) Canceled order should not be fulfilled; optional checks can be added later.
-    """
 
-    qs = Order.objects.all().only(
-        "id", "status", "stripe_payment_intent", "stripe_charge_id"
+    Both rules are one filtered query that only returns violating orders
+    (no walk over the orders table in Python).
+    """
+    paid_without_refs = Q(status="paid") & NO_REFS
+    fulfilled_without_proof = Q(status="fulfilled") & ~(MOCK_PAID | STRIPE_PAID)
+
+    return sync_issues(
+        changed_since=changed_since,
+        issue_type="invalid_order_state",
+        prefix="order:",
+        violating=with_payment_refs(Order.objects.all()).filter(
+            paid_without_refs | fulfilled_without_proof
+        ),
+        description=Case(
+            When(
+                status="paid",
+                then=Value("Order is paid but has no payment references."),
+            ),
+            default=Value("Order is fulfilled but has no valid payment proof."),
+        ),
     )
-
-    for o in qs:
-        ref = f"order:{o.id}"
-
-        intent = (o.stripe_payment_intent or "").strip()
-        charge = (o.stripe_charge_id or "").strip()
-
-        is_mock_paid = (intent == "mock") or (charge == "mock")
-        is_stripe_paid = intent.startswith("pi_")
-
-        # --- Rule A: PAID must have valid payment proof ---
-        if o.status == "paid":
-            # valid paid states
-            if is_mock_paid:
-                continue
-            if is_stripe_paid:
-                # Stripe should at least have intent; charge may arrive via webhook later
-                if not intent:
-                    DataQualityIssue.objects.get_or_create(
-                        issue_type="invalid_order_state",
-                        reference_id=ref,
-                        defaults={
-                            "description": "Paid Stripe order missing Stripe PaymentIntent reference."
-                        },
-                    )
-                continue
-
-            # Paid but no known payment proof (not stripe, not mock)
-            if not intent and not charge:
-                DataQualityIssue.objects.get_or_create(
-                    issue_type="invalid_order_state",
-                    reference_id=ref,
-                    defaults={
-                        "description": "Order is paid but has no payment references."
-                    },
-                )
-
-        # --- Rule B: FULFILLED must be PAID + valid payment proof ---
-        if o.status == "fulfilled":
-            if not (is_mock_paid or is_stripe_paid):
-                DataQualityIssue.objects.get_or_create(
-                    issue_type="invalid_order_state",
-                    reference_id=ref,
-                    defaults={
-                        "description": "Order is fulfilled but has no valid payment proof."
-                    },
-                )
-
-        # You can add more rules later (canceled with charge, etc.)
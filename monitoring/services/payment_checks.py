@@ -1,20 +1,29 @@
+from datetime import datetime
+
+from django.db.models import Q, QuerySet, Value
+from django.db.models.functions import Trim
+
 from orders.models import Order
-from monitoring.models import DataQualityIssue
+from monitoring.services.issues import merge_counts, sync_issues
 
 
-def _ensure_issue(issue_type: str, reference_id: str, description: str) -> None:
-    """
-    Create issue if not exists. Keeps one issue per (issue_type, reference_id)
-    due to model unique_together.
-    """
-    DataQualityIssue.objects.get_or_create(
-        issue_type=issue_type,
-        reference_id=reference_id,
-        defaults={"description": description},
+# Payment markers, on whitespace-trimmed refs (see with_payment_refs).
+MOCK_PAID = Q(ref_intent="mock") | Q(ref_charge="mock")
+STRIPE_PAID = Q(ref_intent__startswith="pi_")
+NO_REFS = Q(ref_intent="", ref_charge="")
+
+
+def with_payment_refs(qs: QuerySet) -> QuerySet:
+    """Annotate trimmed Stripe refs so the payment rules stay pure SQL."""
+    return qs.annotate(
+        ref_intent=Trim("stripe_payment_intent"),
+        ref_charge=Trim("stripe_charge_id"),
     )
 
 
-def check_payment_reconciliation() -> None:
+def check_payment_reconciliation(
+    *, changed_since: datetime | None = None
+) -> dict[str, int]:
     """
     Enterprise payment reconciliation rules:
 
@@ -31,38 +40,29 @@ def check_payment_reconciliation() -> None:
     3) Non-Stripe paid orders:
        - If an order is paid but has no Stripe refs and is not mock, flag as payment_mismatch
          (suspicious state) unless you explicitly support another payment provider.
-    """
 
-    qs = Order.objects.filter(status="paid")
-
-    for o in qs:
-        ref = f"order:{o.id}"
-
-        intent = (o.stripe_payment_intent or "").strip()
-        charge = (o.stripe_charge_id or "").strip()
-
-        # ✅ Mock mode guard (no false positives)
-        is_mock_order = (intent == "mock") or (charge == "mock")
-        if is_mock_order:
-            # Mock orders are valid demo states; do not create issues
-            continue
-
-        # ✅ Stripe order detection
-        is_stripe_order = intent.startswith("pi_")
+    Each rule is one filtered query over paid orders; issues are bulk upserted
+    and fixed orders auto-resolved (see sync_issues).
+    """
+    paid = with_payment_refs(Order.objects.filter(status="paid")).exclude(MOCK_PAID)
 
-        if is_stripe_order:
-            # Stripe-paid order missing charge id => webhook incomplete
-            if not charge:
-                _ensure_issue(
-                    issue_type="missing_stripe_ref",
-                    reference_id=ref,
-                    description="Paid Stripe order missing stripe_charge_id (webhook may be incomplete).",
-                )
-        else:
-            # Paid order not Stripe and not mock => suspicious (or alternative provider not modelled)
-            if not intent and not charge:
-                _ensure_issue(
-                    issue_type="payment_mismatch",
-                    reference_id=ref,
-                    description="Paid order has no Stripe references and is not marked as mock.",
-                )
+    return merge_counts(
+        sync_issues(
+            changed_since=changed_since,
+            issue_type="missing_stripe_ref",
+            prefix="order:",
+            violating=paid.filter(STRIPE_PAID, ref_charge=""),
+            description=Value(
+                "Paid Stripe order missing stripe_charge_id (webhook may be incomplete)."
+            ),
+        ),
+        sync_issues(
+            changed_since=changed_since,
+            issue_type="payment_mismatch",
+            prefix="order:",
+            violating=paid.filter(NO_REFS),
+            description=Value(
+                "Paid order has no Stripe references and is not marked as mock."
+            ),
+        ),
+    )
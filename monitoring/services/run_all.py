@@ -2,16 +2,47 @@ from __future__ import annotations
 
 import time
 import traceback
-from typing import Callable, Any
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Any, Callable, NamedTuple
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
 
 from audit.services.logger import log_event
 from monitoring.checks.analytics_snapshot_reconciliation import (
     run_analytics_snapshot_reconciliation,
 )
+from monitoring.checks.kpi_anomalies import run_kpi_anomaly_check
 from monitoring.checks.refund_reconciliation import run_refund_reconciliation
 from monitoring.services.order_state_checks import check_invalid_order_states
 from monitoring.services.payment_checks import check_payment_reconciliation
 from monitoring.services.stock_checks import check_stock_anomalies
+from monitoring.services.run_history import check_counts, record_run
+from monitoring.services.watermarks import run_incremental
+
+
+# Checks that accept `changed_since` and run against a per-check watermark.
+INCREMENTAL_CHECKS = {
+    "payment_reconciliation",
+    "invalid_order_states",
+    "stock_anomalies",
+}
+
+SNAPSHOT_REFRESH = "snapshot_refresh"
+
+
+class CheckSpec(NamedTuple):
+    name: str
+    fn: Callable[[], Any]
+    depends_on: tuple[str, ...] = ()
+    timeout: float | None = None  # seconds; None = MONITORING_CHECK_TIMEOUT_SECONDS
+
+
+class CheckTimeout(Exception):
+    """Raised inside a check that ran past its deadline (at its next query)."""
 
 
 def _compact_traceback(tb: str, *, max_chars: int = 6000) -> str:
@@ -24,56 +55,242 @@ def _compact_traceback(tb: str, *, max_chars: int = 6000) -> str:
     return "…(truncated)…\n" + tb[-max_chars:]
 
 
-def run_all_checks() -> dict[str, Any]:
+def check_specs(
+    *, full: bool = False, refresh_snapshots: dict | None = None
+) -> list[CheckSpec]:
+    """
+    The monitoring checks in their stable (report) order. With
+    `refresh_snapshots` ({"days", "lock_wait"}) a snapshot rebuild runs first
+    and the snapshot-based checks wait for it.
+    """
+    specs = []
+    snapshot_deps: tuple[str, ...] = ()
+    if refresh_snapshots:
+        specs.append(
+            CheckSpec(
+                SNAPSHOT_REFRESH,
+                partial(
+                    call_command,
+                    "build_analytics_snapshots",
+                    days=refresh_snapshots["days"],
+                    lock_wait=refresh_snapshots.get("lock_wait", 0),
+                    verbosity=0,
+                ),
+                # A rebuild may legitimately wait for a running one.
+                timeout=refresh_snapshots.get("lock_wait", 0) + _default_timeout(),
+            )
+        )
+        snapshot_deps = (SNAPSHOT_REFRESH,)
+
+    checks: list[tuple[str, Callable[..., Any], tuple[str, ...]]] = [
+        ("payment_reconciliation", check_payment_reconciliation, ()),
+        ("refund_reconciliation", run_refund_reconciliation, ()),
+        (
+            "analytics_snapshot_reconciliation",
+            run_analytics_snapshot_reconciliation,
+            snapshot_deps,
+        ),
+        ("kpi_anomalies", run_kpi_anomaly_check, snapshot_deps),
+        ("invalid_order_states", check_invalid_order_states, ()),
+        ("stock_anomalies", check_stock_anomalies, ()),
+    ]
+    for name, fn, deps in checks:
+        if name in INCREMENTAL_CHECKS:
+            fn = partial(run_incremental, name, fn, full=full)
+        specs.append(CheckSpec(name, fn, deps))
+    return specs
+
+
+def _default_timeout() -> float:
+    return float(getattr(settings, "MONITORING_CHECK_TIMEOUT_SECONDS", 300))
+
+
+def _deadline_guard(deadline: float):
+    """execute_wrapper that aborts a check at its first query past `deadline`."""
+
+    def guard(execute, sql, params, many, context):
+        if time.monotonic() > deadline:
+            raise CheckTimeout(f"deadline exceeded before: {sql[:80]}")
+        return execute(sql, params, many, context)
+
+    return guard
+
+
+def _run_guarded(spec: CheckSpec, deadline: float, *, own_connection: bool) -> Any:
+    try:
+        with connection.execute_wrapper(_deadline_guard(deadline)):
+            return spec.fn()
+    finally:
+        if own_connection:
+            # Pool threads get their own DB connection; close only this
+            # thread's, never other workers' (some may still be running).
+            connection.close()
+
+
+def run_all_checks(
+    *,
+    full: bool = False,
+    refresh_snapshots: dict | None = None,
+    max_workers: int | None = None,
+    specs: list[CheckSpec] | None = None,
+) -> dict[str, Any]:
     """
     Enterprise monitoring runner:
-    - Stable order
+    - Checks run concurrently on a thread pool (own DB connection per
+      thread), so wall time approaches the slowest check, not the sum
+    - Dependencies: a check starts once everything it depends on succeeded,
+      and is skipped if a dependency failed or timed out
+    - Per-check timeouts: the runner stops waiting at the deadline and the
+      check is cancelled at its next query. The pool is shut down without
+      waiting, so an abandoned thread keeps running until then (or until its
+      current statement returns) and holds its DB connection, and any locks
+      or open transaction, until it finishes
+    - Row-level checks only examine rows changed since their watermark,
+      with a periodic (or `full=True`) full sweep
     - Resilient execution (one failure doesn't block others)
     - Emits audit event if a check fails
-    - Returns summary (useful for CI/ops)
+    - Returns summary (useful for CI/ops) and persists it as a MonitoringRun
+      for latency trends
+
+    Checks run sequentially on the caller's connection with one worker
+    (MONITORING_MAX_WORKERS, 1 by default on SQLite) or when called inside a
+    transaction (e.g. from a test or an atomic block), since other
+    connections could not see its uncommitted writes.
     """
-    checks: list[tuple[str, Callable[[], None]]] = [
-        ("payment_reconciliation", check_payment_reconciliation),
-        ("refund_reconciliation", run_refund_reconciliation),
-        ("analytics_snapshot_reconciliation", run_analytics_snapshot_reconciliation),
-        ("invalid_order_states", check_invalid_order_states),
-        ("stock_anomalies", check_stock_anomalies),
-    ]
+    specs = (
+        specs
+        if specs is not None
+        else check_specs(full=full, refresh_snapshots=refresh_snapshots)
+    )
+    workers = max_workers or int(getattr(settings, "MONITORING_MAX_WORKERS", 1))
+    inline = workers <= 1 or connection.in_atomic_block
 
     started = time.perf_counter()
+    started_at = timezone.now()
     results: dict[str, Any] = {
         "ok": [],
         "failed": [],
+        "timed_out": [],
+        "skipped": [],
         "timings_ms": {},  # per-check runtime
+        "modes": {},  # "full" / "incremental" for watermarked checks
+        "counts": {},  # rows scanned / issues opened+resolved, if reported
         "total_ms": 0,
+        "workers": 1 if inline else workers,
         "status": "ok",  # "ok" or "degraded"
     }
+    outcome: dict[str, str] = {}
+    known = {s.name for s in specs}
 
-    for name, fn in checks:
-        t0 = time.perf_counter()
-        try:
-            fn()
-            results["ok"].append(name)
-        except Exception as exc:
-            results["failed"].append(name)
-
-            tb = traceback.format_exc()
-            log_event(
-                event_type="monitoring_check_failed",
-                entity_type="monitoring",
-                entity_id=name,
-                metadata={
-                    "check": name,
-                    "error": str(exc),
-                    "error_type": exc.__class__.__name__,
-                    "traceback": _compact_traceback(tb),
-                },
+    def record(spec: CheckSpec, t0: float, *, value=None, exc=None) -> None:
+        results["timings_ms"][spec.name] = int((time.perf_counter() - t0) * 1000)
+        if exc is None:
+            outcome[spec.name] = "ok"
+            results["ok"].append(spec.name)
+            if spec.name in INCREMENTAL_CHECKS and isinstance(value, tuple):
+                results["modes"][spec.name] = value[0]
+            counts = check_counts(value)
+            if counts is not None:
+                results["counts"][spec.name] = counts
+            return
+
+        timed_out = isinstance(exc, CheckTimeout)
+        outcome[spec.name] = "timed_out" if timed_out else "failed"
+        results["timed_out" if timed_out else "failed"].append(spec.name)
+        log_event(
+            event_type="monitoring_check_failed",
+            entity_type="monitoring",
+            entity_id=spec.name,
+            metadata={
+                "check": spec.name,
+                "error": str(exc),
+                "error_type": exc.__class__.__name__,
+                "traceback": _compact_traceback(
+                    "".join(traceback.format_exception(exc))
+                ),
+            },
+        )
+
+    def ready(spec: CheckSpec) -> bool | None:
+        """True = can start, False = skip (dependency failed), None = wait."""
+        deps = [d for d in spec.depends_on if d in known]
+        if any(outcome.get(d) not in (None, "ok") for d in deps):
+            return False
+        return True if all(outcome.get(d) == "ok" for d in deps) else None
+
+    pending = list(specs)
+    running: dict[Future, tuple[CheckSpec, float, float]] = {}
+    pool = None if inline else ThreadPoolExecutor(workers, "monitoring-check")
+
+    try:
+        while pending or running:
+            for spec in list(pending):
+                state = ready(spec)
+                if state is None:
+                    continue
+                pending.remove(spec)
+                if state is False:
+                    outcome[spec.name] = "skipped"
+                    results["skipped"].append(spec.name)
+                    continue
+
+                t0 = time.perf_counter()
+                deadline = time.monotonic() + (spec.timeout or _default_timeout())
+                if inline:
+                    try:
+                        record(
+                            spec,
+                            t0,
+                            value=_run_guarded(spec, deadline, own_connection=False),
+                        )
+                    except Exception as exc:
+                        record(spec, t0, exc=exc)
+                else:
+                    future = pool.submit(
+                        _run_guarded, spec, deadline, own_connection=True
+                    )
+                    running[future] = (spec, t0, deadline)
+
+            if not running:
+                if pending and all(ready(s) is None for s in pending):
+                    # Unsatisfiable (cyclic) dependencies: nothing can start.
+                    for spec in pending:
+                        outcome[spec.name] = "skipped"
+                        results["skipped"].append(spec.name)
+                    pending = []
+                continue
+
+            next_deadline = min(d for _, _, d in running.values())
+            done, _ = wait(
+                running,
+                timeout=max(0.0, next_deadline - time.monotonic()),
+                return_when=FIRST_COMPLETED,
             )
-        finally:
-            results["timings_ms"][name] = int((time.perf_counter() - t0) * 1000)
+            for future in done:
+                spec, t0, _ = running.pop(future)
+                exc = future.exception()
+                record(spec, t0, value=None if exc else future.result(), exc=exc)
+
+            now = time.monotonic()
+            for future, (spec, t0, deadline) in list(running.items()):
+                if now >= deadline:
+                    # Abandon it: the guard aborts it at its next query.
+                    running.pop(future)
+                    future.cancel()
+                    record(
+                        spec,
+                        t0,
+                        exc=CheckTimeout(
+                            f"{spec.name} exceeded {spec.timeout or _default_timeout():g}s"
+                        ),
+                    )
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
 
     results["total_ms"] = int((time.perf_counter() - started) * 1000)
-    results["status"] = "ok" if not results["failed"] else "degraded"
+    degraded = results["failed"] or results["timed_out"] or results["skipped"]
+    results["status"] = "degraded" if degraded else "ok"
 
     log_event(
         event_type="monitoring_checks_completed",
@@ -83,9 +300,14 @@ def run_all_checks() -> dict[str, Any]:
             "status": results["status"],
             "ok": results["ok"],
             "failed": results["failed"],
+            "timed_out": results["timed_out"],
+            "skipped": results["skipped"],
             "timings_ms": results["timings_ms"],
+            "modes": results["modes"],
             "total_ms": results["total_ms"],
+            "workers": results["workers"],
         },
     )
+    results["run_id"] = record_run(results, started_at=started_at, full=full).id
 
     return results
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from statistics import median
+from typing import Any
+
+from django.conf import settings
+from django.utils import timezone
+
+from monitoring.models import MonitoringCheckResult, MonitoringRun
+
+
+# Runs compared against the baseline, and the baseline length (ok runs only).
+RECENT_RUNS = 5
+BASELINE_RUNS = 20
+# Ignore slowdowns smaller than this; a 3 ms check doubling is noise.
+MIN_REGRESSION_MS = 50
+
+
+def check_counts(value: Any) -> dict[str, int] | None:
+    """The sync_issues() style summary a check returned, if any."""
+    if isinstance(value, tuple):  # run_incremental: (mode, result)
+        value = value[1]
+    if isinstance(value, dict) and "violations" in value:
+        return value
+    return None
+
+
+def record_run(
+    results: dict[str, Any], *, started_at: datetime, full: bool = False
+) -> MonitoringRun:
+    """
+    Persist a run_all_checks() summary as a MonitoringRun plus one
+    MonitoringCheckResult per check, and drop runs older than
+    MONITORING_RUN_HISTORY_DAYS.
+    """
+    run = MonitoringRun.objects.create(
+        started_at=started_at,
+        duration_ms=results["total_ms"],
+        status=results["status"],
+        full_sweep=full,
+        workers=results["workers"],
+    )
+
+    rows = []
+    for status in ("ok", "failed", "timed_out", "skipped"):
+        for name in results[status]:
+            counts = results["counts"].get(name) or {}
+            rows.append(
+                MonitoringCheckResult(
+                    run=run,
+                    name=name,
+                    status=status,
+                    mode=results["modes"].get(name, ""),
+                    duration_ms=results["timings_ms"].get(name),
+                    rows_scanned=counts.get("scanned"),
+                    issues_opened=(
+                        counts.get("opened", 0) + counts.get("reopened", 0)
+                        if "opened" in counts
+                        else None
+                    ),
+                    issues_resolved=counts.get("resolved"),
+                )
+            )
+    MonitoringCheckResult.objects.bulk_create(rows)
+
+    prune_run_history(now=started_at)
+    return run
+
+
+def prune_run_history(*, now: datetime | None = None) -> int:
+    """Delete runs older than MONITORING_RUN_HISTORY_DAYS. Returns runs deleted."""
+    keep_days = int(getattr(settings, "MONITORING_RUN_HISTORY_DAYS", 90))
+    cutoff = (now or timezone.now()) - timedelta(days=keep_days)
+    _, per_model = MonitoringRun.objects.filter(started_at__lt=cutoff).delete()
+    return per_model.get(MonitoringRun._meta.label, 0)
+
+
+def latency_trends(*, threshold: float | None = None) -> list[dict[str, Any]]:
+    """
+    Per check: median latency of its last RECENT_RUNS successful runs vs the
+    BASELINE_RUNS before them. `regressed` when the recent median exceeds the
+    baseline by more than `threshold` (fraction, default
+    MONITORING_REGRESSION_THRESHOLD) and by at least MIN_REGRESSION_MS.
+    """
+    if threshold is None:
+        threshold = float(getattr(settings, "MONITORING_REGRESSION_THRESHOLD", 0.5))
+
+    ok = MonitoringCheckResult.objects.filter(
+        status="ok", duration_ms__isnull=False
+    ).order_by("-run__started_at")
+    names = ok.order_by("name").values_list("name", flat=True).distinct()
+
+    out = []
+    for name in names:
+        durations = list(
+            ok.filter(name=name).values_list("duration_ms", flat=True)[
+                : RECENT_RUNS + BASELINE_RUNS
+            ]
+        )
+        recent, baseline = durations[:RECENT_RUNS], durations[RECENT_RUNS:]
+        recent_ms = median(recent)
+        baseline_ms = median(baseline) if baseline else None
+        regressed = bool(
+            baseline_ms is not None
+            and recent_ms > baseline_ms * (1 + threshold)
+            and recent_ms - baseline_ms >= MIN_REGRESSION_MS
+        )
+        out.append(
+            {
+                "name": name,
+                "recent_ms": recent_ms,
+                "baseline_ms": baseline_ms,
+                "change_pct": (
+                    round((recent_ms / baseline_ms - 1) * 100) if baseline_ms else None
+                ),
+                "regressed": regressed,
+            }
+        )
+    return out
+
+
+def latency_series(*, days: int = 30) -> dict[str, dict[str, list]]:
+    """{check: {"x": [started_at iso], "y": [duration_ms]}} for charting."""
+    since = timezone.now() - timedelta(days=days)
+    rows = (
+        MonitoringCheckResult.objects.filter(
+            run__started_at__gte=since, duration_ms__isnull=False
+        )
+        .exclude(status="skipped")
+        .order_by("run__started_at")
+        .values_list("name", "run__started_at", "duration_ms")
+    )
+    series: dict[str, dict[str, list]] = {}
+    for name, started_at, duration_ms in rows:
+        s = series.setdefault(name, {"x": [], "y": []})
+        s["x"].append(started_at.isoformat())
+        s["y"].append(duration_ms)
+    return series
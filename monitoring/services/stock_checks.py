@@ -1,24 +1,43 @@
+from datetime import datetime
+
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+
 from products.models import Product, ProductVariant
-from monitoring.models import DataQualityIssue
+from monitoring.services.issues import merge_counts, sync_issues
 
 
-def check_stock_anomalies():
-    # Product negative stock
-    for p in Product.objects.filter(stock__lt=0):
-        DataQualityIssue.objects.get_or_create(
+def check_stock_anomalies(*, changed_since: datetime | None = None) -> dict[str, int]:
+    """Negative product / variant stock (one filtered query per table)."""
+    return merge_counts(
+        sync_issues(
+            changed_since=changed_since,
             issue_type="stock_anomaly",
-            reference_id=f"product:{p.id}",
-            defaults={
-                "description": f"Negative product stock: {p.name} (stock={p.stock})"
-            },
-        )
-
-    # Variant negative stock
-    for v in ProductVariant.objects.filter(stock__lt=0):
-        DataQualityIssue.objects.get_or_create(
+            prefix="product:",
+            violating=Product.objects.filter(stock__lt=0),
+            description=Concat(
+                Value("Negative product stock: "),
+                "name",
+                Value(" (stock="),
+                Cast("stock", CharField()),
+                Value(")"),
+                output_field=CharField(),
+            ),
+        ),
+        sync_issues(
+            changed_since=changed_since,
             issue_type="stock_anomaly",
-            reference_id=f"variant:{v.id}",
-            defaults={
-                "description": f"Negative variant stock: {v.sku} (variant_id={v.id}, stock={v.stock})"
-            },
-        )
+            prefix="variant:",
+            violating=ProductVariant.objects.filter(stock__lt=0),
+            description=Concat(
+                Value("Negative variant stock: "),
+                "sku",
+                Value(" (variant_id="),
+                Cast("id", CharField()),
+                Value(", stock="),
+                Cast("stock", CharField()),
+                Value(")"),
+                output_field=CharField(),
+            ),
+        ),
+    )
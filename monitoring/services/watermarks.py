@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Any, Callable
+
+from django.conf import settings
+from django.utils import timezone
+
+from monitoring.models import CheckWatermark
+
+
+def run_incremental(
+    name: str, check: Callable[..., Any], *, full: bool = False
+) -> tuple[str, Any]:
+    """
+    Run `check(changed_since=...)` against rows changed since its last run.
+
+    `changed_since` is the previous run's start minus
+    MONITORING_WATERMARK_OVERLAP_SECONDS, so rows saved by a transaction that
+    committed just after that run started are still seen. A full sweep
+    (`changed_since=None`) runs on the first run, when `full` is set, and
+    whenever the last one is older than MONITORING_FULL_SWEEP_MINUTES; it
+    also catches rows written without bumping `updated_at` (queryset
+    updates).
+
+    The watermark only advances when the check returns, so a failed run is
+    retried from the same point. Returns ("full" | "incremental", result).
+    """
+    mark, _ = CheckWatermark.objects.get_or_create(name=name)
+    started = timezone.now()
+
+    sweep_every = timedelta(
+        minutes=int(getattr(settings, "MONITORING_FULL_SWEEP_MINUTES", 60))
+    )
+    overlap = timedelta(
+        seconds=int(getattr(settings, "MONITORING_WATERMARK_OVERLAP_SECONDS", 300))
+    )
+    sweep = (
+        full
+        or mark.changed_through is None
+        or mark.last_full_sweep_at is None
+        or started - mark.last_full_sweep_at >= sweep_every
+    )
+
+    result = check(changed_since=None if sweep else mark.changed_through - overlap)
+
+    mark.changed_through = started
+    update_fields = ["changed_through", "updated_at"]
+    if sweep:
+        mark.last_full_sweep_at = started
+        update_fields.append("last_full_sweep_at")
+    mark.save(update_fields=update_fields)
+
+    return ("full" if sweep else "incremental"), result
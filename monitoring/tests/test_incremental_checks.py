@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from monitoring.models import CheckWatermark, DataQualityIssue
+from monitoring.services.payment_checks import check_payment_reconciliation
+from monitoring.services.run_all import run_all_checks
+from monitoring.services.watermarks import run_incremental
+from orders.models import Order
+from orders.services.lifecycle import fulfill_order
+
+
+class IncrementalCheckTests(TestCase):
+    def _order(self, **fields) -> Order:
+        order = Order.objects.create(
+            email="inc@example.com", status="paid", total=Decimal("10.00"), **fields
+        )
+        # Pretend it was last touched well before any watermark.
+        Order.objects.filter(id=order.id).update(
+            updated_at=timezone.now() - timedelta(days=1)
+        )
+        return order
+
+    def _open(self) -> set[str]:
+        return set(
+            DataQualityIssue.objects.filter(
+                issue_type="payment_mismatch", status="open"
+            ).values_list("reference_id", flat=True)
+        )
+
+    def test_first_run_sweeps_then_only_changed_rows_are_examined(self) -> None:
+        old = self._order()
+
+        self.assertEqual(run_all_checks()["modes"]["payment_reconciliation"], "full")
+        self.assertEqual(self._open(), {f"order:{old.id}"})
+
+        # A violation written without bumping updated_at is invisible to an
+        # incremental run...
+        hidden = self._order(stripe_payment_intent="mock")
+        Order.objects.filter(id=hidden.id).update(stripe_payment_intent="")
+        # ...while a row saved normally is picked up, and fixing one resolves it.
+        fresh = Order.objects.create(
+            email="new@example.com", status="paid", total=Decimal("5.00")
+        )
+        old.stripe_payment_intent = "mock"
+        old.save()
+
+        result = run_all_checks()
+        self.assertEqual(result["modes"]["payment_reconciliation"], "incremental")
+        self.assertEqual(self._open(), {f"order:{fresh.id}"})
+
+        # The periodic full sweep catches what incremental runs can't see.
+        run_all_checks(full=True)
+        self.assertEqual(self._open(), {f"order:{fresh.id}", f"order:{hidden.id}"})
+
+    @override_settings(MONITORING_FULL_SWEEP_MINUTES=0)
+    def test_full_sweep_interval(self) -> None:
+        run_incremental("payment_reconciliation", check_payment_reconciliation)
+        mode, _ = run_incremental(
+            "payment_reconciliation", check_payment_reconciliation
+        )
+        self.assertEqual(mode, "full")
+
+    def test_watermark_only_advances_after_a_successful_run(self) -> None:
+        run_incremental("payment_reconciliation", check_payment_reconciliation)
+        before = CheckWatermark.objects.get(name="payment_reconciliation")
+
+        def broken(*, changed_since):
+            raise RuntimeError("db went away")
+
+        with self.assertRaises(RuntimeError):
+            run_incremental("payment_reconciliation", broken)
+
+        after = CheckWatermark.objects.get(name="payment_reconciliation")
+        self.assertEqual(after.changed_through, before.changed_through)
+
+    def test_lifecycle_saves_bump_updated_at(self) -> None:
+        order = self._order(stripe_payment_intent="mock", stripe_charge_id="mock")
+        stale = Order.objects.get(id=order.id).updated_at
+
+        fulfill_order(order=order, actor=None)
+
+        self.assertGreater(Order.objects.get(id=order.id).updated_at, stale)
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsSnapshotDaily
+from monitoring.checks.kpi_anomalies import (
+    ISSUE_TYPE,
+    detect_anomalies,
+    load_daily_series,
+    run_kpi_anomaly_check,
+)
+from monitoring.models import DataQualityIssue
+
+
+class KpiAnomalyTests(TestCase):
+    HISTORY = 3 * 365
+
+    def setUp(self) -> None:
+        self.yesterday = timezone.localdate() - timedelta(days=1)
+        snaps = []
+        for offset in range(self.HISTORY):
+            day = self.yesterday - timedelta(days=offset)
+            weekend = day.weekday() >= 5
+            orders = (60 if weekend else 40) + (offset * 7) % 5
+            snaps.append(
+                AnalyticsSnapshotDaily(
+                    day=day,
+                    orders=orders,
+                    revenue=Decimal(orders * 25 + (offset * 13) % 40),
+                    refunded_orders=2 + offset % 2,
+                )
+            )
+        AnalyticsSnapshotDaily.objects.bulk_create(snaps)
+
+    def _issues(self, status="open"):
+        return DataQualityIssue.objects.filter(issue_type=ISSUE_TYPE, status=status)
+
+    def test_seasonal_history_raises_no_issues(self) -> None:
+        run_kpi_anomaly_check(history_days=self.HISTORY)
+        self.assertFalse(self._issues().exists())
+
+        # The weekly swing is far above a plain rolling z-score threshold on
+        # its own; it's the seasonal baseline that keeps it quiet.
+        start = self.yesterday - timedelta(days=self.HISTORY - 1)
+        scores = detect_anomalies(load_daily_series(start, self.yesterday))
+        self.assertFalse(scores["revenue"]["flags"].any())
+
+    def test_revenue_drop_is_reported_and_resolved_after_a_fix(self) -> None:
+        snap = AnalyticsSnapshotDaily.objects.get(day=self.yesterday)
+        original = snap.revenue
+        AnalyticsSnapshotDaily.objects.filter(day=self.yesterday).update(
+            revenue=Decimal("12.00")
+        )
+
+        run_kpi_anomaly_check()
+
+        issue = self._issues().get()
+        self.assertEqual(issue.reference_id, f"kpi:revenue:{self.yesterday}")
+        self.assertIn("revenue drop", issue.description)
+        self.assertIn("£12.00", issue.description)
+
+        AnalyticsSnapshotDaily.objects.filter(day=self.yesterday).update(
+            revenue=original
+        )
+        run_kpi_anomaly_check()
+        self.assertFalse(self._issues().exists())
+        self.assertEqual(self._issues("resolved").count(), 1)
+
+    def test_person_resolved_anomaly_is_not_reopened(self) -> None:
+        AnalyticsSnapshotDaily.objects.filter(day=self.yesterday).update(
+            revenue=Decimal("99999.00")
+        )
+        run_kpi_anomaly_check()
+        reviewer = get_user_model().objects.create_user(username="kpi_reviewer")
+        self._issues().update(
+            status="resolved", resolved_at=timezone.now(), resolved_by=reviewer
+        )
+
+        run_kpi_anomaly_check()
+
+        self.assertFalse(self._issues().exists())
+        self.assertEqual(self._issues("resolved").get().resolved_by, reviewer)
+
+    def test_open_anomalies_do_not_fail_ci(self) -> None:
+        AnalyticsSnapshotDaily.objects.filter(day=self.yesterday).update(
+            revenue=Decimal("99999.00")
+        )
+        with mock.patch(
+            "monitoring.management.commands.run_checks.run_all_checks",
+            side_effect=lambda **kw: run_kpi_anomaly_check() or {"status": "ok"},
+        ):
+            out = StringIO()
+            call_command("run_checks", "--fail-on-issues", stdout=out)
+
+        self.assertTrue(self._issues().exists())
+        self.assertIn("kpi_anomaly / open: 1", out.getvalue())
+
+    def test_refund_rate_spike_is_reported(self) -> None:
+        day = self.yesterday - timedelta(days=3)
+        AnalyticsSnapshotDaily.objects.filter(day=day).update(refunded_orders=30)
+
+        run_kpi_anomaly_check()
+
+        refs = set(self._issues().values_list("reference_id", flat=True))
+        self.assertEqual(refs, {f"kpi:refund_rate:{day}"})
+        self.assertIn("spike", self._issues().get().description)
+
+    def test_days_without_enough_history_are_not_scored(self) -> None:
+        AnalyticsSnapshotDaily.objects.filter(
+            day__lt=self.yesterday - timedelta(days=5)
+        ).delete()
+        AnalyticsSnapshotDaily.objects.filter(day=self.yesterday).update(
+            revenue=Decimal("1.00")
+        )
+
+        run_kpi_anomaly_check()
+        self.assertFalse(self._issues().exists())
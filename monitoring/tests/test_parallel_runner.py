@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import time
+
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+
+from audit.models import AuditLog
+from monitoring.services.run_all import CheckSpec, run_all_checks
+
+
+def sleeper(seconds: float, log: list[str] | None = None, name: str = ""):
+    def check():
+        time.sleep(seconds)
+        if log is not None:
+            log.append(name)
+        return {"violations": 0}
+
+    return check
+
+
+def broken():
+    raise RuntimeError("boom")
+
+
+class ParallelRunnerTests(TransactionTestCase):
+    def test_wall_time_tracks_the_slowest_check(self) -> None:
+        specs = [CheckSpec(f"c{i}", sleeper(0.3)) for i in range(4)]
+
+        started = time.perf_counter()
+        result = run_all_checks(specs=specs, max_workers=4)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(result["workers"], 4)
+        self.assertEqual(result["status"], "ok")
+        self.assertEqual(sorted(result["ok"]), ["c0", "c1", "c2", "c3"])
+        self.assertLess(elapsed, 0.9)  # sequential would be 1.2s
+
+    def test_sqlite_defaults_to_one_worker(self) -> None:
+        # settings.MONITORING_MAX_WORKERS defaults to 1 on SQLite.
+        result = run_all_checks(specs=[CheckSpec("a", sleeper(0))])
+        self.assertEqual(result["workers"], 1)
+        self.assertEqual(result["ok"], ["a"])
+
+    def test_slow_check_is_abandoned_at_its_timeout(self) -> None:
+        specs = [
+            CheckSpec("slow", sleeper(2.0), timeout=0.2),
+            CheckSpec("fast", sleeper(0.05)),
+        ]
+
+        started = time.perf_counter()
+        result = run_all_checks(specs=specs, max_workers=2)
+
+        self.assertLess(time.perf_counter() - started, 1.0)
+        self.assertEqual(result["timed_out"], ["slow"])
+        self.assertEqual(result["ok"], ["fast"])
+        self.assertEqual(result["status"], "degraded")
+        failure = AuditLog.objects.get(
+            event_type="monitoring_check_failed", entity_id="slow"
+        )
+        self.assertEqual(failure.metadata["error_type"], "CheckTimeout")
+
+    def test_dependents_wait_for_and_are_skipped_after_their_dependency(
+        self,
+    ) -> None:
+        order: list[str] = []
+        specs = [
+            CheckSpec("refresh", sleeper(0.2, order, "refresh")),
+            CheckSpec("reconcile", sleeper(0, order, "reconcile"), ("refresh",)),
+            CheckSpec("independent", sleeper(0, order, "independent")),
+        ]
+        run_all_checks(specs=specs, max_workers=3)
+        self.assertEqual(order, ["independent", "refresh", "reconcile"])
+
+        specs = [
+            CheckSpec("refresh", broken),
+            CheckSpec("reconcile", sleeper(0), ("refresh",)),
+            CheckSpec("other", sleeper(0), ("not-scheduled",)),
+        ]
+        result = run_all_checks(specs=specs, max_workers=3)
+        self.assertEqual(result["failed"], ["refresh"])
+        self.assertEqual(result["skipped"], ["reconcile"])
+        self.assertEqual(result["ok"], ["other"])
+
+
+class InlineRunnerTests(TestCase):
+    def test_runs_sequentially_inside_a_transaction(self) -> None:
+        # Pool threads could not see this transaction's uncommitted rows.
+        with transaction.atomic():
+            result = run_all_checks(
+                specs=[CheckSpec("a", sleeper(0)), CheckSpec("b", broken)],
+                max_workers=4,
+            )
+        self.assertEqual(result["workers"], 1)
+        self.assertEqual((result["ok"], result["failed"]), (["a"], ["b"]))
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import UserRole
+from monitoring.models import MonitoringCheckResult, MonitoringRun
+from monitoring.services.run_all import run_all_checks
+from monitoring.services.run_history import latency_trends
+from orders.models import Order
+
+
+def _history(name: str, durations: list[int]) -> None:
+    """Record one run per duration, oldest first, an hour apart."""
+    start = timezone.now() - timedelta(hours=len(durations))
+    for i, ms in enumerate(durations):
+        run = MonitoringRun.objects.create(
+            started_at=start + timedelta(hours=i), status="ok", duration_ms=ms
+        )
+        MonitoringCheckResult.objects.create(
+            run=run, name=name, status="ok", duration_ms=ms
+        )
+
+
+class RunHistoryTests(TestCase):
+    def test_runs_persist_per_check_results(self) -> None:
+        Order.objects.create(
+            email="hist@example.com", status="paid", total=Decimal("9.00")
+        )
+
+        result = run_all_checks()
+
+        run = MonitoringRun.objects.get(id=result["run_id"])
+        self.assertEqual(run.status, result["status"])
+        checks = {c.name: c for c in run.checks.all()}
+        self.assertEqual(set(checks), set(result["timings_ms"]))
+
+        payments = checks["payment_reconciliation"]
+        self.assertEqual(payments.mode, "full")
+        # Both payment rules scan the (one-row) orders table.
+        self.assertEqual(payments.rows_scanned, 2)
+        self.assertEqual(payments.issues_opened, 1)
+        self.assertEqual(payments.issues_resolved, 0)
+
+        # Once fixed, the next run records the resolution.
+        Order.objects.update(stripe_payment_intent="mock")
+        rerun = MonitoringRun.objects.get(id=run_all_checks(full=True)["run_id"])
+        payments = rerun.checks.get(name="payment_reconciliation")
+        self.assertEqual((payments.issues_opened, payments.issues_resolved), (0, 1))
+
+    def test_latency_regressions_are_flagged(self) -> None:
+        _history("steady", [100] * 20 + [110] * 5)
+        _history("slowing", [100] * 20 + [400] * 5)
+        _history("tiny", [2] * 20 + [10] * 5)  # 5x, but only 8 ms
+
+        trends = {t["name"]: t for t in latency_trends(threshold=0.5)}
+
+        self.assertFalse(trends["steady"]["regressed"])
+        self.assertTrue(trends["slowing"]["regressed"])
+        self.assertEqual(trends["slowing"]["change_pct"], 300)
+        self.assertFalse(trends["tiny"]["regressed"])
+
+    def test_trends_view_is_staff_only(self) -> None:
+        url = reverse("monitoring:monitoring-trends")
+        _history("slowing", [100] * 20 + [400] * 5)
+
+        User = get_user_model()
+        customer = User.objects.create_user(username="cust-trend", password="x")
+        self.client.force_login(customer)
+        self.assertIn(self.client.get(url).status_code, (302, 403))
+
+        ops = User.objects.create_user(username="ops-trend", password="x")
+        ops.is_staff = True
+        ops.save()
+        UserRole.objects.update_or_create(user=ops, defaults={"role": "ops"})
+        self.client.force_login(ops)
+
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, "Regression:")
+        self.assertContains(resp, "check-latency")
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from monitoring.models import DataQualityIssue
+from monitoring.services.order_state_checks import check_invalid_order_states
+from monitoring.services.payment_checks import check_payment_reconciliation
+from monitoring.services.stock_checks import check_stock_anomalies
+from orders.models import Order
+from products.models import Product
+
+
+class SetBasedCheckTests(TestCase):
+    def _order(self, status="paid", intent="", charge="", **extra) -> Order:
+        return Order.objects.create(
+            email="dq@example.com",
+            status=status,
+            total=Decimal("10.00"),
+            stripe_payment_intent=intent,
+            stripe_charge_id=charge,
+            **extra,
+        )
+
+    def _refs(self, issue_type: str, status: str = "open") -> set[str]:
+        return set(
+            DataQualityIssue.objects.filter(
+                issue_type=issue_type, status=status
+            ).values_list("reference_id", flat=True)
+        )
+
+    def test_rules_flag_only_violating_orders(self) -> None:
+        ok_stripe = self._order(intent="pi_1", charge="ch_1")
+        self._order(intent="mock", charge="mock")
+        self._order(intent="pi_2", charge="mock")
+        no_charge = self._order(intent=" pi_3 ", charge="  ")
+        no_refs = self._order(intent=" ", charge="")
+        bad_fulfilled = self._order(status="fulfilled", intent="cash")
+        self._order(status="fulfilled", intent="pi_4", charge="ch_4")
+        self._order(status="pending")
+
+        check_payment_reconciliation()
+        check_invalid_order_states()
+
+        self.assertEqual(self._refs("missing_stripe_ref"), {f"order:{no_charge.id}"})
+        self.assertEqual(self._refs("payment_mismatch"), {f"order:{no_refs.id}"})
+        self.assertEqual(
+            self._refs("invalid_order_state"),
+            {f"order:{no_refs.id}", f"order:{bad_fulfilled.id}"},
+        )
+        issue = DataQualityIssue.objects.get(
+            issue_type="invalid_order_state", reference_id=f"order:{bad_fulfilled.id}"
+        )
+        self.assertEqual(
+            issue.description, "Order is fulfilled but has no valid payment proof."
+        )
+        self.assertNotIn(f"order:{ok_stripe.id}", self._refs("invalid_order_state"))
+
+    def test_query_count_does_not_grow_with_violations(self) -> None:
+        for _ in range(50):
+            self._order()
+
+        # Per rule: count rows in scope, read violators, bulk insert and count
+        # new issues (only when there are any), reopen, resolve -- independent
+        # of the number of orders.
+        with self.assertNumQueries(10):
+            summary = check_payment_reconciliation()
+        self.assertEqual(summary["violations"], 50)
+        self.assertEqual(summary["opened"], 50)
+        self.assertEqual(len(self._refs("payment_mismatch")), 50)
+
+        # Re-running is idempotent (insert-or-ignore).
+        self.assertEqual(check_payment_reconciliation()["opened"], 0)
+        self.assertEqual(
+            DataQualityIssue.objects.filter(issue_type="payment_mismatch").count(), 50
+        )
+
+    def test_fixed_rows_are_resolved_and_reopened_when_broken_again(self) -> None:
+        order = self._order()
+        product = Product.objects.create(
+            name="Soap", slug="soap", price=Decimal("3.00"), stock=-2
+        )
+        check_payment_reconciliation()
+        check_stock_anomalies()
+        self.assertEqual(self._refs("stock_anomaly"), {f"product:{product.id}"})
+        self.assertEqual(
+            DataQualityIssue.objects.get(issue_type="stock_anomaly").description,
+            "Negative product stock: Soap (stock=-2)",
+        )
+
+        Order.objects.filter(id=order.id).update(stripe_payment_intent="mock")
+        Product.objects.filter(id=product.id).update(stock=5)
+        self.assertEqual(check_payment_reconciliation()["resolved"], 1)
+        self.assertEqual(check_stock_anomalies()["resolved"], 1)
+        self.assertEqual(
+            self._refs("payment_mismatch", "resolved"), {f"order:{order.id}"}
+        )
+
+        Order.objects.filter(id=order.id).update(stripe_payment_intent="")
+        self.assertEqual(check_payment_reconciliation()["reopened"], 1)
+        self.assertEqual(self._refs("payment_mismatch"), {f"order:{order.id}"})
+
+    def test_issues_resolved_by_a_person_stay_resolved(self) -> None:
+        order = self._order()
+        check_payment_reconciliation()
+
+        staff = get_user_model().objects.create_user(username="ops-dq", password="x")
+        DataQualityIssue.objects.filter(reference_id=f"order:{order.id}").update(
+            status="resolved", resolved_by=staff
+        )
+
+        check_payment_reconciliation()
+        self.assertEqual(self._refs("payment_mismatch"), set())
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsSnapshotDaily
+from analyticsapp.services.leases import SNAPSHOT_LEASE, acquire_lease
+from analyticsapp.services.snapshot_runner import order_day_fingerprints
+from monitoring.checks.analytics_snapshot_reconciliation import (
+    ISSUE_TYPE,
+    run_analytics_snapshot_reconciliation,
+)
+from monitoring.models import DataQualityIssue
+from orders.models import Order
+
+
+class SnapshotReconciliationTests(TestCase):
+    def setUp(self) -> None:
+        self.today = timezone.localdate()
+        self.orders = {}
+        for offset in (1, 2, 4):
+            day = self.today - timedelta(days=offset)
+            o = Order.objects.create(
+                email=f"d{offset}@example.com", status="paid", total=Decimal("19.99")
+            )
+            Order.objects.filter(id=o.id).update(
+                created_at=timezone.make_aware(datetime.combine(day, time(12)))
+            )
+            self.orders[day] = o
+
+        call_command("build_analytics_snapshots", days=7, stdout=StringIO())
+
+    def _issue(self):
+        return DataQualityIssue.objects.filter(
+            issue_type=ISSUE_TYPE, reference_id="analytics:snapshot_recon:7d"
+        ).first()
+
+    def test_builder_stores_fingerprints_matching_raw_side(self) -> None:
+        day = self.today - timedelta(days=2)
+        snap = AnalyticsSnapshotDaily.objects.get(day=day)
+        raw = order_day_fingerprints(day, day)[day]
+
+        self.assertEqual(snap.source_count, 1)
+        self.assertEqual(snap.source_checksum, raw["checksum"])
+
+        run_analytics_snapshot_reconciliation(days=7)
+        self.assertIsNone(self._issue())
+
+    def test_status_change_is_detected_even_when_totals_match(self) -> None:
+        day = self.today - timedelta(days=4)
+        Order.objects.filter(id=self.orders[day].id).update(status="fulfilled")
+
+        run_analytics_snapshot_reconciliation(days=7, rebuild=False)
+
+        issue = self._issue()
+        self.assertEqual(issue.status, "open")
+        self.assertIn(day.isoformat(), issue.description)
+        self.assertIn("1 day(s)", issue.description)
+
+    def test_only_diverged_days_are_rebuilt(self) -> None:
+        day = self.today - timedelta(days=1)
+        untouched = self.today - timedelta(days=2)
+        Order.objects.filter(id=self.orders[day].id).update(total=Decimal("25.00"))
+        before = AnalyticsSnapshotDaily.objects.get(day=untouched).computed_at
+
+        run_analytics_snapshot_reconciliation(days=7)
+
+        self.assertEqual(
+            AnalyticsSnapshotDaily.objects.get(day=day).revenue, Decimal("25.00")
+        )
+        self.assertEqual(
+            AnalyticsSnapshotDaily.objects.get(day=untouched).computed_at, before
+        )
+        self.assertIsNone(self._issue())
+
+    def test_repair_is_skipped_while_a_build_holds_the_lease(self) -> None:
+        day = self.today - timedelta(days=1)
+        Order.objects.filter(id=self.orders[day].id).update(total=Decimal("25.00"))
+        acquire_lease(SNAPSHOT_LEASE, ttl=timedelta(minutes=5))
+
+        run_analytics_snapshot_reconciliation(days=7)
+
+        self.assertEqual(
+            AnalyticsSnapshotDaily.objects.get(day=day).revenue, Decimal("19.99")
+        )
+        issue = self._issue()
+        self.assertEqual(issue.status, "open")
+        self.assertIn(day.isoformat(), issue.description)
+        self.assertIn("Repair skipped", issue.description)
+
+    def test_today_is_left_to_the_live_counter(self) -> None:
+        before = AnalyticsSnapshotDaily.objects.get(day=self.today).computed_at
+        Order.objects.create(
+            email="today@example.com", status="paid", total=Decimal("5.00")
+        )
+
+        run_analytics_snapshot_reconciliation(days=7)
+
+        self.assertEqual(
+            AnalyticsSnapshotDaily.objects.get(day=self.today).computed_at, before
+        )
+        self.assertIsNone(self._issue())
@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import issues, healthz
+from .views import check_trends, issues, healthz
 
 app_name = "monitoring"
 
 urlpatterns = [
     path("issues/", issues, name="monitoring-issues"),
+    path("trends/", check_trends, name="monitoring-trends"),
     path("healthz/", healthz, name="healthz"),
 ]
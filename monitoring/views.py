@@ -1,3 +1,5 @@
+import json
+
 from django.shortcuts import render
 from django.db import connections
 from django.http import JsonResponse
@@ -5,8 +7,9 @@ from django.utils.timezone import now
 from django.views.decorators.http import require_GET
 
 from accounts.decorators import role_required
-from .models import DataQualityIssue
+from .models import DataQualityIssue, MonitoringRun
 from .services.run_all import run_all_checks
+from .services.run_history import latency_series, latency_trends
 
 
 @role_required("ops", "analyst", staff_only=True)
@@ -17,6 +20,33 @@ def issues(request):
     return render(request, "monitoring/issues.html", {"issues": rows})
 
 
+@role_required("ops", "analyst", staff_only=True)
+def check_trends(request):
+    try:
+        days = max(1, min(365, int(request.GET.get("days", 30))))
+    except ValueError:
+        days = 30
+
+    latency_fig = {
+        "data": [
+            {"type": "scatter", "mode": "lines+markers", "name": name, **s}
+            for name, s in latency_series(days=days).items()
+        ],
+        "layout": {
+            "title": f"Check latency (ms, last {days}d)",
+            "margin": {"t": 40, "l": 50, "r": 20, "b": 40},
+            "yaxis": {"rangemode": "tozero"},
+        },
+    }
+    context = {
+        "days": days,
+        "trends": latency_trends(),
+        "runs": MonitoringRun.objects.prefetch_related("checks")[:20],
+        "latency_json": json.dumps(latency_fig),
+    }
+    return render(request, "monitoring/trends.html", context)
+
+
 def _db_ready() -> tuple[bool, str | None]:
     try:
         with connections["default"].cursor() as cursor:
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.10 on 2026-10-19 18:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("orders", "0005_alter_order_status"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["email", "status"], name="orders_orde_email_e2637f_idx"
+            ),
+        ),
+    ]
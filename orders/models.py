@@ -52,6 +52,12 @@ class Order(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Per-customer lookups (CustomerFirstOrder maintenance)
+            models.Index(fields=["email", "status"]),
+            # Incremental monitoring checks (rows changed since a watermark)
+            models.Index(fields=["updated_at"]),
+        ]
 
     def __str__(self) -> str:
         return f"Order #{self.id} ({self.status})"
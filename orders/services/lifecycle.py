@@ -3,6 +3,7 @@ from __future__ import annotations
 from django.core.exceptions import ValidationError
 from django.db import transaction
 
+from analyticsapp.services.order_events import on_order_canceled
 from audit.services.logger import log_event
 from orders.models import Order
 
@@ -32,7 +33,9 @@ def cancel_order(*, order: Order, actor, reason: str = "") -> Order:
             )
 
         locked.status = "canceled"
-        locked.save(update_fields=["status"])
+        locked.save(update_fields=["status", "updated_at"])
+
+        on_order_canceled(locked)
 
     log_event(
         event_type="order_canceled",
@@ -65,7 +68,7 @@ def fulfill_order(*, order: Order, actor, note: str = "") -> Order:
             )
 
         locked.status = "fulfilled"
-        locked.save(update_fields=["status"])
+        locked.save(update_fields=["status", "updated_at"])
 
     log_event(
         event_type="order_fulfilled",
@@ -3,6 +3,7 @@ from django.db import transaction
 from django.core.exceptions import ValidationError
 
 from cart.services.cart import cart_summary, clear
+from analyticsapp.services.funnel_events import record_funnel_event
 from audit.services.logger import log_event
 
 from products.models import Product, ProductVariant
@@ -112,6 +113,8 @@ def create_order_from_cart(request, *, email: str, shipping: dict):
                 line_total=item["line_total"],
             )
 
+        record_funnel_event(user_id=order.user_id, step="checkout")
+
         log_event(
             event_type="order_created",
             entity_type="order",
@@ -5,6 +5,7 @@ from typing import Any, Tuple
 
 from django.db import transaction
 
+from analyticsapp.services.order_events import on_order_paid
 from audit.services.logger import log_event
 from orders.models import Order
 from products.models import Product, ProductVariant
@@ -174,7 +175,12 @@ def handle_payment_intent_succeeded(*, intent: dict) -> None:
             )
 
         order.save(
-            update_fields=["status", "stripe_payment_intent", "stripe_charge_id"]
+            update_fields=[
+                "status",
+                "stripe_payment_intent",
+                "stripe_charge_id",
+                "updated_at",
+            ]
         )
 
         # Decrement stock (atomic & locked)
@@ -219,7 +225,7 @@ def handle_payment_intent_succeeded(*, intent: dict) -> None:
                     )
 
                 variant.stock -= qty
-                variant.save(update_fields=["stock"])
+                variant.save(update_fields=["stock", "updated_at"])
                 continue
 
             # Product path
@@ -247,7 +253,7 @@ def handle_payment_intent_succeeded(*, intent: dict) -> None:
                     )
 
                 product.stock -= qty
-                product.save(update_fields=["stock"])
+                product.save(update_fields=["stock", "updated_at"])
                 continue
 
             # Legacy compatibility
@@ -262,6 +268,8 @@ def handle_payment_intent_succeeded(*, intent: dict) -> None:
                 },
             )
 
+        on_order_paid(order)
+
         log_event(
             event_type="order_paid_stripe",
             entity_type="order",
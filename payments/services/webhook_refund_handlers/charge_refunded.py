@@ -3,6 +3,7 @@ from __future__ import annotations
 from django.db import transaction
 from django.utils import timezone
 
+from analyticsapp.services.order_events import on_order_refunded
 from audit.services.logger import log_event
 from orders.models import Order
 
@@ -71,6 +72,8 @@ def handle_charge_refunded(*, charge: dict) -> None:
             )
             return
 
+        previous_pennies = order.refund_amount_pennies
+        previous_refunded_at = order.refunded_at
         order.refund_amount_pennies = amount_refunded
 
         if amount_total > 0 and amount_refunded >= amount_total:
@@ -84,7 +87,18 @@ def handle_charge_refunded(*, charge: dict) -> None:
             order.refunded_at = timezone.now()
 
         order.save(
-            update_fields=["refund_amount_pennies", "refund_status", "refunded_at"]
+            update_fields=[
+                "refund_amount_pennies",
+                "refund_status",
+                "refunded_at",
+                "updated_at",
+            ]
+        )
+
+        on_order_refunded(
+            order,
+            previous_pennies=previous_pennies,
+            previous_refunded_at=previous_refunded_at,
         )
 
     log_event(
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from analyticsapp.models import AnalyticsLiveCounter
+from orders.models import Order
+from payments.services.webhook_handlers import handle_payment_intent_succeeded
+from payments.views import _mark_paid
+
+
+class MarkPaidRaceTests(TestCase):
+    def test_view_path_does_not_refire_hook_after_webhook(self) -> None:
+        order = Order.objects.create(
+            email="race@example.com", status="pending", total=Decimal("10.00")
+        )
+        stale = Order.objects.get(id=order.id)  # what start_payment loaded
+
+        handle_payment_intent_succeeded(
+            intent={"id": "pi_race_1", "metadata": {"order_id": str(order.id)}}
+        )
+
+        self.assertEqual(stale.status, "pending")
+        self.assertIsNone(_mark_paid(stale.id, stripe_charge_id="ch_race_1"))
+        live = AnalyticsLiveCounter.objects.get(day=timezone.localdate())
+        self.assertEqual((live.orders, live.revenue), (1, Decimal("10.00")))
+
+    def test_marks_pending_order_paid_once(self) -> None:
+        order = Order.objects.create(
+            email="race@example.com", status="pending", total=Decimal("4.00")
+        )
+
+        paid = _mark_paid(order.id, stripe_payment_intent="mock")
+
+        self.assertEqual(paid.status, "paid")
+        self.assertEqual(paid.stripe_payment_intent, "mock")
+        self.assertIsNone(_mark_paid(order.id))
+        live = AnalyticsLiveCounter.objects.get(day=timezone.localdate())
+        self.assertEqual(live.orders, 1)
@@ -1,16 +1,36 @@
 import stripe
 from django.conf import settings
 from django.contrib import messages
+from django.db import transaction
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.csrf import csrf_exempt
 from orders.services.access import assert_can_access_order
 
+from analyticsapp.services.order_events import on_order_paid
 from audit.services.logger import log_event
 from orders.models import Order
 from payments.services.webhook_router import process_stripe_event
 
 
+def _mark_paid(order_id: int, **fields) -> Order | None:
+    """
+    Flip the order to paid under a row lock and fire the analytics hook.
+    Returns None when the locked row is no longer payable (e.g. the webhook
+    got there first), so on_order_paid runs once per transition.
+    """
+    with transaction.atomic():
+        order = Order.objects.select_for_update().get(id=order_id)
+        if order.status in ("paid", "canceled", "fulfilled"):
+            return None
+        order.status = "paid"
+        for name, value in fields.items():
+            setattr(order, name, value)
+        order.save(update_fields=["status", *fields, "updated_at"])
+        on_order_paid(order)
+    return order
+
+
 def start_payment(request, order_id: int):
     order = get_object_or_404(Order, id=order_id)
 
@@ -29,12 +49,13 @@ def start_payment(request, order_id: int):
 
     # ✅ Mock mode for local demo
     if not settings.PAYMENTS_USE_STRIPE:
-        order.status = "paid"
-        order.stripe_payment_intent = "mock"
-        order.stripe_charge_id = "mock"
-        order.save(
-            update_fields=["status", "stripe_payment_intent", "stripe_charge_id"]
+        paid = _mark_paid(
+            order.id, stripe_payment_intent="mock", stripe_charge_id="mock"
         )
+        if paid is None:
+            messages.info(request, "This order is already paid.")
+            return redirect("order-detail", order_id=order.id)
+        order = paid
 
         log_event(
             event_type="order_paid_mock",
@@ -54,11 +75,10 @@ def start_payment(request, order_id: int):
 
         # If already succeeded, mark paid (optional safety) and redirect
         if intent.get("status") == "succeeded":
-            order.status = "paid"
-            order.stripe_charge_id = (
-                intent.get("latest_charge") or order.stripe_charge_id
+            _mark_paid(
+                order.id,
+                stripe_charge_id=intent.get("latest_charge") or order.stripe_charge_id,
             )
-            order.save(update_fields=["status", "stripe_charge_id"])
             messages.success(request, "Payment already completed.")
             return redirect("order-detail", order_id=order.id)
 
@@ -85,7 +105,7 @@ def start_payment(request, order_id: int):
     )
 
     order.stripe_payment_intent = intent["id"]
-    order.save(update_fields=["stripe_payment_intent"])
+    order.save(update_fields=["stripe_payment_intent", "updated_at"])
 
     return render(
         request,
@@ -21,6 +21,7 @@ class Product(models.Model):
     stock = models.IntegerField(default=0)
     is_preorder = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -48,6 +49,7 @@ class ProductVariant(models.Model):
         max_digits=10, decimal_places=2, null=True, blank=True
     )
     stock = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def effective_price(self):
         return (
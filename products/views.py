@@ -1,4 +1,6 @@
 from django.shortcuts import render, get_object_or_404
+
+from analyticsapp.services.funnel_events import record_funnel_event
 from .models import Product
 
 
@@ -9,4 +11,5 @@ def product_list(request):
 
 def product_detail(request, slug):
     product = get_object_or_404(Product, slug=slug, is_active=True)
+    record_funnel_event(user_id=request.user.id, step="product_view")
     return render(request, "products/product_detail.html", {"product": product})
@@ -136,6 +136,64 @@ LOGIN_REDIRECT_URL = "/account/"
 LOGOUT_REDIRECT_URL = "/"
 LOGIN_URL = "/accounts/login/"
 
+# Analytics charts: max points per long time series (API /series/, 7-day
+# hourly view); longer series are downsampled server-side, peaks preserved.
+ANALYTICS_CHART_MAX_POINTS = int(os.getenv("ANALYTICS_CHART_MAX_POINTS", "120"))
+
+# Background export jobs write their CSV files here (see run_export_worker).
+ANALYTICS_EXPORT_ROOT = os.getenv("ANALYTICS_EXPORT_ROOT", "") or MEDIA_ROOT / "exports"
+# Finished export jobs (and their files) are purged after this many days.
+ANALYTICS_EXPORT_RETENTION_DAYS = int(os.getenv("ANALYTICS_EXPORT_RETENTION_DAYS", "7"))
+
+# Snapshot rebuilds hold a DB lease (single flight); a holder that stops
+# renewing for this many seconds is considered dead and its lease is stolen.
+ANALYTICS_SNAPSHOT_LEASE_TTL = int(os.getenv("ANALYTICS_SNAPSHOT_LEASE_TTL", "900"))
+
+# Intraday (hourly) snapshot rows are kept this many days, then compacted
+# into the daily tier by build_analytics_snapshots.
+ANALYTICS_HOURLY_RETENTION_DAYS = int(os.getenv("ANALYTICS_HOURLY_RETENTION_DAYS", "7"))
+
+# Append-only, memory-mappable columnar copy of the daily rollups for
+# notebooks/offline analysis (see build_columnar_store).
+ANALYTICS_COLUMNAR_ROOT = (
+    os.getenv("ANALYTICS_COLUMNAR_ROOT", "") or MEDIA_ROOT / "columnar"
+)
+
+# Monitoring checks examine only rows changed since their last run (minus a
+# small overlap for late-committing transactions) and do a full sweep at
+# most this many minutes apart.
+MONITORING_FULL_SWEEP_MINUTES = int(os.getenv("MONITORING_FULL_SWEEP_MINUTES", "60"))
+MONITORING_WATERMARK_OVERLAP_SECONDS = int(
+    os.getenv("MONITORING_WATERMARK_OVERLAP_SECONDS", "300")
+)
+# Checks run concurrently on this many threads (each with its own DB
+# connection); a check still running after the timeout is abandoned.
+# SQLite allows one writer at a time, so concurrent checks there risk
+# "database is locked": the default is 1 (sequential) on SQLite.
+MONITORING_MAX_WORKERS = int(
+    os.getenv(
+        "MONITORING_MAX_WORKERS",
+        "1" if DATABASES["default"]["ENGINE"].endswith("sqlite3") else "4",
+    )
+)
+MONITORING_CHECK_TIMEOUT_SECONDS = int(
+    os.getenv("MONITORING_CHECK_TIMEOUT_SECONDS", "300")
+)
+# Every run is kept as MonitoringRun history for this many days; a check is
+# flagged as regressed when its recent median latency exceeds its baseline by
+# more than this fraction.
+MONITORING_RUN_HISTORY_DAYS = int(os.getenv("MONITORING_RUN_HISTORY_DAYS", "90"))
+MONITORING_REGRESSION_THRESHOLD = float(
+    os.getenv("MONITORING_REGRESSION_THRESHOLD", "0.5")
+)
+
+# run_scheduler: comma-separated job names to leave out (e.g. when a job is
+# still driven by external cron), and the default random start delay.
+SCHEDULER_DISABLED_JOBS = [
+    j.strip() for j in os.getenv("SCHEDULER_DISABLED_JOBS", "").split(",") if j.strip()
+]
+SCHEDULER_JITTER_SECONDS = int(os.getenv("SCHEDULER_JITTER_SECONDS", "30"))
+
 # ----------------------------
 # Security baseline (M3)
 # ----------------------------
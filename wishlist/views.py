@@ -1,6 +1,7 @@
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404
+from analyticsapp.services.funnel_events import record_funnel_event
 from products.models import Product
 from .models import Wishlist
 
@@ -19,4 +20,5 @@ def toggle(request, product_id: int):
         obj.delete()
         return JsonResponse({"liked": False})
     Wishlist.objects.create(user=request.user, product=product)
+    record_funnel_event(user_id=request.user.id, step="wishlist")
     return JsonResponse({"liked": True})